@@ -0,0 +1,225 @@
+"""
+Time series of each company's AMM pool, for price and liquidity charts.
+
+The company page polled the raw AMMInfo answer and showed a price derived
+from the valuation rather than the pool. A background task instead samples
+every distributed company's pool (both amounts, LP token supply, trading
+fee) into `amm_samples`, one row per sample, and `get_ohlc` downsamples a
+time range into fixed buckets of open / high / low / close pool price.
+
+A sample identical to the previous one is not stored, so quiet pools cost
+nothing; buckets without a sample carry the previous close forward.
+"""
+
+import asyncio
+import math
+import os
+import time
+from typing import Callable, List, Optional
+
+import aiosqlite
+from xrpl.models.requests import GenericRequest
+
+# Seconds between pool samples; 0 disables the background task
+AMM_SAMPLE_INTERVAL = float(os.getenv("AMM_SAMPLE_INTERVAL", "30"))
+# Most buckets one series request may ask for
+MAX_OHLC_BUCKETS = 1000
+
+_SAMPLE_COLUMNS = (
+    "ledger_index",
+    "sampled_at",
+    "asset_amount",
+    "asset2_amount",
+    "lp_token_supply",
+    "trading_fee",
+    "price",
+)
+
+
+async def create_amm_tables(db: aiosqlite.Connection):
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS amm_samples (
+        company_id TEXT NOT NULL,
+        ledger_index INTEGER NOT NULL,
+        sampled_at INTEGER NOT NULL,  -- Unix seconds
+        asset_amount REAL NOT NULL,  -- RLUSD in the pool
+        asset2_amount REAL NOT NULL,  -- Company tokens in the pool
+        lp_token_supply REAL NOT NULL,
+        trading_fee INTEGER NOT NULL,  -- 1/100000 units, as in AMMInfo
+        price REAL NOT NULL,  -- RLUSD per company token
+        PRIMARY KEY (company_id, ledger_index)
+    )
+    """)
+    await db.execute("""
+    CREATE INDEX IF NOT EXISTS idx_amm_samples_time
+    ON amm_samples (company_id, sampled_at)
+    """)
+    await db.commit()
+
+
+def _amount_value(amount) -> float:
+    # XRP amounts are strings of drops, issued currencies {currency, issuer, value}
+    if isinstance(amount, dict):
+        return float(amount["value"])
+    return int(amount) / 1_000_000
+
+
+def _matches(amount, asset: dict) -> bool:
+    if isinstance(amount, dict):
+        return amount.get("currency") == asset.get("currency") and amount.get(
+            "issuer"
+        ) == asset.get("issuer")
+    return asset.get("currency") == "XRP"
+
+
+def parse_pool(result: dict, asset: dict, asset2: dict) -> Optional[dict]:
+    """A sample's pool fields from an AMMInfo result, or None if there is no pool."""
+    amm = result.get("amm")
+    if not amm:
+        return None
+    amount, amount2 = amm["amount"], amm["amount2"]
+    if not _matches(amount, asset):
+        amount, amount2 = amount2, amount
+    asset_amount = _amount_value(amount)
+    asset2_amount = _amount_value(amount2)
+    if asset2_amount <= 0:
+        return None
+    return {
+        "asset_amount": asset_amount,
+        "asset2_amount": asset2_amount,
+        "lp_token_supply": float(amm.get("lp_token", {}).get("value", 0)),
+        "trading_fee": int(amm.get("trading_fee", 0)),
+        "price": asset_amount / asset2_amount,
+    }
+
+
+async def _last_sample(
+    db: aiosqlite.Connection, company_id: str, before: Optional[int] = None
+) -> Optional[dict]:
+    async with db.execute(
+        f"""
+        SELECT {", ".join(_SAMPLE_COLUMNS)}
+        FROM amm_samples
+        WHERE company_id=? AND (? IS NULL OR sampled_at<?)
+        ORDER BY sampled_at DESC, ledger_index DESC
+        LIMIT 1
+        """,
+        (company_id, before, before),
+    ) as cursor:
+        row = await cursor.fetchone()
+    return dict(zip(_SAMPLE_COLUMNS, row)) if row else None
+
+
+async def sample_pool(
+    db: aiosqlite.Connection, client, company_id: str, asset: dict, asset2: dict
+) -> Optional[dict]:
+    """
+    Read the (asset, asset2) pool at the latest validated ledger and store
+    it unless unchanged since the last sample. Returns the sample, or None if the pool doesn't exist.
+    """
+    # xrpl-py's AMMInfo model has no ledger_index; without one the open
+    # ledger is read, whose pool state may never validate
+    resp = await client.request(
+        GenericRequest(
+            method="amm_info", asset=asset, asset2=asset2, ledger_index="validated"
+        )
+    )
+    pool = parse_pool(resp.result, asset, asset2)
+    ledger_index = resp.result.get("ledger_index")
+    if pool is None or not isinstance(ledger_index, int):
+        return None
+    sample = {"ledger_index": ledger_index, "sampled_at": int(time.time()), **pool}
+
+    last = await _last_sample(db, company_id)
+    if last is not None and all(last[k] == pool[k] for k in pool):
+        return sample
+    await db.execute(
+        f"""
+        INSERT OR IGNORE INTO amm_samples (company_id, {", ".join(_SAMPLE_COLUMNS)})
+        VALUES (?, {", ".join("?" * len(_SAMPLE_COLUMNS))})
+        """,
+        (company_id, *(sample[c] for c in _SAMPLE_COLUMNS)),
+    )
+    await db.commit()
+    return sample
+
+
+async def get_ohlc(
+    db: aiosqlite.Connection, company_id: str, start: int, end: int, interval: int
+) -> List[dict]:
+    """
+    Pool price candles for [start, end) in buckets of `interval` seconds:
+    {"t" (bucket start), "open", "high", "low", "close", "asset_amount",
+    "asset2_amount", "lp_token_supply", "trading_fee"}, the pool fields
+    being those of the bucket's last sample. Buckets before the first
+    sample are omitted.
+    """
+    async with db.execute(
+        f"""
+        SELECT {", ".join(_SAMPLE_COLUMNS)}
+        FROM amm_samples
+        WHERE company_id=? AND sampled_at>=? AND sampled_at<?
+        ORDER BY sampled_at, ledger_index
+        """,
+        (company_id, start, end),
+    ) as cursor:
+        rows = await cursor.fetchall()
+    samples = iter(dict(zip(_SAMPLE_COLUMNS, row)) for row in rows)
+
+    previous = await _last_sample(db, company_id, before=start)
+    sample = next(samples, None)
+    candles = []
+    for t in range(start, end, interval):
+        candle = None
+        while sample is not None and sample["sampled_at"] < t + interval:
+            price = sample["price"]
+            if candle is None:
+                candle = {"t": t, "open": price, "high": price, "low": price}
+            candle["high"] = max(candle["high"], price)
+            candle["low"] = min(candle["low"], price)
+            previous = sample
+            sample = next(samples, None)
+        if candle is None:
+            if previous is None:
+                continue
+            # No trade in this bucket: flat at the previous close
+            price = previous["price"]
+            candle = {"t": t, "open": price, "high": price, "low": price}
+        candle["close"] = previous["price"]
+        for field in ("asset_amount", "asset2_amount", "lp_token_supply"):
+            candle[field] = previous[field]
+        candle["trading_fee"] = previous["trading_fee"]
+        candles.append(candle)
+    return candles
+
+
+def bucket_count(start: int, end: int, interval: int) -> int:
+    return max(0, math.ceil((end - start) / interval))
+
+
+async def sample_periodically(
+    db: aiosqlite.Connection,
+    client,
+    asset: dict,
+    asset2_of: Callable[[str, str], dict],
+    interval: float = AMM_SAMPLE_INTERVAL,
+):
+    """
+    Background task: sample the (asset, asset2_of(symbol, issuing_address))
+    pool of every distributed company each interval.
+    """
+    while True:
+        async with db.execute("""
+            SELECT _id, symbol, issuing_address
+            FROM companies
+            WHERE state='distributed' AND issuing_address IS NOT NULL
+            """) as cursor:
+            rows = await cursor.fetchall()
+        for company_id, symbol, issuing_address in rows:
+            try:
+                await sample_pool(
+                    db, client, company_id, asset, asset2_of(symbol, issuing_address)
+                )
+            except Exception as e:
+                print(f"Error sampling the AMM of {company_id}: {str(e)}")
+        await asyncio.sleep(interval)
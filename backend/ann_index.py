@@ -0,0 +1,202 @@
+"""
+Approximate nearest-neighbour candidate retrieval over stored embeddings.
+
+Scoring every company/investor pair grows linearly with the table size. When
+enabled, the matching functions first ask an IVF (inverted file) index for the
+top-K entities by embedding similarity and only run the full rule-based score
+on those candidates.
+
+Building the index is too slow for a request. On the event loop, a stale
+index is rebuilt in a worker thread (asyncio.to_thread) and the previous one
+keeps answering meanwhile: rows added or replaced since it was built are
+scanned exactly, and replaced rows are skipped because the caller only wants
+the rows its batch scores.
+
+The index is pure NumPy: the normalized rows of an EmbeddingMatrix are
+clustered with spherical k-means, each row is filed under its closest
+centroid, and a query scans only the `n_probe` lists whose centroids are
+closest to it.
+"""
+
+import asyncio
+from typing import Optional, Set
+
+import numpy as np
+
+from embedding_store import EmbeddingMatrix, EmbeddingRows
+
+# Rebuild the index once this fraction of rows changed since it was built
+REBUILD_FRACTION = 0.1
+
+
+class IVFIndex:
+    """Inverted-file index over L2-normalized float32 rows."""
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_iter: int = 10,
+        max_train_rows: int = 50_000,
+        seed: int = 0,
+    ):
+        self.n_lists = n_lists
+        self.n_iter = n_iter
+        self.max_train_rows = max_train_rows
+        self.seed = seed
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.n_rows = 0
+        self.version = -1
+        self.generation = -1
+
+    def _assign(self, matrix: np.ndarray, chunk: int = 65_536) -> np.ndarray:
+        """Closest centroid for every row, in chunks to bound memory."""
+        labels = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), chunk):
+            block = matrix[start : start + chunk]
+            labels[start : start + chunk] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def build(
+        self, matrix: np.ndarray, version: int = 0, generation: int = 0
+    ) -> "IVFIndex":
+        """Cluster `matrix` (normalized rows) and file every row under its centroid."""
+        rng = np.random.default_rng(self.seed)
+        n_rows = len(matrix)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, max(n_rows, 1))
+
+        # Train centroids on a sample; the assignment below covers every row
+        if n_rows > self.max_train_rows:
+            sample = matrix[rng.choice(n_rows, self.max_train_rows, replace=False)]
+        else:
+            sample = matrix
+        self.centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            labels = np.argmax(sample @ self.centroids.T, axis=1)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            # Keep the previous centroid for empty clusters
+            filled = norms > 0
+            self.centroids[filled] = sums[filled] / norms[filled, np.newaxis]
+
+        labels = self._assign(matrix)
+        self.order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.n_rows = n_rows
+        self.version = version
+        self.generation = generation
+        return self
+
+    def search(
+        self,
+        rows: EmbeddingRows,
+        query: np.ndarray,
+        k: int,
+        n_probe: int = 8,
+        wanted: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Indices of (approximately) the `k` of `rows` most similar to the
+        normalized `query`, among those where `wanted` is True. Rows appended
+        after the index was built are always scanned exactly.
+        """
+        probe = min(n_probe, len(self.centroids))
+        closest = np.argpartition(-(self.centroids @ query), probe - 1)[:probe]
+        candidates = [
+            self.order[self.offsets[c] : self.offsets[c + 1]] for c in closest
+        ]
+        candidates.append(np.arange(self.n_rows, len(rows)))
+        candidates = np.concatenate(candidates)
+        if wanted is not None:
+            # e.g. rows replaced since the build, which the caller no longer scores
+            candidates = candidates[wanted[candidates]]
+
+        if len(candidates) <= k:
+            return candidates
+        similarity = rows.similarity(
+            query.astype(np.float64)[np.newaxis, :], candidates
+        )[0]
+        top = np.argpartition(-similarity, k - 1)[:k]
+        return candidates[top]
+
+
+# Stores whose index is being rebuilt in a worker thread
+_rebuilding: Set[int] = set()
+
+
+def is_stale(index: Optional[IVFIndex], rows: EmbeddingRows) -> bool:
+    """
+    True when `index` should be rebuilt for `rows`: it is missing, the rows
+    were renumbered since, or too many were added or replaced (a replaced
+    row is a new row, so both count as a version).
+    """
+    return (
+        index is None
+        or index.generation != rows.generation
+        or rows.version - index.version > REBUILD_FRACTION * max(index.n_rows, 1)
+    )
+
+
+def refresh_index(store: EmbeddingMatrix) -> Optional[IVFIndex]:
+    """
+    Rebuild the index of `store` over its current rows if it is stale, and
+    return it. CPU-bound: from async code, run it in a worker thread.
+    """
+    rows = store.rows()
+    if is_stale(store.ann_index, rows):
+        matrix = rows.unit_vectors(np.arange(len(rows)), dtype=np.float32)
+        store.ann_index = IVFIndex().build(
+            matrix, version=rows.version, generation=rows.generation
+        )
+    return store.ann_index
+
+
+def _schedule_rebuild(store: EmbeddingMatrix, loop: asyncio.AbstractEventLoop):
+    """Rebuild the index of `store` in a worker thread, unless one is already running."""
+    if id(store) in _rebuilding:
+        return
+    _rebuilding.add(id(store))
+    task = loop.create_task(asyncio.to_thread(refresh_index, store))
+    task.add_done_callback(lambda _: _rebuilding.discard(id(store)))
+
+
+def nearest_rows(
+    store: EmbeddingMatrix,
+    query: np.ndarray,
+    k: int,
+    n_probe: int = 8,
+    rows: Optional[EmbeddingRows] = None,
+    wanted: Optional[np.ndarray] = None,
+) -> Optional[np.ndarray]:
+    """
+    Approximate top-`k` rows of `rows` (by default the store's current ones)
+    by cosine similarity to the normalized `query`, among those where
+    `wanted` is True.
+
+    On an event loop a stale index is rebuilt in a worker thread while the
+    old one keeps serving; None means there is no index for these rows yet
+    and the caller should scan them exactly. Elsewhere (scripts, worker
+    threads) a stale index is rebuilt first.
+    """
+    rows = rows if rows is not None else store.rows()
+    if len(rows) <= k:
+        return np.arange(len(rows))
+
+    index = store.ann_index
+    if is_stale(index, rows):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            _schedule_rebuild(store, loop)
+        else:
+            index = refresh_index(store)
+    if index is None or index.generation != rows.generation:
+        return None
+    return index.search(rows, query, k, n_probe=n_probe, wanted=wanted)
@@ -0,0 +1,583 @@
+"""
+Vectorized company/investor scoring.
+
+`calculate_match_score` in matching_algo scores a single pair in pure Python.
+This module encodes whole lists of companies and investors into NumPy arrays
+once (categorical columns as boolean membership matrices, numeric ranges as
+float columns, embeddings as rows of the float32 EmbeddingStore) and scores
+every company against every investor of a batch with a handful of array
+operations.
+
+The arithmetic mirrors `calculate_match_score` step by step, and cosine
+similarity is computed in float64 from the same float32 embeddings it scores.
+The two can then only differ in the last bits of a float64, which matters
+only for a score a hair away from a rounding boundary (x.xx5); those few
+pairs are recomputed one at a time like calculate_match_score does, so every
+score is identical to it.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from embedding_store import (
+    EMBEDDING_STORE,
+    EmbeddingMatrix,
+    cosine_similarities,
+    embedding_similarity,
+)
+
+# --- Lookup Tables (shared with calculate_match_score) ---
+
+EXIT_TIMELINES = {"acquisition": 5, "ipo": 7, "long_term_growth": 10}
+
+REVENUE_STAGE_RANKS = {
+    "pre_revenue": 1,
+    "early_revenue": 2,
+    "break_even": 3,
+    "profitable": 4,
+}
+
+RISK_LEVELS = {
+    "conservative": 1,
+    "moderate": 2,
+    "aggressive": 3,
+    "very_aggressive": 4,
+}
+
+EARLY_STAGES = ["seed", "pre-seed"]
+
+# Unrounded scores (in cents) closer than this to a half cent are recomputed
+# pair by pair; the float64 arithmetic differs from the scalar one by orders
+# of magnitude less
+ROUNDING_TOLERANCE = 1e-6
+
+
+# --- Categorical Vocabulary ---
+
+
+class Vocabulary:
+    """
+    Assigns stable integer column ids to categorical values, per domain
+    (industries, stages, locations, ...).
+
+    Ids only ever grow, so a batch encoded earlier keeps working against
+    values added later: any id outside a batch's matrix width simply means
+    "no entity in this batch has that value".
+    """
+
+    def __init__(self):
+        self._domains: Dict[str, Dict[str, int]] = {}
+
+    def add(self, domain: str, value: Optional[str]) -> int:
+        """Return the id of `value` in `domain`, registering it if new. Falsy values map to -1."""
+        if not value:
+            return -1
+        ids = self._domains.setdefault(domain, {})
+        if value not in ids:
+            ids[value] = len(ids)
+        return ids[value]
+
+    def size(self, domain: str) -> int:
+        return len(self._domains.get(domain, {}))
+
+
+DEFAULT_VOCABULARY = Vocabulary()
+
+
+def _membership_matrix(
+    vocab: Vocabulary, domain: str, rows: Sequence[Sequence[str]]
+) -> np.ndarray:
+    """
+    Encode one list-valued field as a boolean (n_rows, width + 1) matrix.
+    The extra last column is always False and is used as the lookup target
+    for ids that are unknown to this batch.
+    """
+    coords = [
+        (r, vocab.add(domain, value))
+        for r, values in enumerate(rows)
+        for value in values or []
+        if value
+    ]
+    matrix = np.zeros((len(rows), vocab.size(domain) + 1), dtype=bool)
+    if coords:
+        r_idx, c_idx = zip(*coords)
+        matrix[list(r_idx), list(c_idx)] = True
+    return matrix
+
+
+def _id_matrix(
+    vocab: Vocabulary, domain: str, rows: Sequence[Sequence[str]]
+) -> np.ndarray:
+    """Encode one list-valued field as a (n_rows, k) matrix of distinct ids padded with -1."""
+    encoded = [
+        sorted({vocab.add(domain, value) for value in values or [] if value})
+        for values in rows
+    ]
+    width = max([len(ids) for ids in encoded] + [1])
+    matrix = np.full((len(rows), width), -1, dtype=np.int64)
+    for r, ids in enumerate(encoded):
+        matrix[r, : len(ids)] = ids
+    return matrix
+
+
+def _as_dicts(entities: Sequence[Any]) -> List[Dict[str, Any]]:
+    return [e if isinstance(e, dict) else e.model_dump() for e in entities]
+
+
+def _take(batch, positions: np.ndarray):
+    """Subset of an encoded batch: every per-row array and list restricted to `positions`."""
+    n_rows = len(batch)
+    subset = object.__new__(type(batch))
+    for name, value in vars(batch).items():
+        if isinstance(value, np.ndarray) and value.ndim and len(value) == n_rows:
+            value = value[positions]
+        elif isinstance(value, list):
+            value = [value[p] for p in positions]
+        setattr(subset, name, value)
+    return subset
+
+
+def _positions_of_rows(batch, rows: np.ndarray) -> np.ndarray:
+    """Translate embedding store rows into positions within `batch`, in batch order."""
+    wanted = np.zeros(len(batch.embedding_source), dtype=bool)
+    wanted[rows] = True
+    return np.flatnonzero(wanted[batch.embedding_rows])
+
+
+# --- Encoded Batches ---
+
+
+class CompanyBatch:
+    """Column-oriented encoding of a list of companies."""
+
+    def __init__(
+        self,
+        records: List[Dict[str, Any]],
+        vocab: Vocabulary,
+        embeddings: EmbeddingMatrix,
+    ):
+        self.records = records
+        self.vocab = vocab
+        self.ids = [c["id"] for c in records]
+
+        def column(key, fn, dtype):
+            return np.array([fn(c.get(key)) for c in records], dtype=dtype)
+
+        self.industry = column("industry", lambda v: vocab.add("industry", v), np.int64)
+        subs = [c.get("sub_industries") or [] for c in records]
+        self.sub_industries = _id_matrix(vocab, "industry", subs)
+        self.n_sub_industries = np.array([len(s) for s in subs], dtype=np.int64)
+
+        self.business_model = column(
+            "business_model", lambda v: vocab.add("business_model", v), np.int64
+        )
+        self.esg = column("esg_focus", bool, bool)
+
+        self.has_exit = column("exit_strategy", bool, bool)
+        self.exit_timeline = column(
+            "exit_strategy", lambda v: EXIT_TIMELINES.get(v, 7), np.float64
+        )
+
+        self.has_revenue_stage = column("revenue_stage", bool, bool)
+        self.revenue_rank = column(
+            "revenue_stage", lambda v: REVENUE_STAGE_RANKS.get(v, 0), np.int64
+        )
+
+        self.stage = column("stage", lambda v: vocab.add("stage", v), np.int64)
+        self.location = column("location", lambda v: vocab.add("location", v), np.int64)
+
+        focus = [c.get("focus_areas") or [] for c in records]
+        self.focus_areas = _id_matrix(vocab, "focus_area", focus)
+        self.n_focus_areas = np.array([len(f) for f in focus], dtype=np.int64)
+
+        founders = [c.get("founder_types") or [] for c in records]
+        self.founder_types = _id_matrix(vocab, "founder_type", founders)
+        self.n_founder_types = np.array([len(f) for f in founders], dtype=np.int64)
+
+        self.has_risk = column("risk_appetite", bool, bool)
+        self.risk_level = column(
+            "risk_appetite",
+            lambda v: RISK_LEVELS.get(v.lower(), 0) if v else 0,
+            np.int64,
+        )
+
+        self.time_horizon = column(
+            "time_horizon", lambda v: vocab.add("time_horizon", v), np.int64
+        )
+        self.horizon_long = column("time_horizon", lambda v: v == "long_term", bool)
+        self.horizon_short = column("time_horizon", lambda v: v == "short_term", bool)
+
+        self.has_valuation = column(
+            "total_valuation_usd", lambda v: v is not None, bool
+        )
+        self.valuation = column(
+            "total_valuation_usd", lambda v: v if v is not None else 0.0, np.float64
+        )
+
+        # Embeddings stay in the store; the batch keeps their rows
+        self.embedding_store = embeddings
+        self.embedding_source, self.has_embedding, self.embedding_rows = (
+            embeddings.lookup(records)
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def take(self, positions: np.ndarray):
+        return _take(self, positions)
+
+    def restrict_to_rows(self, rows: np.ndarray):
+        """Subset of this batch whose embedding store rows are in `rows`."""
+        return self.take(_positions_of_rows(self, rows))
+
+
+class InvestorBatch:
+    """Column-oriented encoding of a list of investors."""
+
+    def __init__(
+        self,
+        records: List[Dict[str, Any]],
+        vocab: Vocabulary,
+        embeddings: EmbeddingMatrix,
+    ):
+        self.records = records
+        self.vocab = vocab
+        self.ids = [i["id"] for i in records]
+
+        def column(key, fn, dtype):
+            return np.array([fn(i.get(key)) for i in records], dtype=dtype)
+
+        def lists(key):
+            return [i.get(key) or [] for i in records]
+
+        industries = lists("preferred_industries")
+        self.preferred_industries = _membership_matrix(vocab, "industry", industries)
+        self.has_preferred_industries = np.array(
+            [bool(x) for x in industries], dtype=bool
+        )
+
+        excluded = lists("excluded_industries")
+        self.excluded_industries = _membership_matrix(vocab, "industry", excluded)
+
+        models = lists("business_model_focus")
+        self.business_models = _membership_matrix(vocab, "business_model", models)
+        self.has_business_models = np.array([bool(x) for x in models], dtype=bool)
+
+        self.esg = column("esg_mandate", bool, bool)
+
+        self.has_exit_timeline = column("exit_timeline_years", bool, bool)
+        self.exit_timeline = column(
+            "exit_timeline_years", lambda v: v if v else 0, np.float64
+        )
+
+        stages = lists("preferred_stages")
+        self.early_stage = np.array(
+            [any(s in EARLY_STAGES for s in x) for x in stages], dtype=bool
+        )
+        self.stages = _membership_matrix(vocab, "stage", stages)
+        self.has_stages = np.array([bool(x) for x in stages], dtype=bool)
+
+        locations = lists("preferred_locations")
+        self.locations = _membership_matrix(vocab, "location", locations)
+        self.has_locations = np.array([bool(x) for x in locations], dtype=bool)
+        self.accepts_remote = np.array(["Remote" in x for x in locations], dtype=bool)
+
+        focus = lists("preferred_focus_areas")
+        self.focus_areas = _membership_matrix(vocab, "focus_area", focus)
+        self.has_focus_areas = np.array([bool(x) for x in focus], dtype=bool)
+
+        founders = lists("preferred_founder_types")
+        self.founder_types = _membership_matrix(vocab, "founder_type", founders)
+        self.n_founder_types = np.array([len(x) for x in founders], dtype=np.int64)
+
+        self.has_risk = column("risk_appetite", bool, bool)
+        self.risk_level = column(
+            "risk_appetite",
+            lambda v: RISK_LEVELS.get(v.lower(), 0) if v else 0,
+            np.int64,
+        )
+
+        horizons = lists("preferred_time_horizon")
+        self.time_horizons = _membership_matrix(vocab, "time_horizon", horizons)
+        self.has_time_horizons = np.array([bool(x) for x in horizons], dtype=bool)
+        self.accepts_medium_term = np.array(
+            ["medium_term" in x for x in horizons], dtype=bool
+        )
+
+        min_inv = [i.get("min_investment_usd") for i in records]
+        max_inv = [i.get("max_investment_usd") for i in records]
+        self.min_investment = np.array(
+            [v if v is not None else 0 for v in min_inv], dtype=np.float64
+        )
+        self.max_investment = np.array(
+            [v if v is not None else float("inf") for v in max_inv], dtype=np.float64
+        )
+        self.no_investment_range = np.array(
+            [lo is None and hi is None for lo, hi in zip(min_inv, max_inv)], dtype=bool
+        )
+
+        # Embeddings stay in the store; the batch keeps their rows
+        self.embedding_store = embeddings
+        self.embedding_source, self.has_embedding, self.embedding_rows = (
+            embeddings.lookup(records)
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def take(self, positions: np.ndarray):
+        return _take(self, positions)
+
+    def restrict_to_rows(self, rows: np.ndarray):
+        """Subset of this batch whose embedding store rows are in `rows`."""
+        return self.take(_positions_of_rows(self, rows))
+
+
+def encode_companies(
+    companies: Sequence[Any],
+    vocab: Optional[Vocabulary] = None,
+    embeddings: Optional[EmbeddingMatrix] = None,
+) -> CompanyBatch:
+    """Encode Company models (or dicts) into a CompanyBatch."""
+    return CompanyBatch(
+        _as_dicts(companies),
+        vocab or DEFAULT_VOCABULARY,
+        embeddings if embeddings is not None else EMBEDDING_STORE.companies,
+    )
+
+
+def encode_investors(
+    investors: Sequence[Any],
+    vocab: Optional[Vocabulary] = None,
+    embeddings: Optional[EmbeddingMatrix] = None,
+) -> InvestorBatch:
+    """Encode Investor models (or dicts) into an InvestorBatch."""
+    return InvestorBatch(
+        _as_dicts(investors),
+        vocab or DEFAULT_VOCABULARY,
+        embeddings if embeddings is not None else EMBEDDING_STORE.investors,
+    )
+
+
+# --- Vectorized Score Calculation ---
+
+
+def _lookup_columns(matrix: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Map ids to columns of a membership matrix; unknown ids hit the all-False last column."""
+    width = matrix.shape[1] - 1
+    return np.where((ids >= 0) & (ids < width), ids, width)
+
+
+def _contains(matrix: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """(C,) ids against an (I, W+1) membership matrix -> (C, I) bool."""
+    return matrix[:, _lookup_columns(matrix, ids)].T
+
+
+def _overlap(matrix: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """(C, K) distinct ids against an (I, W+1) membership matrix -> (C, I) intersection sizes."""
+    return matrix[:, _lookup_columns(matrix, ids)].sum(axis=2).T
+
+
+def score_matrix(
+    companies: CompanyBatch, investors: InvestorBatch, weights: Dict[str, float]
+) -> np.ndarray:
+    """
+    Score every company in `companies` against every investor in `investors`.
+    Returns a (n_companies, n_investors) float64 array of normalized scores
+    (0-100, rounded to 2 decimals), identical to calculate_match_score.
+    """
+    c, i, w = companies, investors, weights
+    shape = (len(c), len(i))
+    zero = np.zeros(shape)
+    score = np.zeros(shape)
+    max_possible_score = sum([weight for weight in w.values() if weight > 0])
+
+    def col(a):
+        return a[:, np.newaxis]
+
+    def row(a):
+        return a[np.newaxis, :]
+
+    # --- Industry / Excluded Industry ---
+    has_industry = col(c.industry >= 0)
+    excluded = has_industry & _contains(i.excluded_industries, c.industry)
+    pref_industries = row(i.has_preferred_industries)
+    industry_match = _contains(i.preferred_industries, c.industry)
+    score += np.where(
+        has_industry & pref_industries,
+        np.where(industry_match, w["industry"], 0.0),
+        np.where(has_industry, w["industry"] * 0.5, 0.0),
+    )
+
+    # --- Sub-Industry Match ---
+    n_subs = col(c.n_sub_industries)
+    sub_matches = _overlap(i.preferred_industries, c.sub_industries)
+    sub_overlap = sub_matches / np.maximum(n_subs, 1)
+    score += np.where(
+        (n_subs > 0) & pref_industries & (sub_matches > 0),
+        w["sub_industry"] * np.minimum(sub_overlap * 1.5, 1.0),
+        zero,
+    )
+
+    # --- Business Model Match ---
+    score += np.where(
+        col(c.business_model >= 0)
+        & row(i.has_business_models)
+        & _contains(i.business_models, c.business_model),
+        w["business_model"],
+        0.0,
+    )
+
+    # --- ESG Alignment ---
+    investor_esg = row(i.esg)
+    company_esg = col(c.esg)
+    score += np.where(
+        investor_esg,
+        np.where(company_esg, w["esg_alignment"], -w["esg_alignment"]),
+        0.0,
+    )
+
+    # --- Exit Strategy Alignment ---
+    timeline_diff = np.abs(col(c.exit_timeline) - row(i.exit_timeline))
+    exit_applies = col(c.has_exit) & row(i.has_exit_timeline)
+    score += np.where(
+        exit_applies & (timeline_diff <= 2),
+        w["exit_alignment"],
+        np.where(exit_applies & (timeline_diff <= 4), w["exit_alignment"] * 0.5, 0.0),
+    )
+
+    # --- Revenue Stage Match ---
+    rev_rank = col(c.revenue_rank)
+    early = row(i.early_stage)
+    rev_full = (early & (rev_rank <= 2)) | (~early & (rev_rank >= 3))
+    score += np.where(
+        col(c.has_revenue_stage),
+        np.where(
+            rev_full,
+            w["revenue_stage"],
+            np.where(rev_rank == 2, w["revenue_stage"] * 0.5, 0.0),
+        ),
+        0.0,
+    )
+
+    # --- Stage Match ---
+    has_stage = col(c.stage >= 0)
+    investor_stages = row(i.has_stages)
+    score += np.where(
+        has_stage & investor_stages,
+        np.where(_contains(i.stages, c.stage), w["stage"], 0.0),
+        np.where(has_stage, w["stage"] * 0.5, 0.0),
+    )
+
+    # --- Location Match ---
+    # A "Remote" company only matches investors accepting Remote; any other
+    # location matches its own country or Remote-friendly investors.
+    has_location = col(c.location >= 0)
+    investor_locations = row(i.has_locations)
+    location_match = _contains(i.locations, c.location) | row(i.accepts_remote)
+    score += np.where(
+        has_location & investor_locations,
+        np.where(location_match, w["location"], 0.0),
+        np.where(has_location, w["location"] * 0.5, 0.0),
+    )
+
+    # --- Focus Areas Match ---
+    n_focus = col(c.n_focus_areas)
+    investor_focus = row(i.has_focus_areas)
+    focus_matches = _overlap(i.focus_areas, c.focus_areas)
+    focus_overlap = focus_matches / np.maximum(n_focus, 1)
+    score += np.where(
+        (n_focus > 0) & investor_focus,
+        np.where(
+            focus_matches > 0,
+            w["focus_areas"] * np.minimum(focus_overlap * 1.5, 1.0),
+            0.0,
+        ),
+        np.where(n_focus > 0, w["focus_areas"] * 0.3, 0.0),
+    )
+
+    # --- Founder Types Match ---
+    n_founders = col(c.n_founder_types)
+    n_pref_founders = row(i.n_founder_types)
+    founder_matches = _overlap(i.founder_types, c.founder_types)
+    founder_overlap = founder_matches / np.maximum(n_pref_founders, 1)
+    score += np.where(
+        (n_founders > 0) & (n_pref_founders > 0),
+        np.where(
+            founder_matches > 0,
+            w["founder_types"] * np.minimum(founder_overlap * 1.5, 1.0),
+            0.0,
+        ),
+        np.where(n_founders > 0, w["founder_types"] * 0.2, 0.0),
+    )
+
+    # --- Risk Appetite Match ---
+    risk_diff = np.abs(col(c.risk_level) - row(i.risk_level))
+    risk_applies = col(c.has_risk) & row(i.has_risk)
+    score += np.where(
+        risk_applies & (risk_diff == 0),
+        w["risk_appetite"],
+        np.where(risk_applies & (risk_diff == 1), w["risk_appetite"] * 0.5, 0.0),
+    )
+
+    # --- Time Horizon Match ---
+    horizon_applies = col(c.time_horizon >= 0) & row(i.has_time_horizons)
+    horizon_partial = (col(c.horizon_long) | col(c.horizon_short)) & row(
+        i.accepts_medium_term
+    )
+    score += np.where(
+        horizon_applies,
+        np.where(
+            _contains(i.time_horizons, c.time_horizon),
+            w["time_horizon"],
+            np.where(horizon_partial, w["time_horizon"] * 0.5, 0.0),
+        ),
+        0.0,
+    )
+
+    # --- Investment Range Match ---
+    valuation = col(c.valuation)
+    plausible_min = valuation * 0.005
+    plausible_max = valuation * 0.15
+    ranges_overlap = np.maximum(plausible_min, row(i.min_investment)) <= np.minimum(
+        plausible_max, row(i.max_investment)
+    )
+    score += np.where(
+        col(c.has_valuation) & (ranges_overlap | row(i.no_investment_range)),
+        w["valuation"],
+        0.0,
+    )
+
+    # --- Embedding Similarity ---
+    total = score
+    both = col(c.has_embedding) & row(i.has_embedding)
+    if c.embedding_source.dim and i.embedding_source.dim and both.any():
+        similarity = cosine_similarities(
+            c.embedding_source, c.embedding_rows, i.embedding_source, i.embedding_rows
+        )
+        total = score + np.where(both, w["embedding"] * np.maximum(0, similarity), 0.0)
+
+    # Normalize score to be between 0 and 100
+    normalized = np.maximum(0, np.minimum(total / max_possible_score, 1.0)) * 100
+    cents = normalized * 100
+    rounded = np.rint(cents) / 100
+
+    # Near a half cent, round() (which rounds the exact decimal value) and the
+    # scalar similarity decide; recompute those pairs exactly as they do
+    near_half = np.abs(cents - np.floor(cents) - 0.5) < ROUNDING_TOLERANCE
+    for r, k in zip(*np.nonzero(near_half)):
+        pair_score = score[r, k]
+        if both[r, k]:
+            pair_similarity = embedding_similarity(
+                c.embedding_source.vectors[c.embedding_rows[r]],
+                i.embedding_source.vectors[i.embedding_rows[k]],
+            )
+            pair_score += w["embedding"] * max(0, pair_similarity)
+        rounded[r, k] = round(
+            max(0, min(pair_score / max_possible_score, 1.0)) * 100, 2
+        )
+
+    # Excluded industries are an automatic zero
+    rounded[excluded] = 0.0
+    return rounded
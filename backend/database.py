@@ -1,13 +1,34 @@
 import aiosqlite
 import json
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import numpy as np
 from models import Company, Investor
+from embedding_store import EMBEDDING_STORE
+
+# Embeddings are stored as raw little-endian float32 bytes
+EMBEDDING_BLOB_DTYPE = np.dtype("<f4")
+
+
+def embedding_to_blob(embedding) -> Optional[bytes]:
+    """Serialize an embedding (list or array) to a float32 BLOB."""
+    if embedding is None:
+        return None
+    return np.asarray(embedding, dtype=EMBEDDING_BLOB_DTYPE).tobytes()
+
+
+def embedding_from_blob(blob: Optional[bytes]) -> Optional[np.ndarray]:
+    """Read-only float32 view over a BLOB, without copying or building a list."""
+    if blob is None:
+        return None
+    return np.frombuffer(blob, dtype=EMBEDDING_BLOB_DTYPE)
 
 
 class Database:
     def __init__(self, db_path: str = "sharewave_db_new.sqlite"):
         self.db_path = db_path
         self.db = None
+        # MatchingSnapshot kept up to date by save_company/save_investor
+        self.snapshot = None
 
     async def connect(self):
         """Connect to the database and create tables if they don't exist."""
@@ -16,6 +37,7 @@ class Database:
             # Enable foreign keys
             await self.db.execute("PRAGMA foreign_keys = ON")
             await self._create_tables()
+            await self._migrate_embeddings()
             print("Database connection established successfully")
         except Exception as e:
             print(f"Error connecting to database: {str(e)}")
@@ -48,7 +70,7 @@ class Database:
                 risk_appetite TEXT,
                 time_horizon TEXT,
                 esg_focus INTEGER,
-                embedding TEXT  -- Store as JSON string
+                embedding BLOB  -- Raw float32 bytes
             )
             """)
             await self.db.execute("""
@@ -70,7 +92,25 @@ class Database:
                 preferred_founder_types TEXT,
                 risk_appetite TEXT,
                 preferred_time_horizon TEXT,
-                embedding TEXT  -- Store as JSON string
+                embedding BLOB  -- Raw float32 bytes
+            )
+            """)
+            await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS match_results (
+                entity_type TEXT NOT NULL,  -- 'company' or 'investor'
+                entity_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                match_id TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (entity_type, entity_id, rank)
+            )
+            """)
+            await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS match_fingerprints (
+                entity_type TEXT NOT NULL,  -- 'company', 'investor' or 'config'
+                entity_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,  -- Content hash at the last precompute run
+                PRIMARY KEY (entity_type, entity_id)
             )
             """)
             await self.db.commit()
@@ -79,6 +119,40 @@ class Database:
             print(f"Error creating tables: {str(e)}")
             raise
 
+    async def _migrate_embeddings(self):
+        """
+        Convert embeddings written by older versions as JSON text into
+        float32 BLOBs. Rows already stored as BLOBs are left untouched, so
+        this is a no-op once a database has been migrated.
+        """
+        converted = 0
+        for table in ("company", "investors"):
+            cursor = await self.db.execute(
+                f"SELECT id, embedding FROM {table} WHERE typeof(embedding) = 'text'"
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+
+            updates = []
+            for entity_id, embedding_json in rows:
+                try:
+                    blob = embedding_to_blob(json.loads(embedding_json))
+                except (json.JSONDecodeError, TypeError, ValueError):
+                    blob = None
+                updates.append((blob, entity_id))
+
+            if updates:
+                await self.db.executemany(
+                    f"UPDATE {table} SET embedding = ? WHERE id = ?", updates
+                )
+                converted += len(updates)
+
+        if converted:
+            await self.db.commit()
+            # Reclaim the space previously taken by the JSON text
+            await self.db.execute("VACUUM")
+            print(f"Migrated {converted} embeddings from JSON to float32 BLOBs")
+
     async def company_name_exists(self, name: str) -> bool:
         """Check if a company with the given name already exists."""
         cursor = await self.db.execute(
@@ -98,9 +172,6 @@ class Database:
     async def save_company(self, company: Company):
         """Save a company to the database."""
         try:
-            embedding_json = (
-                json.dumps(company.embedding) if company.embedding else None
-            )
 
             await self.db.execute(
                 """
@@ -135,10 +206,14 @@ class Database:
                     company.risk_appetite,
                     company.time_horizon,
                     # company.expected_exit,
-                    embedding_json,
+                    embedding_to_blob(company.embedding),
                 ),
             )
             await self.db.commit()
+            EMBEDDING_STORE.companies.upsert(company.id, company.embedding)
+            if self.snapshot is not None:
+                # Re-read so the snapshot holds exactly the persisted columns
+                self.snapshot.upsert_company(await self.get_company_by_id(company.id))
             print(f"Company saved: {company.name} (ID: {company.id})")
         except Exception as e:
             print(f"Error saving company: {str(e)}")
@@ -184,90 +259,197 @@ class Database:
                     json.dumps(investor.preferred_founder_types),
                     investor.risk_appetite,
                     json.dumps(investor.preferred_time_horizon),
-                    json.dumps(investor.embedding) if investor.embedding else None,
+                    embedding_to_blob(investor.embedding),
                 ),
             )
             await self.db.commit()
+            EMBEDDING_STORE.investors.upsert(investor.id, investor.embedding)
+            if self.snapshot is not None:
+                self.snapshot.upsert_investor(
+                    await self.get_investor_by_id(investor.id)
+                )
             print(f"Investor saved: {investor.name} (ID: {investor.id})")
         except Exception as e:
             print(f"Error saving investor: {str(e)}")
             raise
 
-    async def get_all_companies(self) -> List[Company]:
-        """Get all companies from the database."""
-        cursor = await self.db.execute("SELECT * FROM company")
-        rows = await cursor.fetchall()
-        companies = []
-
-        for row in rows:
-            company_data = dict(zip([column[0] for column in cursor.description], row))
-
-            # Parse JSON fields
-            json_fields = ["sub_industries", "focus_areas", "founder_types"]
-            for field in json_fields:
-                if field in company_data and company_data[field]:
-                    try:
-                        company_data[field] = json.loads(company_data[field])
-                    except json.JSONDecodeError:
-                        company_data[field] = []
-                else:
+    @staticmethod
+    def _company_from_row(columns: List[str], row) -> Company:
+        """Build a Company from a `company` table row."""
+        company_data = dict(zip(columns, row))
+
+        # Parse JSON fields
+        json_fields = ["sub_industries", "focus_areas", "founder_types"]
+        for field in json_fields:
+            if field in company_data and company_data[field]:
+                try:
+                    company_data[field] = json.loads(company_data[field])
+                except json.JSONDecodeError:
                     company_data[field] = []
+            else:
+                company_data[field] = []
+
+        # Convert SQLite integer to boolean
+        if "esg_focus" in company_data:
+            company_data["esg_focus"] = bool(company_data["esg_focus"])
+
+        company_data["embedding"] = embedding_from_blob(company_data.get("embedding"))
+
+        return Company(**company_data)
 
-            # Convert SQLite integer to boolean
-            if "esg_focus" in company_data:
-                company_data["esg_focus"] = bool(company_data["esg_focus"])
+    @staticmethod
+    def _investor_from_row(columns: List[str], row) -> Investor:
+        """Build an Investor from an `investors` table row."""
+        investor_data = dict(zip(columns, row))
 
-            # Parse embedding if exists
-            if company_data.get("embedding"):
+        # Parse JSON fields
+        json_fields = [
+            "preferred_industries",
+            "excluded_industries",
+            "preferred_stages",
+            "preferred_locations",
+            "business_model_focus",
+            "preferred_focus_areas",
+            "preferred_founder_types",
+            "preferred_time_horizon",
+        ]
+        for field in json_fields:
+            if field in investor_data and investor_data[field]:
                 try:
-                    company_data["embedding"] = json.loads(company_data["embedding"])
+                    investor_data[field] = json.loads(investor_data[field])
                 except json.JSONDecodeError:
-                    company_data["embedding"] = None
+                    investor_data[field] = []
+            else:
+                investor_data[field] = []
+
+        # Convert SQLite integer to boolean
+        if "esg_mandate" in investor_data:
+            investor_data["esg_mandate"] = bool(investor_data["esg_mandate"])
+
+        investor_data["embedding"] = embedding_from_blob(investor_data.get("embedding"))
+
+        return Investor(**investor_data)
 
-            companies.append(Company(**company_data))
+    async def get_company_by_id(self, company_id: str) -> Optional[Company]:
+        """Get a single company by primary key, or None if it does not exist."""
+        cursor = await self.db.execute(
+            "SELECT * FROM company WHERE id = ?", (company_id,)
+        )
+        row = await cursor.fetchone()
+        columns = [column[0] for column in cursor.description]
+        await cursor.close()
+        return self._company_from_row(columns, row) if row else None
 
-        return companies
+    async def get_investor_by_id(self, investor_id: str) -> Optional[Investor]:
+        """Get a single investor by primary key, or None if it does not exist."""
+        cursor = await self.db.execute(
+            "SELECT * FROM investors WHERE id = ?", (investor_id,)
+        )
+        row = await cursor.fetchone()
+        columns = [column[0] for column in cursor.description]
+        await cursor.close()
+        return self._investor_from_row(columns, row) if row else None
+
+    async def get_all_companies(self) -> List[Company]:
+        """Get all companies from the database."""
+        cursor = await self.db.execute("SELECT * FROM company")
+        rows = await cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+        return [self._company_from_row(columns, row) for row in rows]
 
     async def get_all_investors(self) -> List[Investor]:
         """Get all investors from the database."""
         cursor = await self.db.execute("SELECT * FROM investors")
         rows = await cursor.fetchall()
-        investors = []
-
-        for row in rows:
-            investor_data = dict(zip([column[0] for column in cursor.description], row))
-
-            # Parse JSON fields
-            json_fields = [
-                "preferred_industries",
-                "excluded_industries",
-                "preferred_stages",
-                "preferred_locations",
-                "business_model_focus",
-                "preferred_focus_areas",
-                "preferred_founder_types",
-                "preferred_time_horizon",
-            ]
-            for field in json_fields:
-                if field in investor_data and investor_data[field]:
-                    try:
-                        investor_data[field] = json.loads(investor_data[field])
-                    except json.JSONDecodeError:
-                        investor_data[field] = []
-                else:
-                    investor_data[field] = []
+        columns = [column[0] for column in cursor.description]
+        return [self._investor_from_row(columns, row) for row in rows]
 
-            # Convert SQLite integer to boolean
-            if "esg_mandate" in investor_data:
-                investor_data["esg_mandate"] = bool(investor_data["esg_mandate"])
+    async def get_match_fingerprints(self) -> Dict[str, Dict[str, str]]:
+        """Fingerprints recorded by the last precompute run, per entity type."""
+        cursor = await self.db.execute(
+            "SELECT entity_type, entity_id, fingerprint FROM match_fingerprints"
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        fingerprints: Dict[str, Dict[str, str]] = {}
+        for entity_type, entity_id, fingerprint in rows:
+            fingerprints.setdefault(entity_type, {})[entity_id] = fingerprint
+        return fingerprints
 
-            # Parse embedding if exists
-            if investor_data.get("embedding"):
-                try:
-                    investor_data["embedding"] = json.loads(investor_data["embedding"])
-                except json.JSONDecodeError:
-                    investor_data["embedding"] = None
+    async def get_match_results(
+        self, entity_type: str
+    ) -> Dict[str, List[Tuple[str, float]]]:
+        """Precomputed (match_id, score) lists for every entity of a type, best first."""
+        cursor = await self.db.execute(
+            """
+            SELECT entity_id, match_id, score FROM match_results
+            WHERE entity_type = ? ORDER BY entity_id, rank
+            """,
+            (entity_type,),
+        )
+        rows = await cursor.fetchall()
+        await cursor.close()
+        results: Dict[str, List[Tuple[str, float]]] = {}
+        for entity_id, match_id, score in rows:
+            results.setdefault(entity_id, []).append((match_id, score))
+        return results
+
+    async def save_match_run(
+        self,
+        results: Dict[str, Dict[str, List[Tuple[str, float]]]],
+        fingerprints: Dict[str, Dict[str, str]],
+        removed: Dict[str, List[str]],
+    ):
+        """
+        Persist one precompute run in a single transaction: replace the
+        result lists and fingerprints of the recomputed entities and drop
+        everything stored for removed ones.
+        """
+        try:
+            for entity_type, ids in removed.items():
+                stale = [(entity_type, entity_id) for entity_id in ids]
+                await self.db.executemany(
+                    "DELETE FROM match_results WHERE entity_type = ? AND entity_id = ?",
+                    stale,
+                )
+                await self.db.executemany(
+                    "DELETE FROM match_fingerprints WHERE entity_type = ? AND entity_id = ?",
+                    stale,
+                )
+
+            for entity_type, entity_results in results.items():
+                await self.db.executemany(
+                    "DELETE FROM match_results WHERE entity_type = ? AND entity_id = ?",
+                    [(entity_type, entity_id) for entity_id in entity_results],
+                )
+                await self.db.executemany(
+                    """
+                    INSERT INTO match_results (entity_type, entity_id, rank, match_id, score)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (entity_type, entity_id, rank, match_id, score)
+                        for entity_id, matches in entity_results.items()
+                        for rank, (match_id, score) in enumerate(matches)
+                    ],
+                )
 
-            investors.append(Investor(**investor_data))
+            for entity_type, entity_fingerprints in fingerprints.items():
+                await self.db.executemany(
+                    """
+                    INSERT INTO match_fingerprints (entity_type, entity_id, fingerprint)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(entity_type, entity_id) DO UPDATE SET
+                        fingerprint = excluded.fingerprint
+                    """,
+                    [
+                        (entity_type, entity_id, fingerprint)
+                        for entity_id, fingerprint in entity_fingerprints.items()
+                    ],
+                )
 
-        return investors
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            print(f"Error saving match results: {str(e)}")
+            raise
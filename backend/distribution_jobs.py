@@ -0,0 +1,418 @@
+"""
+Durable, resumable token distribution jobs.
+
+A distribution is planned (every Payment signed with its sequence and hash)
+and written to the database before anything is submitted. The job then
+moves through persisted steps in a background task:
+
+    submitting -> confirming -> creating_amm -> completed
+    submitting -> confirming -> failed (some transfers did not apply)
+
+Progress (engine results, validated results, the last ledger scanned for
+confirmations) is committed after every poll, and a shareholder's
+tokens_distributed flag is set in the same commit as the validated result
+of its Payment. After a restart, unfinished jobs resume from their stored
+step: resubmitting a stored blob cannot pay twice (same hash, same
+sequence), and confirmation continues scanning the issuer's ledger history
+by hash from where it stopped. Transfers that did not apply are
+provably dead once their LastLedgerSequence has passed, so a new job only
+plans shareholders still lacking tokens. A job that failed early because
+transfers were blocked behind an unused sequence keeps standing in the way
+of a new one until that ledger is validated.
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from token_distribution import (
+    BLOCKED_PREFIX,
+    DISTRIBUTION_POLL_INTERVAL,
+    confirm_transfers,
+    is_blocked,
+    plan_distribution,
+    submit_transfers,
+    validated_ledger_index,
+)
+
+ACTIVE_STATUSES = ("submitting", "confirming", "creating_amm")
+
+_TX_COLUMNS = (
+    "destination",
+    "value",
+    "tx_hash",
+    "sequence",
+    "tx_blob",
+    "engine_result",
+    "final_result",
+    "validated_ledger",
+)
+
+
+async def create_distribution_tables(db: aiosqlite.Connection):
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS distribution_jobs (
+        id TEXT PRIMARY KEY,
+        company_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        issuer_address TEXT,
+        start_ledger INTEGER,
+        last_ledger INTEGER,  -- LastLedgerSequence of every planned Payment
+        scanned_ledger INTEGER,  -- Confirmations read up to this ledger
+        amm_result TEXT,  -- JSON
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS distribution_transactions (
+        job_id TEXT NOT NULL,
+        shareholder_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        destination TEXT,
+        value TEXT,
+        tx_hash TEXT,
+        sequence INTEGER,
+        tx_blob TEXT,  -- Signed Payment, resubmittable as is
+        engine_result TEXT,
+        final_result TEXT,
+        validated_ledger INTEGER,
+        PRIMARY KEY (job_id, shareholder_id)
+    )
+    """)
+    await db.commit()
+
+
+class DistributionJobs:
+    """Creates distribution jobs and runs them as background tasks."""
+
+    def __init__(
+        self,
+        db: aiosqlite.Connection,
+        client,
+        create_amm: Callable[[str], Awaitable[dict]],
+        poll_interval: float = DISTRIBUTION_POLL_INTERVAL,
+    ):
+        self.db = db
+        self.client = client
+        # create_amm(company_id): creates the pool (if missing) and marks the
+        # company distributed; must be safe to call again after a crash
+        self.create_amm = create_amm
+        self.poll_interval = poll_interval
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._create_lock = asyncio.Lock()
+
+    async def start(
+        self,
+        company_id: str,
+        issuer_seed: str,
+        currency_hex: str,
+        transfers: List[Tuple[str, str, str]],
+    ) -> dict:
+        """
+        Plan and persist a job paying `transfers` ([(shareholder_id,
+        destination, value)]) and run it in the background. If the company
+        already has an unfinished job, that one is (re)started instead; a
+        failed job whose blocked transfers could still apply is returned as
+        is, without planning anything.
+        """
+        async with self._create_lock:
+            active = await self.get_active_job(company_id)
+            if active is not None:
+                self._run_in_background(active["id"])
+                return active
+            blocking = await self.get_blocking_job(company_id)
+            if blocking is not None:
+                return blocking
+
+            job_id = str(uuid.uuid4())
+            plan = await plan_distribution(
+                self.client,
+                issuer_seed,
+                currency_hex,
+                [(destination, value) for _, destination, value in transfers],
+            )
+            # Written before anything is submitted
+            await self.db.execute(
+                """
+                INSERT INTO distribution_jobs (
+                    id, company_id, status, issuer_address, start_ledger,
+                    last_ledger, scanned_ledger
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job_id,
+                    company_id,
+                    "submitting",
+                    plan["issuer_addr"],
+                    plan["start_ledger"],
+                    plan["last_ledger"],
+                    plan["start_ledger"],
+                ),
+            )
+            await self.db.executemany(
+                f"""
+                INSERT INTO distribution_transactions (
+                    job_id, shareholder_id, position, {", ".join(_TX_COLUMNS)}
+                )
+                VALUES (?, ?, ?, {", ".join("?" * len(_TX_COLUMNS))})
+                """,
+                [
+                    (job_id, shareholder_id, position)
+                    + tuple(result[c] for c in _TX_COLUMNS)
+                    for position, ((shareholder_id, _, _), result) in enumerate(
+                        zip(transfers, plan["results"])
+                    )
+                ],
+            )
+            await self.db.commit()
+
+        self._run_in_background(job_id)
+        return await self.get_job(job_id)
+
+    async def resume_all(self):
+        """Restart every unfinished job, e.g. on application startup."""
+        async with self.db.execute(
+            "SELECT id FROM distribution_jobs WHERE status IN (?, ?, ?)",
+            ACTIVE_STATUSES,
+        ) as cursor:
+            rows = await cursor.fetchall()
+        for (job_id,) in rows:
+            print(f"Resuming distribution job {job_id}")
+            self._run_in_background(job_id)
+
+    def cancel_all(self):
+        # Progress is persisted; cancelled jobs resume on the next start
+        for task in self.tasks.values():
+            task.cancel()
+
+    def _run_in_background(self, job_id: str):
+        task = self.tasks.get(job_id)
+        if task is None or task.done():
+            self.tasks[job_id] = asyncio.create_task(self.run(job_id))
+
+    async def run(self, job_id: str):
+        """Drive a job from its stored step to completion or failure."""
+        try:
+            job = await self.get_job(job_id, include_blobs=True)
+            if job["status"] == "submitting":
+                await self._submit(job)
+            if job["status"] == "confirming":
+                await self._confirm(job)
+            if job["status"] == "creating_amm":
+                amm_result = await self.create_amm(job["company_id"])
+                await self._set_status(
+                    job, "completed", amm_result=json.dumps(amm_result)
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Status is left as is, so the job resumes from the same step
+            print(f"Error running distribution job {job_id}: {str(e)}")
+            await self.db.execute(
+                """
+                UPDATE distribution_jobs
+                SET error=?, updated_at=CURRENT_TIMESTAMP
+                WHERE id=?
+                """,
+                (str(e), job_id),
+            )
+            await self.db.commit()
+
+    async def _submit(self, job: dict):
+        # Blobs without a recorded engine result may or may not have reached
+        # the server before a crash; sending them again is harmless
+        unsent = [
+            r
+            for r in job["transactions"]
+            if r["tx_blob"] and r["engine_result"] is None and not r["final_result"]
+        ]
+        await submit_transfers(self.client, unsent)
+        await self._save_transactions(job, job["transactions"])
+        await self._set_status(job, "confirming")
+
+    async def _confirm(self, job: dict):
+        plan = {
+            "issuer_addr": job["issuer_address"],
+            "last_ledger": job["last_ledger"],
+            "results": job["transactions"],
+        }
+
+        async def on_progress(results, scanned_ledger):
+            job["scanned_ledger"] = scanned_ledger
+            await self._save_transactions(job, results)
+
+        await confirm_transfers(
+            self.client,
+            plan,
+            job["scanned_ledger"] + 1,
+            poll_interval=self.poll_interval,
+            on_progress=on_progress,
+        )
+        await self._save_transactions(job, job["transactions"])
+
+        failed = [r for r in job["transactions"] if r["final_result"] != "tesSUCCESS"]
+        blocked = [r for r in failed if is_blocked(r)]
+        if blocked:
+            await self._set_status(
+                job,
+                "failed",
+                error=f"{len(failed)} transfers did not succeed, {len(blocked)} "
+                "of them held behind a rejected sequence; start a new "
+                f"distribution to retry them after ledger {job['last_ledger']}",
+            )
+        elif failed:
+            await self._set_status(
+                job,
+                "failed",
+                error=f"{len(failed)} transfers did not succeed; "
+                "start a new distribution to retry them",
+            )
+        else:
+            await self._set_status(job, "creating_amm")
+
+    async def _save_transactions(self, job: dict, results: List[dict]):
+        """Persist results and the scan mark, flagging paid shareholders in the same commit."""
+        await self.db.executemany(
+            """
+            UPDATE distribution_transactions
+            SET engine_result=?, final_result=?, validated_ledger=?
+            WHERE job_id=? AND shareholder_id=?
+            """,
+            [
+                (
+                    r["engine_result"],
+                    r["final_result"],
+                    r["validated_ledger"],
+                    job["id"],
+                    r["shareholder_id"],
+                )
+                for r in results
+            ],
+        )
+        await self.db.executemany(
+            "UPDATE shareholders SET tokens_distributed=1 WHERE id=?",
+            [
+                (r["shareholder_id"],)
+                for r in results
+                if r["final_result"] == "tesSUCCESS"
+            ],
+        )
+        await self.db.execute(
+            """
+            UPDATE distribution_jobs
+            SET scanned_ledger=?, updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+            """,
+            (job["scanned_ledger"], job["id"]),
+        )
+        await self.db.commit()
+
+    async def _set_status(self, job: dict, status: str, **fields):
+        job["status"] = status
+        fields["status"] = status
+        assignments = "".join(f"{column}=?, " for column in fields)
+        await self.db.execute(
+            f"""
+            UPDATE distribution_jobs
+            SET {assignments}updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+            """,
+            (*fields.values(), job["id"]),
+        )
+        await self.db.commit()
+
+    async def get_active_job(self, company_id: str) -> Optional[dict]:
+        async with self.db.execute(
+            """
+            SELECT id FROM distribution_jobs
+            WHERE company_id=? AND status IN (?, ?, ?)
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (company_id, *ACTIVE_STATUSES),
+        ) as cursor:
+            row = await cursor.fetchone()
+        return await self.get_job(row[0]) if row else None
+
+    async def get_blocking_job(self, company_id: str) -> Optional[dict]:
+        """
+        The company's latest failed job if it has blocked transfers and their
+        LastLedgerSequence is not validated yet: they would still apply if a
+        new job spent the sequence they wait on.
+        """
+        async with self.db.execute(
+            """
+            SELECT id, last_ledger FROM distribution_jobs AS job
+            WHERE company_id=? AND status='failed' AND EXISTS (
+                SELECT 1 FROM distribution_transactions
+                WHERE job_id=job.id AND final_result LIKE ?
+            )
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (company_id, BLOCKED_PREFIX + "%"),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if not row or await validated_ledger_index(self.client) >= row[1]:
+            return None
+        return await self.get_job(row[0])
+
+    async def get_job(self, job_id: str, include_blobs: bool = False) -> Optional[dict]:
+        """The job with its transactions, or None if it doesn't exist."""
+        async with self.db.execute(
+            """
+            SELECT id, company_id, status, issuer_address, start_ledger,
+                   last_ledger, scanned_ledger, amm_result, error,
+                   created_at, updated_at
+            FROM distribution_jobs
+            WHERE id=?
+            """,
+            (job_id,),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if not row:
+            return None
+        job = dict(
+            zip(
+                (
+                    "id",
+                    "company_id",
+                    "status",
+                    "issuer_address",
+                    "start_ledger",
+                    "last_ledger",
+                    "scanned_ledger",
+                    "amm_result",
+                    "error",
+                    "created_at",
+                    "updated_at",
+                ),
+                row,
+            )
+        )
+        if job["amm_result"] is not None:
+            job["amm_result"] = json.loads(job["amm_result"])
+
+        async with self.db.execute(
+            f"""
+            SELECT shareholder_id, {", ".join(_TX_COLUMNS)}
+            FROM distribution_transactions
+            WHERE job_id=?
+            ORDER BY position
+            """,
+            (job_id,),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        job["transactions"] = [
+            dict(zip(("shareholder_id",) + _TX_COLUMNS, row)) for row in rows
+        ]
+        if not include_blobs:
+            for tx in job["transactions"]:
+                del tx["tx_blob"]
+        return job
@@ -0,0 +1,313 @@
+"""
+Process-level store of company and investor embeddings for the matching engine.
+
+Company and investor embeddings arrive from the database as float32 BLOBs
+(or as lists of floats on new models). Converting them to arrays and
+recomputing norms on every match request is wasted work, so the store keeps
+one contiguous float32 matrix per entity type, keyed by entity id, next to
+the inverse L2 norm of every row. Cosine similarity against a query is then
+a single matrix product scaled by those norms.
+
+Rows hold the embeddings at the precision they are persisted in, not
+pre-normalized ones: calculate_match_score scores embeddings at that
+precision (see `embedding_similarity`), and the vectorized scorer has to be
+able to reproduce it exactly. The product itself is computed in float64.
+
+Rows are added the first time an entity is seen and written through when
+Database.save_company / Database.save_investor saves a new embedding, so the
+store never serves a stale vector. Written rows are never modified: a new
+embedding for a known id is appended as a new row and the id points there
+from then on. Readers take `rows()`, an immutable EmbeddingRows over the
+rows written so far, which stays valid (and consistent) whatever is written
+later, in this thread or another. Once replaced rows outnumber live ones,
+the live rows are compacted into a new buffer and `generation` increases,
+since every row index changes.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+EMBEDDING_DTYPE = np.float32
+
+# Initial row capacity of a buffer; it doubles whenever it fills up
+MIN_CAPACITY = 64
+
+# Rows upcast to float64 at a time when computing similarities
+SIMILARITY_CHUNK_ROWS = 16_384
+
+
+def embedding_vector(embedding: Any) -> np.ndarray:
+    """`embedding` at the precision it is persisted in (a float32 vector)."""
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).reshape(-1)
+
+
+def embedding_similarity(a: Any, b: Any) -> float:
+    """
+    Cosine similarity of two embeddings as calculate_match_score scores
+    them: at their persisted float32 precision, so saving an entity never
+    changes its scores, and computed in float64.
+    """
+    a = embedding_vector(a).astype(np.float64).reshape(1, -1)
+    b = embedding_vector(b).astype(np.float64).reshape(1, -1)
+    return float(cosine_similarity(a, b)[0][0])
+
+
+def normalize_embedding(embedding: Any) -> np.ndarray:
+    """Return `embedding` as an L2-normalized float32 vector (zero vectors stay zero)."""
+    vector = embedding_vector(embedding).astype(np.float64)
+    norm = np.sqrt(np.dot(vector, vector))
+    if norm != 0.0:
+        vector = vector / norm
+    return vector.astype(EMBEDDING_DTYPE)
+
+
+def _inverse_norm(vector: np.ndarray) -> float:
+    norm = np.sqrt(np.dot(vector.astype(np.float64), vector.astype(np.float64)))
+    # A zero vector has similarity 0 with everything, as in cosine_similarity
+    return 1.0 / norm if norm != 0.0 else 0.0
+
+
+def grown(array: np.ndarray, rows: int, width: Optional[int] = None) -> np.ndarray:
+    """
+    Copy of `array` with room for at least `rows` rows (doubling, at least
+    MIN_CAPACITY) and, for matrices, `width` columns. New cells are zero.
+    """
+    capacity = max(len(array), MIN_CAPACITY)
+    while capacity < rows:
+        capacity *= 2
+    shape = (capacity,) + array.shape[1:]
+    if width is not None:
+        shape = (capacity, width)
+    new = np.zeros(shape, dtype=array.dtype)
+    if array.ndim > 1:
+        new[: len(array), : array.shape[1]] = array
+    else:
+        new[: len(array)] = array
+    return new
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class EmbeddingRows:
+    """
+    The rows of an EmbeddingMatrix at one point in time. Never changes:
+    later writes go to rows past its end or to a new buffer.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        inverse_norms: np.ndarray,
+        present: np.ndarray,
+        generation: int,
+        version: int,
+    ):
+        self.vectors = _read_only(vectors)
+        self.inverse_norms = _read_only(inverse_norms)
+        self.present = _read_only(present)
+        self.generation = generation
+        self.version = version
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def unit_vectors(self, rows: np.ndarray, dtype=np.float64) -> np.ndarray:
+        """The given rows L2-normalized, as `dtype`."""
+        vectors = self.vectors[rows].astype(np.float64)
+        vectors *= self.inverse_norms[rows][:, np.newaxis]
+        return vectors.astype(dtype, copy=False)
+
+    def similarity(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        (len(queries), len(rows)) cosine similarities between float64 unit
+        `queries` and the given rows, in float64. Rows are upcast a chunk at
+        a time, so the float32 matrix is never copied whole.
+        """
+        out = np.empty((len(queries), len(rows)))
+        contiguous = len(rows) and np.array_equal(
+            rows, np.arange(rows[0], rows[0] + len(rows))
+        )
+        for start in range(0, len(rows), SIMILARITY_CHUNK_ROWS):
+            chunk = rows[start : start + SIMILARITY_CHUNK_ROWS]
+            if contiguous:
+                block = self.vectors[chunk[0] : chunk[-1] + 1]
+            else:
+                block = self.vectors[chunk]
+            product = queries @ block.astype(np.float64).T
+            product *= self.inverse_norms[chunk]
+            out[:, start : start + len(chunk)] = product
+        return out
+
+
+def cosine_similarities(
+    left: EmbeddingRows,
+    left_rows: np.ndarray,
+    right: EmbeddingRows,
+    right_rows: np.ndarray,
+) -> np.ndarray:
+    """(len(left_rows), len(right_rows)) float64 cosine similarities."""
+    if len(left_rows) <= len(right_rows):
+        return right.similarity(left.unit_vectors(left_rows), right_rows)
+    return left.similarity(right.unit_vectors(right_rows), left_rows).T
+
+
+class EmbeddingMatrix:
+    """Contiguous float32 matrix of embeddings for one entity type."""
+
+    def __init__(self):
+        self._rows: Dict[str, int] = {}
+        # Rows [0, self._n) have been written, the rest is spare capacity
+        self._n = 0
+        self._vectors = np.zeros((0, 0), dtype=EMBEDDING_DTYPE)
+        self._inverse_norms = np.zeros(0)
+        self._present = np.zeros(0, dtype=bool)
+        # Increases whenever rows are renumbered (compaction)
+        self.generation = 0
+        # Bumped on every write; lets derived structures (e.g. the ANN index) detect changes
+        self.version = 0
+        self.ann_index = None
+        self._lock = threading.Lock()
+        self._published = self._publish()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._rows
+
+    def rows(self) -> EmbeddingRows:
+        """Every row written so far, unaffected by later writes."""
+        return self._published
+
+    def row_of(self, entity_ids: Sequence[str]) -> np.ndarray:
+        """Current rows of `entity_ids` (all must be in the store)."""
+        rows = self._rows
+        return np.fromiter(
+            (rows[entity_id] for entity_id in entity_ids),
+            dtype=np.int64,
+            count=len(entity_ids),
+        )
+
+    def _publish(self) -> EmbeddingRows:
+        return EmbeddingRows(
+            self._vectors[: self._n],
+            self._inverse_norms[: self._n],
+            self._present[: self._n],
+            self.generation,
+            self.version,
+        )
+
+    def _append(self, entries: List[Tuple[str, Optional[np.ndarray]]]):
+        needed = self._n + len(entries)
+        dim = self._vectors.shape[1] or next(
+            (len(v) for _, v in entries if v is not None), 0
+        )
+        if needed > len(self._present) or dim != self._vectors.shape[1]:
+            # Readers keep the old buffers; the new ones are private until published
+            self._vectors = grown(self._vectors, needed, dim)
+            self._inverse_norms = grown(self._inverse_norms, needed)
+            self._present = grown(self._present, needed)
+
+        # Rows past self._n were never published, so writing them is safe
+        for r, (entity_id, vector) in enumerate(entries, start=self._n):
+            self._rows[entity_id] = r
+            if vector is None:
+                self._vectors[r] = 0.0
+                self._inverse_norms[r] = 0.0
+                self._present[r] = False
+            else:
+                self._vectors[r] = vector
+                self._inverse_norms[r] = _inverse_norm(vector)
+                self._present[r] = True
+        self._n = needed
+        self.version += len(entries)
+
+    def _compact(self):
+        """Move the live rows, in id order, into new buffers once most rows are garbage."""
+        live = len(self._rows)
+        if self._n - live <= max(live, MIN_CAPACITY):
+            return
+        order = self.row_of(list(self._rows))
+        self._vectors = grown(self._vectors[order], live)
+        self._inverse_norms = grown(self._inverse_norms[order], live)
+        self._present = grown(self._present[order], live)
+        self._rows = {entity_id: r for r, entity_id in enumerate(self._rows)}
+        self._n = live
+        self.generation += 1
+
+    def upsert(self, entity_id: str, embedding: Optional[Any]):
+        """Write-through update of a single entity's embedding."""
+        vector = embedding_vector(embedding) if embedding is not None else None
+        with self._lock:
+            row = self._rows.get(entity_id)
+            if row is not None:
+                if vector is None and not self._present[row]:
+                    return
+                if (
+                    vector is not None
+                    and self._present[row]
+                    and np.array_equal(self._vectors[row], vector)
+                ):
+                    # Saves that keep the embedding leave the store (and the ANN index) alone
+                    return
+            # A replaced row is left as it is for readers still holding it
+            self._append([(entity_id, vector)])
+            if row is not None:
+                self._compact()
+            self._published = self._publish()
+
+    def lookup(
+        self, records: Sequence[Dict[str, Any]]
+    ) -> Tuple[EmbeddingRows, np.ndarray, np.ndarray]:
+        """
+        Return (rows, present, row indices) for `records` in order, adding
+        any entity the store has not seen yet from its "embedding" field.
+        The indices point into `rows`, which later writes never change.
+
+        For an entity already in the store, the stored vector wins and the
+        record's "embedding" field is not read: comparing it would mean
+        converting every embedding on every call, which is what the store
+        exists to avoid. Code that changes an embedding must write it through
+        `upsert` (Database.save_company / save_investor do).
+        """
+        with self._lock:
+            missing = {}
+            for record in records:
+                entity_id = record["id"]
+                if entity_id not in self._rows and entity_id not in missing:
+                    embedding = record.get("embedding")
+                    missing[entity_id] = (
+                        embedding_vector(embedding) if embedding is not None else None
+                    )
+            if missing:
+                self._append(list(missing.items()))
+                self._published = self._publish()
+            published = self._published
+            indices = self.row_of([record["id"] for record in records])
+        return published, published.present[indices], indices
+
+
+class EmbeddingStore:
+    """Embedding matrices for companies and investors."""
+
+    def __init__(self):
+        self.companies = EmbeddingMatrix()
+        self.investors = EmbeddingMatrix()
+
+    def clear(self):
+        self.companies = EmbeddingMatrix()
+        self.investors = EmbeddingMatrix()
+
+
+EMBEDDING_STORE = EmbeddingStore()
@@ -0,0 +1,208 @@
+"""
+Batched, cached embedding generation.
+
+Profiles are embedded by sending many texts per provider request, and every
+result is stored in a persistent SQLite cache keyed by the SHA-256 of the
+text and the model name. Re-running populate_data / update_existing_data
+therefore only embeds profiles whose text actually changed.
+
+The provider is chosen with EMBEDDING_PROVIDER: "azure" (default) calls the
+Azure OpenAI deployment, "local" uses a deterministic offline stand-in so the
+pipeline can run and be tested without credentials or network access.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+
+import dotenv
+import numpy as np
+
+from database import embedding_from_blob, embedding_to_blob
+
+dotenv.load_dotenv()
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "azure").lower()
+EMBEDDING_MODEL = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+# Inputs per provider request (the Azure embeddings API accepts up to 2048)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+# Empty path disables the persistent cache
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+LOCAL_EMBEDDING_DIM = 1536
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class AzureEmbeddingProvider:
+    """Azure OpenAI embeddings; the client is only created on first use."""
+
+    def __init__(self, model: str = EMBEDDING_MODEL, client=None):
+        self.model = model
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AzureOpenAI
+
+            self._client = AzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            )
+        return self._client
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(
+            input=texts,
+            model=self.model,  # Your deployment name
+        )
+        # Results carry their input position; don't rely on response order
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+class LocalEmbeddingProvider:
+    """
+    Offline stand-in: each token maps to a fixed pseudo-random vector
+    (seeded by its hash) and a text embeds to the normalized sum, so texts
+    sharing words are similar. Deterministic across runs and machines.
+    """
+
+    def __init__(self, dim: int = LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+        self.model = f"local-hashing-{dim}"
+        self.requests = 0
+        self.texts_embedded = 0
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        seed = int(text_hash(token)[:16], 16)
+        return np.random.default_rng(seed).standard_normal(self.dim)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        self.texts_embedded += len(texts)
+        embeddings = []
+        for text in texts:
+            vector = np.zeros(self.dim)
+            for token in re.findall(r"\w+", text.lower()):
+                vector += self._token_vector(token)
+            norm = np.linalg.norm(vector)
+            embeddings.append((vector / norm if norm else vector).tolist())
+        return embeddings
+
+
+class EmbeddingCache:
+    """Persistent (text hash, model) -> float32 embedding cache in SQLite."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            text_hash TEXT NOT NULL,  -- SHA-256 of the embedded text
+            model TEXT NOT NULL,
+            embedding BLOB NOT NULL,  -- Raw float32 bytes
+            PRIMARY KEY (text_hash, model)
+        )
+        """)
+        self.db.commit()
+
+    def get_many(self, hashes: Sequence[str], model: str) -> Dict[str, np.ndarray]:
+        found = {}
+        hashes = list(hashes)
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start : start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self.db.execute(
+                f"""
+                SELECT text_hash, embedding FROM embedding_cache
+                WHERE model = ? AND text_hash IN ({placeholders})
+                """,
+                [model, *chunk],
+            ).fetchall()
+            found.update((h, embedding_from_blob(blob)) for h, blob in rows)
+        return found
+
+    def put_many(self, embeddings: Dict[str, Sequence[float]], model: str):
+        self.db.executemany(
+            """
+            INSERT OR REPLACE INTO embedding_cache (text_hash, model, embedding)
+            VALUES (?, ?, ?)
+            """,
+            [(h, model, embedding_to_blob(e)) for h, e in embeddings.items()],
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class EmbeddingService:
+    """Batches provider requests and answers repeated texts from the cache."""
+
+    def __init__(
+        self,
+        provider,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.batch_size = batch_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def embed_texts(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embeddings for `texts` in order; None for empty texts and for texts
+        whose provider request failed.
+        """
+        hashes = [text_hash(text) if text else None for text in texts]
+        unique = {h: text for h, text in zip(hashes, texts) if h is not None}
+
+        found = (
+            self.cache.get_many(unique, self.provider.model)
+            if self.cache is not None
+            else {}
+        )
+        missing = [h for h in unique if h not in found]
+        self.cache_hits += len(unique) - len(missing)
+        self.cache_misses += len(missing)
+
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start : start + self.batch_size]
+            try:
+                vectors = self.provider.embed([unique[h] for h in chunk])
+            except Exception as e:
+                print(f"Error generating embeddings for {len(chunk)} texts: {e}")
+                continue
+            embedded = dict(zip(chunk, vectors))
+            if self.cache is not None:
+                self.cache.put_many(embedded, self.provider.model)
+            # Same dtype as a cache hit, so results don't depend on the cache
+            found.update(
+                (h, np.asarray(v, dtype=np.float32)) for h, v in embedded.items()
+            )
+
+        return [found.get(h) if h is not None else None for h in hashes]
+
+
+_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide service configured from the environment."""
+    global _service
+    if _service is None:
+        if EMBEDDING_PROVIDER == "local":
+            provider = LocalEmbeddingProvider()
+        else:
+            provider = AzureEmbeddingProvider()
+        cache = EmbeddingCache(EMBEDDING_CACHE_PATH) if EMBEDDING_CACHE_PATH else None
+        _service = EmbeddingService(provider, cache)
+    return _service
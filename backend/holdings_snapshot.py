@@ -0,0 +1,303 @@
+"""
+Materialized cap tables, versioned by validated ledger.
+
+token_holdings reads every trustline of the issuer and recomputes balances
+and ownership on each request. A background task instead stores each
+company's holder balances, as exact decimal strings, in `holdings_snapshot`
+tagged with the validated ledger they were read from. Reading a cap table
+is then one indexed query, and older ledgers stay queryable.
+
+A new version is only written when some balance changed; otherwise the
+latest version's `checked_ledger` advances. The cap table "as of" ledger N
+is therefore the newest version at or before N. It is exact only while N is
+at most that version's `checked_ledger`: between one version's checked
+ledger and the next version's ledger (or past the latest checked ledger)
+nothing was read, so balances may have changed anywhere in that range.
+Answers for such ledgers are flagged with "exact": False.
+"""
+
+import asyncio
+import os
+from decimal import Decimal
+from typing import Callable, Dict, Optional, Tuple
+
+import aiosqlite
+
+from token_holders import held_amount
+from xrpl_history import iter_account_lines_pages
+
+# Seconds between snapshot runs; 0 disables the background task
+HOLDINGS_SNAPSHOT_INTERVAL = float(os.getenv("HOLDINGS_SNAPSHOT_INTERVAL", "60"))
+PERCENT_QUANTUM = Decimal("0.0001")
+
+
+async def create_holdings_tables(db: aiosqlite.Connection):
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS holdings_versions (
+        company_id TEXT NOT NULL,
+        ledger_index INTEGER NOT NULL,  -- Ledger the balances were read from
+        checked_ledger INTEGER NOT NULL,  -- Still unchanged as of this ledger
+        holder_count INTEGER NOT NULL,
+        total_held TEXT NOT NULL,  -- Decimal
+        taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (company_id, ledger_index)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS holdings_snapshot (
+        company_id TEXT NOT NULL,
+        ledger_index INTEGER NOT NULL,
+        wallet_address TEXT NOT NULL,
+        balance TEXT NOT NULL,  -- Decimal
+        percent_ownership TEXT NOT NULL,  -- Decimal, of the total supply
+        PRIMARY KEY (company_id, ledger_index, wallet_address)
+    )
+    """)
+    await db.commit()
+
+
+def _decimal_str(value: Decimal) -> str:
+    return format(value.normalize(), "f") if value else "0"
+
+
+def _percent(balance: Decimal, total_supply) -> Decimal:
+    if not total_supply:
+        return Decimal(0)
+    return (balance * 100 / Decimal(str(total_supply))).quantize(PERCENT_QUANTUM)
+
+
+async def read_holdings(
+    client, issuer: str, currency_hex: str
+) -> Tuple[Optional[int], Dict[str, Decimal]]:
+    """(validated ledger index, {holder: exact balance}) from the issuer's trustlines."""
+    ledger_index = None
+    holdings: Dict[str, Decimal] = {}
+    async for page in iter_account_lines_pages(client, issuer):
+        ledger_index = page["ledger_index"]
+        for line in page["lines"]:
+            amount = held_amount(line, currency_hex)
+            if amount > 0:
+                account = line.get("account")
+                holdings[account] = holdings.get(account, Decimal(0)) + amount
+    return ledger_index, holdings
+
+
+async def _version_at(
+    db: aiosqlite.Connection, company_id: str, ledger_index: Optional[int]
+) -> Optional[dict]:
+    """The newest version at or before `ledger_index` (the latest if None)."""
+    async with db.execute(
+        """
+        SELECT ledger_index, checked_ledger, holder_count, total_held, taken_at
+        FROM holdings_versions
+        WHERE company_id=? AND (? IS NULL OR ledger_index<=?)
+        ORDER BY ledger_index DESC
+        LIMIT 1
+        """,
+        (company_id, ledger_index, ledger_index),
+    ) as cursor:
+        row = await cursor.fetchone()
+    if not row:
+        return None
+    return dict(
+        zip(
+            (
+                "ledger_index",
+                "checked_ledger",
+                "holder_count",
+                "total_held",
+                "taken_at",
+            ),
+            row,
+        )
+    )
+
+
+def _is_exact(version: Optional[dict], ledger_index: Optional[int]) -> bool:
+    """Whether `version` is known to hold at `ledger_index` (None: its latest)."""
+    if version is None:
+        # Before the first snapshot nothing was read
+        return False
+    return ledger_index is None or ledger_index <= version["checked_ledger"]
+
+
+async def _version_balances(
+    db: aiosqlite.Connection, company_id: str, ledger_index: int
+) -> Dict[str, Tuple[str, str]]:
+    async with db.execute(
+        """
+        SELECT wallet_address, balance, percent_ownership
+        FROM holdings_snapshot
+        WHERE company_id=? AND ledger_index=?
+        """,
+        (company_id, ledger_index),
+    ) as cursor:
+        rows = await cursor.fetchall()
+    return {address: (balance, percent) for address, balance, percent in rows}
+
+
+async def take_snapshot(
+    db: aiosqlite.Connection, client, company: dict, currency_hex: str
+) -> Optional[int]:
+    """
+    Read the company's holders at the latest validated ledger and store them
+    if they differ from the latest version. Returns the ledger read, or None
+    if the issuer has no trustlines yet.
+    """
+    company_id = company["_id"]
+    ledger_index, holdings = await read_holdings(
+        client, company["issuing_address"], currency_hex
+    )
+    if not isinstance(ledger_index, int):
+        return None
+
+    latest = await _version_at(db, company_id, None)
+    if latest is not None and ledger_index <= latest["checked_ledger"]:
+        return ledger_index
+    if latest is not None:
+        stored = await _version_balances(db, company_id, latest["ledger_index"])
+        if {a: Decimal(b) for a, (b, _) in stored.items()} == holdings:
+            await db.execute(
+                """
+                UPDATE holdings_versions SET checked_ledger=?
+                WHERE company_id=? AND ledger_index=?
+                """,
+                (ledger_index, company_id, latest["ledger_index"]),
+            )
+            await db.commit()
+            return ledger_index
+
+    await db.executemany(
+        """
+        INSERT INTO holdings_snapshot (
+            company_id, ledger_index, wallet_address, balance, percent_ownership
+        )
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                company_id,
+                ledger_index,
+                address,
+                _decimal_str(balance),
+                _decimal_str(_percent(balance, company["total_supply"])),
+            )
+            for address, balance in holdings.items()
+        ],
+    )
+    await db.execute(
+        """
+        INSERT INTO holdings_versions (
+            company_id, ledger_index, checked_ledger, holder_count, total_held
+        )
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (
+            company_id,
+            ledger_index,
+            ledger_index,
+            len(holdings),
+            _decimal_str(sum(holdings.values(), Decimal(0))),
+        ),
+    )
+    await db.commit()
+    return ledger_index
+
+
+async def get_snapshot(
+    db: aiosqlite.Connection, company_id: str, ledger_index: Optional[int] = None
+) -> Optional[dict]:
+    """
+    The cap table as of `ledger_index` (the latest if None): the version's
+    fields, "exact" (False when `ledger_index` is past the version's
+    checked_ledger, so the balances there are not known) and "holders",
+    largest balance first. None if there is none.
+    """
+    version = await _version_at(db, company_id, ledger_index)
+    if version is None:
+        return None
+    version["exact"] = _is_exact(version, ledger_index)
+    balances = await _version_balances(db, company_id, version["ledger_index"])
+    version["holders"] = sorted(
+        (
+            {"wallet_address": address, "balance": balance, "percent_ownership": pct}
+            for address, (balance, pct) in balances.items()
+        ),
+        key=lambda h: Decimal(h["balance"]),
+        reverse=True,
+    )
+    return version
+
+
+async def diff_snapshots(
+    db: aiosqlite.Connection,
+    company_id: str,
+    from_ledger: int,
+    to_ledger: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    Balance changes between the cap tables as of two ledgers (`to_ledger`
+    None: the latest). Holders that appear or disappear have a "0" balance
+    on the other side. "exact" is False when either ledger is past its
+    version's checked_ledger. None if there is no cap table as of
+    `to_ledger`.
+    """
+    to_version = await _version_at(db, company_id, to_ledger)
+    if to_version is None:
+        return None
+    from_version = await _version_at(db, company_id, from_ledger)
+    before = (
+        await _version_balances(db, company_id, from_version["ledger_index"])
+        if from_version
+        else {}
+    )
+    after = await _version_balances(db, company_id, to_version["ledger_index"])
+
+    changes = []
+    for address in before.keys() | after.keys():
+        old = Decimal(before.get(address, ("0", "0"))[0])
+        new = Decimal(after.get(address, ("0", "0"))[0])
+        if old != new:
+            changes.append(
+                {
+                    "wallet_address": address,
+                    "from_balance": _decimal_str(old),
+                    "to_balance": _decimal_str(new),
+                    "change": _decimal_str(new - old),
+                }
+            )
+    changes.sort(key=lambda c: abs(Decimal(c["change"])), reverse=True)
+    return {
+        "from_ledger": from_version["ledger_index"] if from_version else None,
+        "to_ledger": to_version["ledger_index"],
+        "exact": _is_exact(from_version, from_ledger)
+        and _is_exact(to_version, to_ledger),
+        "changes": changes,
+    }
+
+
+async def snapshot_periodically(
+    db: aiosqlite.Connection,
+    client,
+    currency_hex_of: Callable[[str], str],
+    interval: float = HOLDINGS_SNAPSHOT_INTERVAL,
+):
+    """Background task: snapshot every issued company's holders each interval."""
+    while True:
+        async with db.execute("""
+            SELECT _id, symbol, total_supply, issuing_address
+            FROM companies
+            WHERE issuing_address IS NOT NULL
+            """) as cursor:
+            rows = await cursor.fetchall()
+        for company_id, symbol, total_supply, issuing_address in rows:
+            company = {
+                "_id": company_id,
+                "total_supply": total_supply,
+                "issuing_address": issuing_address,
+            }
+            try:
+                await take_snapshot(db, client, company, currency_hex_of(symbol))
+            except Exception as e:
+                print(f"Error snapshotting holdings of {company_id}: {str(e)}")
+        await asyncio.sleep(interval)
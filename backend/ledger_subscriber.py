@@ -0,0 +1,216 @@
+"""
+Push-based shareholder verification from an XRPL WebSocket subscription.
+
+`LedgerSubscriber` keeps one WebSocket connection open, subscribes to the
+ledger stream and to every issuing address in the `companies` table, and
+writes each validated transaction touching an issuer into the local
+transaction index (xrpl_tx_index). After every such transaction the
+`on_issuer_activity(db, issuer)` callback re-derives the shareholders'
+has_paid / has_trustline flags from the index, so they stay current
+without anyone calling check_stakeholders.
+
+Gaps are closed with the index itself: after every (re)connect, and
+whenever the ledger stream skips a ledger, each issuer is refreshed from
+its last indexed ledger over the same connection before streamed
+transactions are consumed. Subscribing happens first, so nothing can slip
+between the backfill and the stream; duplicates are ignored by the index.
+New companies are picked up on the next closed ledger.
+
+Streamed transactions never move an issuer's "last indexed ledger" mark.
+Only when the ledger stream goes from N-1 to N without a gap is ledger N-1
+known to be complete (its transactions arrive next to its ledgerClosed,
+before or after depending on the server), and the mark advances to it. A
+connection dropped in the middle of a ledger therefore backfills that
+ledger again on reconnect.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Iterable, Optional, Set
+
+import aiosqlite
+from xrpl.asyncio.clients import AsyncWebsocketClient
+from xrpl.models.requests import Subscribe
+
+from xrpl_tx_index import (
+    mark_ledger_indexed,
+    record_transaction,
+    refresh_issuer_index,
+)
+
+# Reconnect delay doubles after each failed attempt, up to the max (seconds)
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 60.0
+# No message for this long (ledgers close every ~4 s) means a dead connection
+STREAM_IDLE_TIMEOUT = 30.0
+
+
+def stream_envelope(message: dict) -> dict:
+    """
+    A "transaction" stream message in the AccountTx envelope shape that
+    parse_transaction and the index understand (API v1 sends "transaction",
+    API v2 "tx_json").
+    """
+    tx_json = dict(message.get("tx_json") or message.get("transaction") or {})
+    if "hash" in message:
+        tx_json.setdefault("hash", message["hash"])
+    return {
+        "tx_json": tx_json,
+        "meta": message.get("meta", {}),
+        "hash": message.get("hash", tx_json.get("hash")),
+        "ledger_index": message.get("ledger_index"),
+        "close_time_iso": message.get("close_time_iso", "N/A"),
+        "validated": message.get("validated", False),
+    }
+
+
+def accounts_touched(envelope: dict) -> Set[str]:
+    """Accounts a transaction involves, from its fields and affected nodes."""
+    tx_json = envelope.get("tx_json", {})
+    accounts = {tx_json.get("Account"), tx_json.get("Destination")}
+    for field in ("Amount", "LimitAmount"):
+        if isinstance(tx_json.get(field), dict):
+            accounts.add(tx_json[field].get("issuer"))
+
+    for node in envelope.get("meta", {}).get("AffectedNodes", []):
+        for change in node.values():
+            fields = change.get("FinalFields") or change.get("NewFields") or {}
+            accounts.add(fields.get("Account"))
+            # Trustlines (RippleState) name both sides in their limits
+            for limit in ("HighLimit", "LowLimit"):
+                if isinstance(fields.get(limit), dict):
+                    accounts.add(fields[limit].get("issuer"))
+    accounts.discard(None)
+    return accounts
+
+
+async def get_issuing_addresses(db: aiosqlite.Connection) -> Set[str]:
+    async with db.execute(
+        "SELECT DISTINCT issuing_address FROM companies WHERE issuing_address IS NOT NULL"
+    ) as cursor:
+        rows = await cursor.fetchall()
+    return {row[0] for row in rows if row[0]}
+
+
+class LedgerSubscriber:
+    """Keeps the transaction index and shareholder flags in sync with the ledger."""
+
+    def __init__(
+        self,
+        db: aiosqlite.Connection,
+        url: str,
+        on_issuer_activity: Callable[[aiosqlite.Connection, str], Awaitable[None]],
+        client_factory: Callable[[str], AsyncWebsocketClient] = AsyncWebsocketClient,
+        on_ledger_closed: Optional[Callable[[int], None]] = None,
+    ):
+        self.db = db
+        self.url = url
+        self.on_issuer_activity = on_issuer_activity
+        self.client_factory = client_factory
+        self.on_ledger_closed = on_ledger_closed
+        self.issuers: Set[str] = set()
+        self.last_ledger: Optional[int] = None
+        self.last_message_at = time.monotonic()
+        self.connections = 0
+        self.backfills = 0
+        self.transactions_indexed = 0
+
+    async def run(self):
+        """Run until cancelled, reconnecting with backoff after failures."""
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                await self._run_connection()
+                delay = RECONNECT_DELAY
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in ledger subscription: {str(e)}")
+            print(f"[Ledger subscription] Reconnecting in {delay:.0f} s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _run_connection(self):
+        client = self.client_factory(self.url)
+        await client.open()
+        self.connections += 1
+        consumer = None
+        try:
+            self.issuers = set()
+            self.last_ledger = None
+            await client.request(Subscribe(streams=["ledger"]))
+            await self._watch(client, await get_issuing_addresses(self.db))
+            # Whatever happened while disconnected is in the index now
+            await self._backfill(client, self.issuers)
+
+            self.last_message_at = time.monotonic()
+            consumer = asyncio.create_task(self._consume(client))
+            # The client's message iterator blocks forever once the socket
+            # is gone, so connection health is watched from the outside
+            while not consumer.done():
+                await asyncio.sleep(1)
+                idle = time.monotonic() - self.last_message_at
+                if not client.is_open() or idle > STREAM_IDLE_TIMEOUT:
+                    break
+            if consumer.done():
+                consumer.result()  # Re-raise what stopped the consumer
+        finally:
+            if consumer is not None and not consumer.done():
+                consumer.cancel()
+            if client.is_open():
+                await client.close()
+
+    async def _watch(self, client, issuers: Iterable[str]) -> Set[str]:
+        """Subscribe to issuers not watched yet; returns the new ones."""
+        new = set(issuers) - self.issuers
+        if new:
+            resp = await client.request(Subscribe(accounts=sorted(new)))
+            if not resp.is_successful():
+                raise ConnectionError(f"subscribe failed: {resp.result}")
+            self.issuers |= new
+        return new
+
+    async def _backfill(self, client, issuers: Iterable[str]):
+        for issuer in issuers:
+            await refresh_issuer_index(self.db, client, issuer)
+            self.backfills += 1
+            await self.on_issuer_activity(self.db, issuer)
+
+    async def _consume(self, client):
+        async for message in client:
+            self.last_message_at = time.monotonic()
+            if message.get("type") == "ledgerClosed":
+                await self._on_ledger_closed(client, message)
+            elif message.get("type") == "transaction":
+                await self._on_transaction(message)
+
+    async def _on_ledger_closed(self, client, message: dict):
+        ledger_index = message.get("ledger_index")
+        gap = (
+            self.last_ledger is not None
+            and ledger_index is not None
+            and ledger_index > self.last_ledger + 1
+        )
+        contiguous = (
+            self.last_ledger is not None and ledger_index == self.last_ledger + 1
+        )
+        # Issuers watched since the previous ledgerClosed saw all of its ledger
+        complete = set(self.issuers)
+        if ledger_index is not None:
+            self.last_ledger = max(self.last_ledger or 0, ledger_index)
+            if self.on_ledger_closed is not None:
+                self.on_ledger_closed(ledger_index)
+
+        new = await self._watch(client, await get_issuing_addresses(self.db))
+        await self._backfill(client, self.issuers if gap else new)
+        if contiguous:
+            await mark_ledger_indexed(self.db, complete, ledger_index - 1)
+
+    async def _on_transaction(self, message: dict):
+        if not message.get("validated"):
+            return
+        envelope = stream_envelope(message)
+        for issuer in accounts_touched(envelope) & self.issuers:
+            if await record_transaction(self.db, issuer, envelope):
+                self.transactions_indexed += 1
+                await self.on_issuer_activity(self.db, issuer)
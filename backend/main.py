@@ -1,12 +1,23 @@
+import json
 import math
+import os
+import time
 import uuid
 import asyncio
-from typing import List
+from typing import Dict, List, Optional, Set
 from collections import deque
 import aiosqlite
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from database import Database
+from match_snapshot import MatchingSnapshot
+from match_precompute import (
+    PRECOMPUTE_INTERVAL,
+    PrecomputedMatches,
+    precompute_periodically,
+)
 
 # ------------------ Database File ------------------
 DATABASE_FILE = "sharewave_db.sqlite"
@@ -58,34 +69,141 @@ async def startup():
     )
     """)
     await app.state.db.commit()
+    await create_tx_index_tables(app.state.db)
+    await create_distribution_tables(app.state.db)
+    await create_holdings_tables(app.state.db)
+    await create_amm_tables(app.state.db)
+
+    # Unfinished distributions continue where they stopped
+    app.state.distribution_jobs = DistributionJobs(
+        app.state.db, XRPL_CLIENT, finish_distribution
+    )
+    await app.state.distribution_jobs.resume_all()
+
+    # Matching database: one connection for the app lifetime, schema created once
+    app.state.matching_db = Database()
+    await app.state.matching_db.connect()
+    app.state.matching_snapshot = await MatchingSnapshot().load(app.state.matching_db)
+    app.state.precomputed_matches = await PrecomputedMatches().load(
+        app.state.matching_db, app.state.matching_snapshot.view()
+    )
+    app.state.match_precompute_task = None
+    if PRECOMPUTE_INTERVAL > 0:
+        app.state.match_precompute_task = asyncio.create_task(
+            precompute_periodically(
+                app.state.matching_db,
+                app.state.matching_snapshot,
+                app.state.precomputed_matches,
+            )
+        )
+
+    # Cap tables materialized per validated ledger
+    app.state.holdings_snapshot_task = None
+    if HOLDINGS_SNAPSHOT_INTERVAL > 0:
+        app.state.holdings_snapshot_task = asyncio.create_task(
+            snapshot_periodically(app.state.db, XRPL_CLIENT, currency_to_hex)
+        )
+
+    # AMM pool price / liquidity history for charts
+    app.state.amm_sample_task = None
+    if AMM_SAMPLE_INTERVAL > 0:
+        app.state.amm_sample_task = asyncio.create_task(
+            sample_periodically(
+                app.state.db, XRPL_CLIENT, RLUSD_ASSET, company_token_asset
+            )
+        )
+
+    # Push shareholder payments / trustlines from the ledger instead of polling
+    app.state.ledger_subscriber = None
+    app.state.ledger_subscriber_task = None
+    if XRPL_WS_URL:
+        app.state.ledger_subscriber = LedgerSubscriber(
+            app.state.db,
+            XRPL_WS_URL,
+            apply_indexed_activity,
+            # Closed ledgers also expire cached AMMInfo / AccountLines reads
+            on_ledger_closed=XRPL_CLIENT.cache.observe_ledger,
+        )
+        app.state.ledger_subscriber_task = asyncio.create_task(
+            app.state.ledger_subscriber.run()
+        )
 
 
 @app.on_event("shutdown")
 async def shutdown():
     """
-    Close the DB connection on shutdown.
+    Close the DB connections on shutdown.
     """
+    if app.state.match_precompute_task is not None:
+        app.state.match_precompute_task.cancel()
+    if app.state.ledger_subscriber_task is not None:
+        app.state.ledger_subscriber_task.cancel()
+    if app.state.holdings_snapshot_task is not None:
+        app.state.holdings_snapshot_task.cancel()
+    if app.state.amm_sample_task is not None:
+        app.state.amm_sample_task.cancel()
+    app.state.distribution_jobs.cancel_all()
+    await XRPL_CLIENT.close()
     await app.state.db.close()
+    await app.state.matching_db.close()
 
 
 # ------------------ XRPL Integration ------------------
-from xrpl.asyncio.clients import AsyncJsonRpcClient
 from xrpl.asyncio.wallet import generate_faucet_wallet
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
 from xrpl.asyncio.transaction import sign_and_submit
-from xrpl.models.transactions import Payment, AMMCreate, TrustSet
-from xrpl.models.requests import AccountTx, AccountLines
+from xrpl.models.transactions import AMMCreate, TrustSet
+from xrpl.models.requests import AccountLines
 from xrpl.wallet import Wallet
 from xrpl.models.amounts import IssuedCurrencyAmount
 from xrpl.models.requests import AccountObjects
 from xrpl.models.requests import AMMInfo
+from xrpl_gateway import XRPLGateway
+from xrpl_history import iter_account_lines
+from amm_series import (
+    AMM_SAMPLE_INTERVAL,
+    MAX_OHLC_BUCKETS,
+    bucket_count,
+    create_amm_tables,
+    get_ohlc,
+    parse_pool,
+    sample_periodically,
+)
+from holdings_snapshot import (
+    HOLDINGS_SNAPSHOT_INTERVAL,
+    create_holdings_tables,
+    diff_snapshots,
+    get_snapshot,
+    snapshot_periodically,
+)
+from token_holders import (
+    MAX_HOLDERS_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    iter_token_holders,
+    read_token_holders,
+)
+from ledger_subscriber import LedgerSubscriber
+from distribution_jobs import DistributionJobs, create_distribution_tables
+from xrpl_tx_index import (
+    create_tx_index_tables,
+    get_issuer_transactions,
+    refresh_issuer_index,
+)
 
-XRPL_URL = "https://s.altnet.rippletest.net:51234"
-XRPL_CLIENT = AsyncJsonRpcClient(XRPL_URL)
+XRPL_URL = os.getenv("XRPL_URL", "https://s.altnet.rippletest.net:51234")
+# Faucet for new issuing wallets; empty uses the network's public faucet
+XRPL_FAUCET_HOST = os.getenv("XRPL_FAUCET_HOST") or None
+# Every ledger read and write goes through this one pooled client
+XRPL_CLIENT = XRPLGateway(XRPL_URL)
+# WebSocket endpoint for the ledger subscription; empty disables it
+XRPL_WS_URL = os.getenv("XRPL_WS_URL", "wss://s.altnet.rippletest.net:51233")
 
 # This is the known test issuer for RLUSD on XRPL
 RLUSD_ISSUER = "rQhWct2fv4Vc4KRjRgMrxa8xPN9Zx9iLKV"
 # The 40-hex code for "RLUSD"
 RLUSD_CURRENCY = "524C555344000000000000000000000000000000"
+RLUSD_ASSET = {"currency": RLUSD_CURRENCY, "issuer": RLUSD_ISSUER}
 
 
 # ------------------ Data Models ------------------
@@ -114,10 +232,6 @@ class CompanyInput(BaseModel):
 
 
 # ------------------ Helper: Get Company + Shareholders ------------------
-import datetime
-
-RIPPLE_EPOCH_OFFSET = 946684800
-
 
 # ------------------ Helper: Get Token Holding ------------------
 # This helper queries XRPL for the account lines of a given shareholder,
@@ -155,128 +269,6 @@ async def get_token_holding(
     return {"exists": False, "balance": "0"}
 
 
-def ripple_date_to_datetime(ripple_date: int) -> datetime.datetime:
-    """
-    XRPL "date" is seconds since Ripple epoch (2000-01-01).
-    Convert to standard Python datetime.
-    """
-    return datetime.datetime.utcfromtimestamp(ripple_date + RIPPLE_EPOCH_OFFSET)
-
-
-def parse_transaction(tx_envelope: dict) -> dict:
-    """
-    Adapts the user script to parse the structure returned by xrpl-py AccountTx,
-    which can be either:
-      {
-        "tx_json": {
-          "TransactionType": "...",
-          "Account": "...",
-          "Destination": "...",
-          "Amount": "... or {...}",
-          "date": 123456789,
-          ...
-        },
-        "meta": {
-          "delivered_amount": "... or {...}",
-          ...
-        },
-        "validated": True,
-        "close_time_iso": "...",
-        ...
-      }
-    or in some cases:
-      {
-        "tx": {...},
-        "meta": {...},
-        ...
-      }
-    We'll look for tx_json first, then fallback to tx.
-    """
-
-    # 1) The transaction data might be in "tx_json" or "tx".
-    tx_json = tx_envelope.get("tx_json")
-    if not tx_json:
-        tx_json = tx_envelope.get("tx", {})
-
-    meta = tx_envelope.get("meta", {})
-
-    # 2) The top-level "hash" can be in tx_json["hash"] or the outer envelope
-    tx_hash = tx_json.get("hash") or tx_envelope.get("hash", "N/A")
-
-    # 3) We might have close_time_iso or not
-    close_time = tx_envelope.get("close_time_iso", "N/A")
-
-    # 4) Basic fields from the transaction
-    tx_type = tx_json.get("TransactionType", "N/A")
-    sender = tx_json.get("Account", "N/A")
-    receiver = tx_json.get("Destination", "N/A")
-
-    # 5) The ledger "date" in XRPL is an integer in the tx
-    ledger_date = tx_json.get("date")
-    if ledger_date is not None:
-        dt_obj = ripple_date_to_datetime(ledger_date)
-        tx_date = dt_obj.strftime("%Y-%m-%d %H:%M:%S")
-    else:
-        tx_date = "N/A"
-
-    # Payment vs TrustSet vs other
-    amount_str = "N/A"
-    token = "N/A"
-    issue = "N/A"
-
-    if tx_type == "Payment":
-        # Check meta for delivered_amount
-        delivered_amt = meta.get("delivered_amount")
-        if isinstance(delivered_amt, dict):
-            # IOU
-            amount_str = delivered_amt.get("value", "N/A")
-            token = delivered_amt.get("currency", "N/A")
-            issue = delivered_amt.get("issuer", "N/A")
-        elif isinstance(delivered_amt, str):
-            # Possibly XRP in drops
-            try:
-                xrp_amount = float(delivered_amt) / 1_000_000
-                amount_str = f"{xrp_amount:.6f}"
-                token = "XRP"
-            except:
-                amount_str = delivered_amt
-
-        # If delivered_amount was None or "N/A", fallback to raw "Amount"
-        if amount_str == "N/A":
-            raw_amt = tx_json.get("Amount")
-            if isinstance(raw_amt, dict):
-                amount_str = raw_amt.get("value", "N/A")
-                token = raw_amt.get("currency", "N/A")
-                issue = raw_amt.get("issuer", "N/A")
-            elif isinstance(raw_amt, str):
-                # Possibly XRP
-                try:
-                    xrp_amount = float(raw_amt) / 1_000_000
-                    amount_str = f"{xrp_amount:.6f}"
-                    token = "XRP"
-                except:
-                    amount_str = raw_amt
-
-    elif tx_type == "TrustSet":
-        limit_amount = tx_json.get("LimitAmount", {})
-        if isinstance(limit_amount, dict):
-            amount_str = limit_amount.get("value", "N/A")
-            token = limit_amount.get("currency", "N/A")
-            issue = limit_amount.get("issuer", "N/A")
-
-    return {
-        "Transaction Hash": tx_hash,
-        "Type": tx_type,
-        "Sender": sender,
-        "Receiver": receiver,
-        "Amount": amount_str,
-        "Token": token,
-        "Issue": issue,
-        "Date": tx_date,
-        "Close Time (ISO)": close_time,
-    }
-
-
 async def get_company_with_shareholders(db: aiosqlite.Connection, company_id: str):
     """
     Fetches a single company row plus all its shareholders, returning a dict
@@ -367,59 +359,74 @@ async def create_issuing_wallet():
     Creates (funds) a brand-new wallet on the XRPL testnet using the faucet.
     Returns (address, seed).
     """
-    wallet = await generate_faucet_wallet(XRPL_CLIENT, debug=False)
+    wallet = await generate_faucet_wallet(
+        XRPL_CLIENT, debug=False, faucet_host=XRPL_FAUCET_HOST
+    )
     return wallet.classic_address, wallet.seed
 
 
-async def check_rlusd_payment(
-    company_addr: str, shareholder_addr: str, amount_needed: float
-) -> bool:
+def is_rlusd_payment(parsed: dict) -> bool:
+    """True for a parsed Payment delivering RLUSD from the known issuer."""
+    # Must match RLUSD hex or "RLUSD", plus known issuer
+    token_match = parsed["Token"] in [RLUSD_CURRENCY, "RLUSD"]
+    issuer_match = parsed["Issue"] == RLUSD_ISSUER
+    return parsed["Type"] == "Payment" and token_match and issuer_match
+
+
+async def indexed_rlusd_payments(
+    db: aiosqlite.Connection, company_addr: str
+) -> Dict[str, float]:
+    """Total RLUSD received per sender according to the local transaction index."""
+    totals: Dict[str, float] = {}
+    indexed = await get_issuer_transactions(db, company_addr, tx_type="Payment")
+    for parsed in indexed:
+        if not is_rlusd_payment(parsed):
+            continue
+        try:
+            val = float(parsed["Amount"])
+        except ValueError:
+            val = 0.0
+        if val > 0:
+            totals[parsed["Sender"]] = totals.get(parsed["Sender"], 0.0) + val
+    return totals
+
+
+async def collect_rlusd_payments(
+    company_addr: str, db: Optional[aiosqlite.Connection] = None
+) -> Dict[str, float]:
     """
-    Uses parse_transaction to decode each transaction from AccountTx,
-    then checks if `shareholder_addr` has sent >= `amount_needed` RLUSD to `company_addr`.
+    Brings the local index of the issuer's history up to date (only ledgers
+    newer than the last refresh are fetched) and returns the total RLUSD
+    received per sender, so every shareholder's payment check is a lookup
+    instead of another AccountTx call.
     """
-    print(
-        f"\n🔎 Checking RLUSD Payment from {shareholder_addr} => {company_addr}, needed: {amount_needed}"
-    )
+    db = db or app.state.db
+    new_count = await refresh_issuer_index(db, XRPL_CLIENT, company_addr)
+    totals = await indexed_rlusd_payments(db, company_addr)
 
-    req = AccountTx(account=company_addr, limit=200, forward=False)
-    resp = await XRPL_CLIENT.request(req)
-    txs = resp.result.get("transactions", [])
     print(
-        f"  [Debug] Found {len(txs)} total ledger entries for {company_addr} from AccountTx.\n"
+        f"  [Debug] Indexed {new_count} new ledger entries for {company_addr}: "
+        f"RLUSD payments from {len(totals)} senders."
     )
+    return totals
 
-    total_found = 0.0
-    for i, tx_entry in enumerate(txs, start=1):
-        parsed = parse_transaction(tx_entry)
-        print(
-            f"  {i}) Hash={parsed['Transaction Hash']} | Type={parsed['Type']} | "
-            f"Sender={parsed['Sender']} | Token={parsed['Token']} | Amount={parsed['Amount']} | "
-            f"Issue={parsed['Issue']}"
-        )
 
-        # Must be a Payment from the correct shareholder
-        if parsed["Type"] == "Payment" and parsed["Sender"] == shareholder_addr:
-            # Must match RLUSD hex or "RLUSD", plus known issuer
-            token_match = parsed["Token"] in [RLUSD_CURRENCY, "RLUSD"]
-            issuer_match = parsed["Issue"] == RLUSD_ISSUER
-            if token_match and issuer_match:
-                try:
-                    val = float(parsed["Amount"])
-                except ValueError:
-                    val = 0.0
-                if val > 0:
-                    total_found += val
-                    print(f"    ✅ Payment matched: +{val}, total_found={total_found}")
-                else:
-                    print("    ❌ Payment had non-numeric or zero amount.")
-            else:
-                print("    ❌ Not matching RLUSD issuer/currency.")
-        else:
-            print("    (Skipped - not a Payment from this shareholder)")
+async def check_rlusd_payment(
+    company_addr: str,
+    shareholder_addr: str,
+    amount_needed: float,
+    payments: Optional[Dict[str, float]] = None,
+) -> bool:
+    """
+    Checks if `shareholder_addr` has sent >= `amount_needed` RLUSD to `company_addr`.
+    Pass `payments` from collect_rlusd_payments to check many shareholders
+    against a single scan of the issuer's history.
+    """
+    if payments is None:
+        payments = await collect_rlusd_payments(company_addr)
 
     # Compare to needed
-    total_found_2dec = round(total_found, 2)
+    total_found_2dec = round(payments.get(shareholder_addr, 0.0), 2)
     needed_2dec = round(amount_needed, 2)
     print(
         f"==> Summed RLUSD from {shareholder_addr}: {total_found_2dec}, needed: {needed_2dec}"
@@ -437,6 +444,11 @@ def currency_to_hex(currency: str) -> str:
     return hex_str.ljust(40, "0")
 
 
+def company_token_asset(token_symbol: str, issuer_addr: str) -> dict:
+    """The company token as an AMM asset (the pool's other side is RLUSD_ASSET)."""
+    return {"currency": currency_to_hex(token_symbol), "issuer": issuer_addr}
+
+
 async def check_trustline(
     shareholder_addr: str, token_symbol: str, issuer_addr: str
 ) -> bool:
@@ -480,38 +492,238 @@ async def check_trustline(
     return False
 
 
-async def distribute_tokens(
-    issuer_seed: str,
-    issuer_addr: str,
-    token_symbol: str,
-    total_supply: int,
-    shareholder_addr: str,
-    shareholder_percent: float,
-):
-    tokens_to_send = math.floor(total_supply * (shareholder_percent / 100.0))
-    wallet = Wallet.from_seed(issuer_seed)
+async def collect_trustlined_holders(issuer_addr: str, token_symbol: str) -> Set[str]:
+    """
+    Accounts holding a trustline for (token_symbol, issuer_addr), read from
+    the issuer's own AccountLines. One paginated scan answers the trustline
+    check of every shareholder instead of one AccountLines call per holder.
+    """
+    token_hex = currency_to_hex(token_symbol)
+    holders = set()
+    async for line in iter_account_lines(XRPL_CLIENT, issuer_addr):
+        if line.get("currency", "").upper() == token_hex:
+            holders.add(line.get("account"))
+    return holders
 
-    # Convert the ASCII symbol to 40-char hex if it's an IOU:
-    token_symbol_hex = currency_to_hex(token_symbol)
 
-    pay_tx = Payment(
-        account=issuer_addr,
-        destination=shareholder_addr,
-        amount=IssuedCurrencyAmount(
-            currency=token_symbol_hex,
-            issuer=issuer_addr,
-            value=str(tokens_to_send),
-        ),
+# ------------------ Shareholder Verification ------------------
+# Max. number of XRPL checks in flight while verifying one company's shareholders
+VERIFY_CONCURRENCY = 10
+
+
+async def _timed_check(semaphore: asyncio.Semaphore, check) -> tuple:
+    """Run `check()` under the semaphore; returns (result, elapsed_ms)."""
+    async with semaphore:
+        start = time.perf_counter()
+        result = await check()
+        return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+async def verify_shareholder(
+    sh: dict,
+    issuing_addr: str,
+    symbol: str,
+    semaphore: asyncio.Semaphore,
+    payments: Dict[str, float],
+    trustlined: Set[str],
+) -> dict:
+    """
+    Run the outstanding payment and trustline checks for one shareholder
+    concurrently, updating `sh` in place. Returns the per-check timings.
+    A trustline already seen in the issuer-side scan (`trustlined`) needs
+    no request; only misses are re-checked on the shareholder's account.
+    """
+    if not sh["has_trustline"] and sh["wallet_address"] in trustlined:
+        sh["has_trustline"] = True
+
+    checks = {}
+    if not sh["has_paid"]:
+        checks["payment"] = lambda: check_rlusd_payment(
+            company_addr=issuing_addr,
+            shareholder_addr=sh["wallet_address"],
+            amount_needed=sh["required_rlusd"],
+            payments=payments,
+        )
+    if not sh["has_trustline"]:
+        checks["trustline"] = lambda: check_trustline(
+            shareholder_addr=sh["wallet_address"],
+            token_symbol=symbol,
+            issuer_addr=issuing_addr,
+        )
+
+    results = await asyncio.gather(
+        *(_timed_check(semaphore, check) for check in checks.values())
+    )
+    timing = {"wallet_address": sh["wallet_address"]}
+    for name, (ok, elapsed_ms) in zip(checks, results):
+        if ok:
+            sh["has_paid" if name == "payment" else "has_trustline"] = True
+        timing[f"{name}_check_ms"] = elapsed_ms
+    return timing
+
+
+async def verify_shareholders(db: aiosqlite.Connection, company: dict) -> dict:
+    """
+    Verify payment + trustline for every shareholder of `company` with
+    bounded concurrency, persist the new has_paid / has_trustline flags and
+    return who is still missing what, plus per-shareholder timings.
+    """
+    symbol = company["symbol"]
+    issuing_addr = company["issuing_address"]
+    shareholders = company["shareholders"]
+
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+    # One scan of the issuer's history answers every payment check
+    payments: Dict[str, float] = {}
+    payment_scan_ms = 0.0
+    if any(not sh["has_paid"] for sh in shareholders):
+        payments, payment_scan_ms = await _timed_check(
+            semaphore, lambda: collect_rlusd_payments(issuing_addr, db)
+        )
+
+    # Likewise one scan of the issuer's trustlines answers most trustline checks
+    trustlined: Set[str] = set()
+    trustline_scan_ms = 0.0
+    if any(not sh["has_trustline"] for sh in shareholders):
+        try:
+            trustlined, trustline_scan_ms = await _timed_check(
+                semaphore, lambda: collect_trustlined_holders(issuing_addr, symbol)
+            )
+        except Exception as e:
+            # Every shareholder falls back to the per-account check
+            print(f"Error scanning trustlines of {issuing_addr}: {str(e)}")
+
+    timings = await asyncio.gather(
+        *(
+            verify_shareholder(
+                sh, issuing_addr, symbol, semaphore, payments, trustlined
+            )
+            for sh in shareholders
+        )
     )
+    total_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    # Update DB with new has_paid / has_trustline
+    await db.executemany(
+        """
+        UPDATE shareholders
+        SET has_paid=?, has_trustline=?
+        WHERE id=?
+    """,
+        [
+            (int(sh["has_paid"]), int(sh["has_trustline"]), sh["id"])
+            for sh in shareholders
+        ],
+    )
+    await db.commit()
+
+    # Identify who is still not paid or not trustlined
+    not_paid = []
+    not_trustlined = []
+    for sh in shareholders:
+        if not sh["has_paid"]:
+            not_paid.append(
+                {
+                    "wallet_address": sh["wallet_address"],
+                    "still_owed_rlusd": sh["required_rlusd"],
+                }
+            )
+        if not sh["has_trustline"]:
+            not_trustlined.append(
+                {"wallet_address": sh["wallet_address"], "token_symbol": symbol}
+            )
 
-    result = await sign_and_submit(pay_tx, XRPL_CLIENT, wallet)
     return {
-        "shareholder": shareholder_addr,
-        "tokens_sent": tokens_to_send,
-        "tx_result": result.result,
+        "shareholders": shareholders,
+        "not_paid": not_paid,
+        "not_trustlined": not_trustlined,
+        "verification": {
+            "total_ms": total_ms,
+            "payment_scan_ms": payment_scan_ms,
+            "trustline_scan_ms": trustline_scan_ms,
+            "shareholders": list(timings),
+        },
     }
 
 
+async def indexed_trustlined_holders(
+    db: aiosqlite.Connection, issuer_addr: str, token_symbol: str
+) -> Set[str]:
+    """
+    Accounts whose latest indexed TrustSet towards (token_symbol, issuer_addr)
+    has a non-zero limit.
+    """
+    token_codes = {currency_to_hex(token_symbol), token_symbol.upper()}
+    holders = set()
+    seen = set()
+    # Newest first, so the first TrustSet per account is its current limit
+    indexed = await get_issuer_transactions(db, issuer_addr, tx_type="TrustSet")
+    for parsed in indexed:
+        holder = parsed["Sender"]
+        if holder in seen:
+            continue
+        if parsed["Issue"] != issuer_addr:
+            continue
+        if parsed["Token"].upper() not in token_codes:
+            continue
+        seen.add(holder)
+        try:
+            if float(parsed["Amount"]) > 0:
+                holders.add(holder)
+        except ValueError:
+            pass
+    return holders
+
+
+async def apply_indexed_activity(db: aiosqlite.Connection, issuer_addr: str) -> int:
+    """
+    Set has_paid / has_trustline for the shareholders of the company issued
+    by `issuer_addr` from the local transaction index alone (no XRPL
+    requests). Like verify_shareholders, flags are only ever raised.
+    Returns how many shareholders changed.
+    """
+    async with db.execute(
+        "SELECT _id, symbol FROM companies WHERE issuing_address=?", (issuer_addr,)
+    ) as cursor:
+        companies = await cursor.fetchall()
+
+    updates = []
+    for company_id, symbol in companies:
+        async with db.execute(
+            """
+            SELECT id, wallet_address, required_rlusd, has_paid, has_trustline
+            FROM shareholders
+            WHERE company_id=? AND (NOT has_paid OR NOT has_trustline)
+        """,
+            (company_id,),
+        ) as cursor:
+            pending = await cursor.fetchall()
+        if not pending:
+            continue
+
+        payments = await indexed_rlusd_payments(db, issuer_addr)
+        trustlined = await indexed_trustlined_holders(db, issuer_addr, symbol)
+        for sh_id, wallet, required, has_paid, has_trustline in pending:
+            total_paid = round(payments.get(wallet, 0.0), 2)
+            paid = bool(has_paid) or total_paid >= round(required, 2)
+            trusted = bool(has_trustline) or wallet in trustlined
+            if paid != bool(has_paid) or trusted != bool(has_trustline):
+                updates.append((int(paid), int(trusted), sh_id))
+
+    if updates:
+        await db.executemany(
+            "UPDATE shareholders SET has_paid=?, has_trustline=? WHERE id=?",
+            updates,
+        )
+        await db.commit()
+        print(
+            f"[Ledger subscription] {issuer_addr}: updated {len(updates)} shareholders"
+        )
+    return len(updates)
+
+
 from decimal import Decimal
 
 
@@ -676,127 +888,106 @@ async def check_and_distribute(company_id: str):
 
     total_supply = company["total_supply"]
     symbol = company["symbol"]
-    issuing_addr = company["issuing_address"]
     issuing_seed = company["issuing_seed"]
     liquidity_percent = company["liquidity_percent"]
 
-    updated_shareholders = []
-    for sh in company["shareholders"]:
-        # Check Payment
-        if not sh["has_paid"]:
-            payment_ok = await check_rlusd_payment(
-                company_addr=issuing_addr,
-                shareholder_addr=sh["wallet_address"],
-                amount_needed=sh["required_rlusd"],
-            )
-            if payment_ok:
-                sh["has_paid"] = True
-
-        # Check Trustline
-        if not sh["has_trustline"]:
-            trustline_ok = await check_trustline(
-                shareholder_addr=sh["wallet_address"],
-                token_symbol=symbol,
-                issuer_addr=issuing_addr,
-            )
-            if trustline_ok:
-                sh["has_trustline"] = True
-
-        updated_shareholders.append(sh)
-
-    # Update DB with new has_paid / has_trustline
-    for sh in updated_shareholders:
-        await db.execute(
-            """
-            UPDATE shareholders
-            SET has_paid=?, has_trustline=?
-            WHERE id=?
-        """,
-            (int(sh["has_paid"]), int(sh["has_trustline"]), sh["id"]),
-        )
-    await db.commit()
-
-    # Identify who is still not paid or not trustlined
-    not_paid = []
-    not_trustlined = []
-    for sh in updated_shareholders:
-        if not sh["has_paid"]:
-            not_paid.append(
-                {
-                    "wallet_address": sh["wallet_address"],
-                    "still_owed_rlusd": sh["required_rlusd"],
-                }
-            )
-        if not sh["has_trustline"]:
-            not_trustlined.append(
-                {"wallet_address": sh["wallet_address"], "token_symbol": symbol}
-            )
+    verification = await verify_shareholders(db, company)
+    updated_shareholders = verification["shareholders"]
+    not_paid = verification["not_paid"]
+    not_trustlined = verification["not_trustlined"]
 
     if not_paid or not_trustlined:
         return {
             "message": "Not all shareholders have paid + trustlined. Distribution not performed.",
             "not_paid": not_paid,
             "not_trustlined": not_trustlined,
+            "verification": verification["verification"],
         }
 
     # Everyone paid + trustlined => distribute
     sum_shareholder_percent = sum(s["percent"] for s in updated_shareholders)
     non_liquidity_supply = total_supply * ((100 - liquidity_percent) / 100.0)
-    distribution_results = []
-
+    transfers = []
     for sh in updated_shareholders:
         if not sh["tokens_distributed"]:
             share_of_non_liq = (
                 sh["percent"] / sum_shareholder_percent
             ) * non_liquidity_supply
-            dist_res = await distribute_tokens(
-                issuer_seed=issuing_seed,
-                issuer_addr=issuing_addr,
-                token_symbol=symbol,
-                total_supply=total_supply,
-                shareholder_addr=sh["wallet_address"],
-                shareholder_percent=(share_of_non_liq / total_supply * 100.0),
-            )
-            sh["tokens_distributed"] = True
-            distribution_results.append(dist_res)
-
-    # Create AMM for the liquidity portion
-    liquidity_tokens = total_supply * (liquidity_percent / 100.0)
-    liquidity_usd_value = company["total_valuation_usd"] * (liquidity_percent / 100.0)
-
-    amm_result = await create_amm_pool(
-        issuer_seed=issuing_seed,
-        issuer_addr=issuing_addr,
-        token_symbol=symbol,
-        token_amount=liquidity_tokens,
-        rlusd_amount=liquidity_usd_value,
+            shareholder_percent = share_of_non_liq / total_supply * 100.0
+            tokens_to_send = math.floor(total_supply * (shareholder_percent / 100.0))
+            transfers.append((sh["id"], sh["wallet_address"], str(tokens_to_send)))
+
+    # Payments are signed and persisted first, then submitted, confirmed and
+    # followed by the AMM creation in the background (see distribution_jobs)
+    job = await app.state.distribution_jobs.start(
+        company_id, issuing_seed, currency_to_hex(symbol), transfers
     )
+    return {
+        "message": "All shareholders paid & trustlined. Token distribution started.",
+        "job_id": job["id"],
+        "status": job["status"],
+        "verification": verification["verification"],
+    }
 
-    # Mark the company as distributed
-    for sh in updated_shareholders:
-        await db.execute(
-            """
-            UPDATE shareholders
-            SET tokens_distributed=?
-            WHERE id=?
-        """,
-            (int(sh["tokens_distributed"]), sh["id"]),
+
+async def finish_distribution(company_id: str) -> dict:
+    """
+    Final step of a distribution job: create the AMM for the liquidity
+    portion and mark the company as distributed. An AMM left over from an
+    interrupted earlier attempt is reused rather than created twice.
+    """
+    db = app.state.db
+    company = await get_company_with_shareholders(db, company_id)
+    symbol = company["symbol"]
+    issuing_addr = company["issuing_address"]
+    liquidity_percent = company["liquidity_percent"]
+
+    existing = await XRPL_CLIENT.request(
+        AMMInfo(
+            asset={"currency": RLUSD_CURRENCY, "issuer": RLUSD_ISSUER},
+            asset2={"currency": currency_to_hex(symbol), "issuer": issuing_addr},
         )
+    )
+    if "amm" in existing.result:
+        amm_result = {"existing_amm": existing.result["amm"].get("account")}
+    else:
+        # Create AMM for the liquidity portion
+        liquidity_tokens = company["total_supply"] * (liquidity_percent / 100.0)
+        liquidity_usd_value = company["total_valuation_usd"] * (
+            liquidity_percent / 100.0
+        )
+        amm_result = await create_amm_pool(
+            issuer_seed=company["issuing_seed"],
+            issuer_addr=issuing_addr,
+            token_symbol=symbol,
+            token_amount=liquidity_tokens,
+            rlusd_amount=liquidity_usd_value,
+        )
+
+    # Mark the company as distributed
     await db.execute(
         """
         UPDATE companies
         SET state=?
         WHERE _id=?
     """,
-        ("distributed", company["_id"]),
+        ("distributed", company_id),
     )
     await db.commit()
+    return amm_result
 
-    return {
-        "message": "All shareholders paid & trustlined. Tokens distributed + AMM created!",
-        "distribution": distribution_results,
-        "amm_result": amm_result,
-    }
+
+@app.get("/distribution_jobs/{job_id}")
+async def get_distribution_job(job_id: str):
+    """
+    Progress of a distribution job started by check_and_distribute: its
+    status (submitting, confirming, creating_amm, completed or failed) and
+    each planned Payment with its hash, sequence and result.
+    """
+    job = await app.state.distribution_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Distribution job not found.")
+    return job
 
 
 # ------------------ 3) GET COMPANY INFO ------------------
@@ -878,33 +1069,64 @@ async def debug_issuer_transactions(issuer_addr: str):
     """
     Returns a list of all Payment transactions whose destination is the given issuer address.
     This helps you debug all incoming payments to the company issuer wallet.
+    Served from the local transaction index after fetching any new ledgers.
     """
-    req = AccountTx(account=issuer_addr, limit=200)
-    resp = await XRPL_CLIENT.request(req)
-    txs = resp.result.get("transactions", [])
-
-    debug_list = []
-    for tx_entry in txs:
-        tx = tx_entry.get("tx", {})
-        # We want transactions that are Payment and whose Destination == issuer_addr
-        if (
-            tx.get("TransactionType") == "Payment"
-            and tx.get("Destination") == issuer_addr
-        ):
-            debug_list.append(
-                {
-                    "tx_hash": tx.get("hash"),
-                    "Account": tx.get("Account"),  # sender
-                    "Amount": tx.get("Amount"),
-                    "Destination": tx.get("Destination"),
-                    "date": tx.get("date"),  # if available
-                }
-            )
+    await refresh_issuer_index(app.state.db, XRPL_CLIENT, issuer_addr)
+    indexed = await get_issuer_transactions(
+        app.state.db, issuer_addr, tx_type="Payment", receiver=issuer_addr
+    )
+    debug_list = [
+        {
+            "tx_hash": parsed["Transaction Hash"],
+            "Account": parsed["Sender"],  # sender
+            "Amount": parsed["Amount"],
+            "Token": parsed["Token"],
+            "Issue": parsed["Issue"],
+            "Destination": parsed["Receiver"],
+            "date": parsed["Date"],
+            "ledger_index": parsed["Ledger Index"],
+        }
+        for parsed in indexed
+    ]
     return {"issuer_transactions": debug_list}
 
 
+@app.get("/debug/xrpl_stats")
+async def debug_xrpl_stats():
+    """
+    Request counters of the shared XRPL client: requests sent, coalesced
+    and retried, plus read cache hits / misses.
+    """
+    return XRPL_CLIENT.stats
+
+
+def _holding_row(holder: dict, total_supply: float) -> dict:
+    # Percent ownership of the total supply
+    if total_supply > 0:
+        percent_ownership = (holder["balance"] / total_supply) * 100.0
+    else:
+        percent_ownership = 0.0
+    return {
+        "Wallet Address": holder["wallet_address"],
+        "Token Balance": str(holder["balance"]),
+        "Percent Ownership": round(percent_ownership, 2),
+        "Trustline Active": True,  # obviously they have an active trustline if they're in lines
+    }
+
+
+async def _get_token_company(company_id: str) -> dict:
+    company = await get_company_with_shareholders(app.state.db, company_id)
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found.")
+    return company
+
+
 @app.get("/companies/{company_id}/token_holdings")
-async def get_token_holdings_endpoint(company_id: str):
+async def get_token_holdings_endpoint(
+    company_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HOLDERS_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
     """
     Returns a list of all addresses holding this company's token,
     based on the issuer's AccountLines. For each trustline entry:
@@ -919,80 +1141,105 @@ async def get_token_holdings_endpoint(company_id: str):
       (holder_balance / total_supply) * 100
 
     Only non-zero holders are returned.
-    """
 
-    # 1) Fetch the company's details from your DB
-    db = app.state.db
-    company = await get_company_with_shareholders(db, company_id)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found.")
-
-    # Issuer info from DB
-    issuing_addr = company["issuing_address"]
-    token_symbol = company["symbol"]  # e.g. "WTAC"
-    total_supply = company["total_supply"]
-
-    # Convert ASCII symbol to 40-char hex
-    token_hex = currency_to_hex(token_symbol)
-
-    # 2) Query all trustlines from the issuer's perspective
+    With `limit`, at most that many holders are returned along with a
+    `next_cursor`; passing it back as `cursor` continues from the same
+    ledger. `next_cursor` is null after the last holder. Without `limit`
+    every holder is returned (see token_holdings/stream for large tokens).
+    """
+    company = await _get_token_company(company_id)
+    token_hex = currency_to_hex(company["symbol"])
     try:
-        req = AccountLines(account=issuing_addr, ledger_index="validated")
-        resp = await XRPL_CLIENT.request(req)
+        page = await read_token_holders(
+            XRPL_CLIENT,
+            company["issuing_address"],
+            token_hex,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"[!] Error in AccountLines for {issuing_addr}: {e}")
+        print(f"[!] Error in AccountLines for {company['issuing_address']}: {e}")
         raise HTTPException(
             status_code=500, detail="Error querying XRPL for issuer trustlines."
         )
 
-    lines = resp.result.get("lines", [])
-    if not lines:
-        return {"token_holdings": []}  # No trustlines at all
+    return {
+        "token_holdings": [
+            _holding_row(holder, company["total_supply"]) for holder in page["holders"]
+        ],
+        "next_cursor": page["next_cursor"],
+        "ledger_index": page["ledger_index"],
+    }
 
-    # 3) Parse each trustline
-    holdings_table = []
-    for line in lines:
-        # Filter only lines matching our token
-        if line.get("currency", "").upper() != token_hex:
-            continue
 
-        holder_addr = line.get("account")
-        balance_str = line.get("balance", "0")
+@app.get("/companies/{company_id}/token_holdings/stream")
+async def stream_token_holdings_endpoint(company_id: str, cursor: Optional[str] = None):
+    """
+    Every holder of this company's token as NDJSON, one token_holdings row
+    per line, read page by page from the issuer's trustlines as the client
+    consumes them. Each row carries the "cursor" to resume after it with.
+    """
+    company = await _get_token_company(company_id)
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # The "balance" is from the issuer's perspective:
-        # A negative issuer balance => the holder actually owns a positive amount.
+    async def rows():
         try:
-            issuer_balance = float(balance_str)
-        except ValueError:
-            issuer_balance = 0.0
-
-        # The holder's actual token holdings:
-        holder_balance = 0.0
-        if issuer_balance < 0:
-            holder_balance = -issuer_balance  # invert sign
-
-        # Skip if the holder's actual balance is zero
-        if holder_balance <= 0:
-            continue
+            async for holder, next_position in iter_token_holders(
+                XRPL_CLIENT,
+                company["issuing_address"],
+                currency_to_hex(company["symbol"]),
+                position,
+            ):
+                row = _holding_row(holder, company["total_supply"])
+                row["cursor"] = encode_cursor(next_position)
+                yield json.dumps(row) + "\n"
+        except Exception as e:
+            # Headers are already sent; the last line reports the failure
+            print(f"Error streaming token holders of {company_id}: {str(e)}")
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@app.get("/companies/{company_id}/holdings_snapshot")
+async def get_holdings_snapshot_endpoint(
+    company_id: str, ledger_index: Optional[int] = None
+):
+    """
+    The stored cap table as of `ledger_index` (default: the latest), with
+    balances and percent ownership as exact decimal strings. "ledger_index"
+    is the ledger the balances were read from and "checked_ledger" the last
+    ledger they were confirmed unchanged at; "exact" is False when the
+    requested ledger is past it, so its balances are not known.
+    """
+    snapshot = await get_snapshot(app.state.db, company_id, ledger_index)
+    if snapshot is None:
+        raise HTTPException(
+            status_code=404, detail="No holdings snapshot for this company yet."
+        )
+    return snapshot
 
-        # Compute percent ownership
-        if total_supply > 0:
-            percent_ownership = (holder_balance / total_supply) * 100.0
-        else:
-            percent_ownership = 0.0
 
-        # Add row to results
-        holdings_table.append(
-            {
-                "Wallet Address": holder_addr,
-                "Token Balance": str(holder_balance),
-                "Percent Ownership": round(percent_ownership, 2),
-                "Trustline Active": True,  # obviously they have an active trustline if they're in lines
-            }
+@app.get("/companies/{company_id}/holdings_snapshot/diff")
+async def diff_holdings_snapshot_endpoint(
+    company_id: str, from_ledger: int, to_ledger: Optional[int] = None
+):
+    """
+    Holder balance changes between the cap tables as of `from_ledger` and
+    `to_ledger` (default: the latest), with "exact" False when either side
+    is past its last checked ledger.
+    """
+    diff = await diff_snapshots(app.state.db, company_id, from_ledger, to_ledger)
+    if diff is None:
+        raise HTTPException(
+            status_code=404, detail="No holdings snapshot for this company yet."
         )
-
-    # Return the final array of non-zero holders
-    return {"token_holdings": holdings_table}
+    return diff
 
 
 # ------------------ Endpoint 2: Initial Stakeholder Check ------------------
@@ -1089,6 +1336,54 @@ async def get_amm_info_endpoint(
     return {"amm_info": resp.result}
 
 
+@app.get("/companies/{company_id}/amm_series")
+async def get_amm_series_endpoint(
+    company_id: str,
+    interval: int = Query(300, ge=1, description="Bucket size in seconds"),
+    start: Optional[int] = Query(None, description="Unix seconds; default end - 24 h"),
+    end: Optional[int] = Query(None, description="Unix seconds; default now"),
+):
+    """
+    OHLC candles of the company's AMM pool price (RLUSD per token) from the
+    stored pool samples, with the pool amounts, LP token supply and trading
+    fee at each bucket's close. Chart from this instead of polling amm_info.
+    """
+    end = end if end is not None else int(time.time())
+    start = start if start is not None else end - 24 * 3600
+    if bucket_count(start, end, interval) > MAX_OHLC_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_OHLC_BUCKETS} buckets; use a larger interval.",
+        )
+    candles = await get_ohlc(app.state.db, company_id, start, end, interval)
+    return {"interval": interval, "start": start, "end": end, "series": candles}
+
+
+# Seconds each ledger read of the full_info page may take
+FULL_INFO_SECTION_DEADLINE = float(os.getenv("FULL_INFO_SECTION_DEADLINE", "3"))
+
+
+async def _read_section(fetch, deadline: float) -> tuple:
+    """
+    Run `fetch()` (returning (data, ledger_index)) under a deadline.
+    Returns (data or None, meta) where meta reports the section's status
+    ("ok", "timeout" or "error"), the ledger the data is from, and timing.
+    """
+    start = time.perf_counter()
+    meta = {"status": "ok", "ledger_index": None, "error": None}
+    data = None
+    try:
+        data, meta["ledger_index"] = await asyncio.wait_for(fetch(), deadline)
+    except asyncio.TimeoutError:
+        meta["status"] = "timeout"
+        meta["error"] = f"No answer from the ledger within {deadline} s"
+    except Exception as e:
+        meta["status"] = "error"
+        meta["error"] = str(e)
+    meta["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return data, meta
+
+
 @app.get("/companies/{company_id}/full_info")
 async def get_full_company_info(company_id: str):
     """
@@ -1098,6 +1393,10 @@ async def get_full_company_info(company_id: str):
     - Token holders (actual trustline balances)
     - AMM info if available
     - Calculated stats like market cap, price, and AMM liquidity split
+
+    The ledger sections are read concurrently, each within its own deadline.
+    A section that fails or times out comes back empty and is reported in
+    "sections" (status, error, ledger index of the data, elapsed ms).
     """
     db = app.state.db
     company = await get_company_with_shareholders(db, company_id)
@@ -1107,47 +1406,45 @@ async def get_full_company_info(company_id: str):
     total_supply = company["total_supply"]
     token_symbol = company["symbol"]
     issuing_addr = company["issuing_address"]
-
-    # --------------------- Token Holders ---------------------
     token_hex = currency_to_hex(token_symbol)
-    try:
-        lines_resp = await XRPL_CLIENT.request(
-            AccountLines(account=issuing_addr, ledger_index="validated")
-        )
-        lines = lines_resp.result.get("lines", [])
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error fetching token trustlines: {e}"
-        )
 
-    token_holders = []
-    total_holder_tokens = 0.0
-    for line in lines:
-        if line.get("currency", "").upper() != token_hex:
-            continue
-        balance_str = line.get("balance", "0")
-        try:
-            bal = float(balance_str)
-        except:
-            bal = 0.0
-        if bal < 0:
-            owned = -bal
-            total_holder_tokens += owned
-            token_holders.append(
-                {"wallet_address": line.get("account"), "balance": owned}
-            )
+    # --------------------- Ledger Reads (concurrent) ---------------------
+    async def fetch_token_holders():
+        token_holders = []
+        total_holder_tokens = 0.0
+        ledger_index = None
+        async for holder, position in iter_token_holders(
+            XRPL_CLIENT, issuing_addr, token_hex
+        ):
+            total_holder_tokens += holder["balance"]
+            token_holders.append(holder)
+            ledger_index = position[0]
+        return (token_holders, total_holder_tokens), ledger_index
 
-    # --------------------- AMM Info ---------------------
-    amm_info = {}
-    try:
+    async def fetch_amm_info():
         req = AMMInfo(
             asset={"currency": RLUSD_CURRENCY, "issuer": RLUSD_ISSUER},
             asset2={"currency": token_hex, "issuer": issuing_addr},
         )
         resp = await XRPL_CLIENT.request(req)
-        amm_info = resp.result
-    except Exception as e:
-        amm_info = {"error": f"AMM not found or not active: {e}"}
+        if not resp.is_successful():
+            # e.g. actNotFound before the AMM exists: the section failed
+            raise XRPLRequestFailureException(resp.result)
+        return resp.result, resp.result.get(
+            "ledger_index", resp.result.get("ledger_current_index")
+        )
+
+    # Each section has its own deadline, so the page takes as long as the
+    # slowest read and a failed read only blanks its own section
+    (holders, holders_meta), (amm_result, amm_meta) = await asyncio.gather(
+        _read_section(fetch_token_holders, FULL_INFO_SECTION_DEADLINE),
+        _read_section(fetch_amm_info, FULL_INFO_SECTION_DEADLINE),
+    )
+    token_holders, total_holder_tokens = holders if holders else ([], None)
+    if amm_result is not None:
+        amm_info = amm_result
+    else:
+        amm_info = {"error": f"AMM not found or not active: {amm_meta['error']}"}
 
     # --------------------- Calculated Stats ---------------------
     liquidity_usd = company["total_valuation_usd"] * (
@@ -1166,6 +1463,18 @@ async def get_full_company_info(company_id: str):
         "liquidity_usd": round(liquidity_usd, 2),
         "liquidity_token_amount": total_supply * (company["liquidity_percent"] / 100.0),
     }
+    pool = (
+        parse_pool(
+            amm_result, RLUSD_ASSET, company_token_asset(token_symbol, issuing_addr)
+        )
+        if amm_result
+        else None
+    )
+    stats["pool_price_rlusd"] = round(pool["price"], 6) if pool else "N/A"
+    # Market cap needs the holder balances
+    stats_meta = {"status": "ok" if holders else "partial"}
+    if not holders:
+        stats_meta["error"] = "market_cap_usd unavailable: token holders not loaded"
 
     # --------------------- Shareholder Checklist ---------------------
     stakeholder_check = []
@@ -1201,6 +1510,11 @@ async def get_full_company_info(company_id: str):
         "stakeholders": stakeholder_check,
         "token_holders": token_holders,
         "amm_info": amm_info,
+        "sections": {
+            "token_holders": holders_meta,
+            "amm_info": amm_meta,
+            "stats": stats_meta,
+        },
     }
 
 
@@ -1220,60 +1534,9 @@ async def check_stakeholders(company_id: str):
     if not company:
         raise HTTPException(status_code=404, detail="Company not found.")
 
-    symbol = company["symbol"]
-    issuing_addr = company["issuing_address"]
-
-    updated_shareholders = []
-    for sh in company["shareholders"]:
-        # Check Payment
-        if not sh["has_paid"]:
-            payment_ok = await check_rlusd_payment(
-                company_addr=issuing_addr,
-                shareholder_addr=sh["wallet_address"],
-                amount_needed=sh["required_rlusd"],
-            )
-            if payment_ok:
-                sh["has_paid"] = True
-
-        # Check Trustline
-        if not sh["has_trustline"]:
-            trustline_ok = await check_trustline(
-                shareholder_addr=sh["wallet_address"],
-                token_symbol=symbol,
-                issuer_addr=issuing_addr,
-            )
-            if trustline_ok:
-                sh["has_trustline"] = True
-
-        updated_shareholders.append(sh)
-
-    # Update the database
-    for sh in updated_shareholders:
-        await db.execute(
-            """
-            UPDATE shareholders
-            SET has_paid=?, has_trustline=?
-            WHERE id=?
-        """,
-            (int(sh["has_paid"]), int(sh["has_trustline"]), sh["id"]),
-        )
-    await db.commit()
-
-    # Identify missing ones
-    not_paid = []
-    not_trustlined = []
-    for sh in updated_shareholders:
-        if not sh["has_paid"]:
-            not_paid.append(
-                {
-                    "wallet_address": sh["wallet_address"],
-                    "still_owed_rlusd": sh["required_rlusd"],
-                }
-            )
-        if not sh["has_trustline"]:
-            not_trustlined.append(
-                {"wallet_address": sh["wallet_address"], "token_symbol": symbol}
-            )
+    verification = await verify_shareholders(db, company)
+    not_paid = verification["not_paid"]
+    not_trustlined = verification["not_trustlined"]
 
     # Final output
     if not_paid or not_trustlined:
@@ -1281,12 +1544,14 @@ async def check_stakeholders(company_id: str):
             "message": "Some shareholders are still missing payment and/or trustline.",
             "not_paid": not_paid,
             "not_trustlined": not_trustlined,
+            "verification": verification["verification"],
         }
 
     return {
         "message": "All shareholders have paid and set trustlines. Ready for distribution.",
         "not_paid": [],
         "not_trustlined": [],
+        "verification": verification["verification"],
     }
 
 
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
 from models import MatchResult
 from database import Database
-from matching_algo import find_matches_for_company, find_matches_for_investor
+from match_snapshot import MatchingSnapshot
+from match_precompute import PrecomputedMatches
+from matching_algo import match_company, match_investor
 
 # Create router for matching endpoints
 router = APIRouter(
@@ -29,14 +31,19 @@ class MatchesResponse(BaseModel):
     entity_name: str  # Name of the entity we're finding matches for
 
 
-# Database dependency
-async def get_db():
-    db = Database()
-    try:
-        await db.connect()
-        yield db
-    finally:
-        await db.close()
+# Database dependency: the shared connection opened once in main.startup
+async def get_db(request: Request) -> Database:
+    return request.app.state.matching_db
+
+
+# Snapshot dependency: matching reads from memory, never from SQLite
+async def get_snapshot(request: Request) -> MatchingSnapshot:
+    return request.app.state.matching_snapshot
+
+
+# Precomputed match lists, served while they match the snapshot version
+async def get_precomputed(request: Request) -> PrecomputedMatches:
+    return request.app.state.precomputed_matches
 
 
 @router.get("/all", response_model=dict)
@@ -71,7 +78,8 @@ async def get_company_matches(
         5, ge=1, le=20, description="Maximum number of matches to return"
     ),
     min_score: float = Query(0.0, ge=0, le=10, description="Minimum match score"),
-    db: Database = Depends(get_db),
+    snapshot: MatchingSnapshot = Depends(get_snapshot),
+    precomputed: PrecomputedMatches = Depends(get_precomputed),
 ):
     """
     Get investor matches for a specific company.
@@ -81,22 +89,21 @@ async def get_company_matches(
     - **min_score**: Minimum match score threshold (default: 0.0)
     """
     try:
-        # Get all companY and investors from the database
-        company = await db.get_all_companies()
-        investors = await db.get_all_investors()
+        # One consistent version of both tables for the whole request
+        view = snapshot.view()
 
-        # Find the target company
-        target_company = next((c for c in company if c.id == company_id), None)
+        target_company = view.companies.get(company_id)
         if not target_company:
             raise HTTPException(
                 status_code=404, detail=f"Company with ID {company_id} not found"
             )
 
-        # Get matches using the matching algorithm
-        matches = find_matches_for_company(company_id, company, investors, top_n=limit)
-
-        # Filter by minimum score if specified
-        matches = [m for m in matches if m.score >= min_score]
+        # Serve the precomputed lists when fresh, otherwise score live
+        matches = precomputed.matches_for_company(view, company_id, limit, min_score)
+        if matches is None:
+            matches = match_company(
+                target_company, view.investor_batch, top_n=limit, min_score=min_score
+            )
 
         # Convert to response model
         match_details = [
@@ -111,9 +118,11 @@ async def get_company_matches(
             matches=match_details,
             count=len(match_details),
             entity_type="investor",
-            entity_name=target_company.name,
+            entity_name=target_company["name"],
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
 
@@ -125,7 +134,8 @@ async def get_investor_matches(
         5, ge=1, le=20, description="Maximum number of matches to return"
     ),
     min_score: float = Query(0.0, ge=0, le=10, description="Minimum match score"),
-    db: Database = Depends(get_db),
+    snapshot: MatchingSnapshot = Depends(get_snapshot),
+    precomputed: PrecomputedMatches = Depends(get_precomputed),
 ):
     """
     Get company matches for a specific investor.
@@ -135,24 +145,21 @@ async def get_investor_matches(
     - **min_score**: Minimum match score threshold (default: 0.0)
     """
     try:
-        # Get all companys and investors from the database
-        company = await db.get_all_companies()
-        investors = await db.get_all_investors()
+        # One consistent version of both tables for the whole request
+        view = snapshot.view()
 
-        # Find the target investor
-        target_investor = next((i for i in investors if i.id == investor_id), None)
+        target_investor = view.investors.get(investor_id)
         if not target_investor:
             raise HTTPException(
                 status_code=404, detail=f"Investor with ID {investor_id} not found"
             )
 
-        # Get matches using the matching algorithm
-        matches = find_matches_for_investor(
-            investor_id, company, investors, top_n=limit
-        )
-
-        # Filter by minimum score if specified
-        matches = [m for m in matches if m.score >= min_score]
+        # Serve the precomputed lists when fresh, otherwise score live
+        matches = precomputed.matches_for_investor(view, investor_id, limit, min_score)
+        if matches is None:
+            matches = match_investor(
+                target_investor, view.company_batch, top_n=limit, min_score=min_score
+            )
 
         # Convert to response model
         match_details = [
@@ -167,8 +174,10 @@ async def get_investor_matches(
             matches=match_details,
             count=len(match_details),
             entity_type="company",
-            entity_name=target_investor.name,
+            entity_name=target_investor["name"],
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
@@ -0,0 +1,387 @@
+"""
+Precomputed top-K matches for every company and investor.
+
+Both directions of matching ("investors for a company" and "companies for an
+investor") are views of the same company x investor score matrix. This job
+scores that matrix in blocks with the vectorized scorer, keeps the best K
+entries per row and per column, and persists them in the `match_results`
+table. The match endpoints serve those lists while they are fresh and fall
+back to live scoring otherwise.
+
+Runs are incremental. A content fingerprint of every entity is stored next to
+the results; the next run rescores only pairs that involve an entity added or
+changed since then, plus the full row/column of any entity whose stored list
+referenced a changed or removed entity.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from batch_scoring import score_matrix
+from matching_algo import (
+    MATCH_WEIGHTS,
+    MIN_MATCH_THRESHOLD,
+    company_match_details,
+    investor_match_details,
+)
+from match_snapshot import MatchingSnapshot, SnapshotView
+from models import MatchResult
+
+# Matches kept per entity; requests for more fall back to live scoring
+PRECOMPUTE_TOP_K = int(os.getenv("MATCHING_PRECOMPUTE_TOP_K", "20"))
+# Companies scored per block; bounds the (block x investors) score arrays
+PRECOMPUTE_BLOCK_SIZE = int(os.getenv("MATCHING_PRECOMPUTE_BLOCK_SIZE", "128"))
+# Seconds between background runs; 0 disables the background task
+PRECOMPUTE_INTERVAL = float(os.getenv("MATCHING_PRECOMPUTE_INTERVAL", "300"))
+
+ENTITY_TYPES = ("company", "investor")
+
+
+def record_fingerprint(record: Dict, embedding: Optional[np.ndarray] = None) -> str:
+    """
+    Content hash of an entity record, including its embedding (`embedding`,
+    or else the record's own; snapshot records leave it to the store).
+    """
+    fields = {key: value for key, value in record.items() if key != "embedding"}
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode())
+    if embedding is None:
+        embedding = record.get("embedding")
+    if embedding is not None:
+        digest.update(np.asarray(embedding, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def batch_fingerprints(batch) -> Dict[str, str]:
+    """Fingerprint of every entity of an encoded batch, embedding from its store row."""
+    vectors = batch.embedding_source.vectors
+    return {
+        entity_id: record_fingerprint(record, vectors[row] if present else None)
+        for entity_id, record, row, present in zip(
+            batch.ids,
+            batch.records,
+            batch.embedding_rows.tolist(),
+            batch.has_embedding.tolist(),
+        )
+    }
+
+
+def config_fingerprint(top_k: int) -> str:
+    """Hash of everything besides the data that determines the stored lists."""
+    config = {"weights": MATCH_WEIGHTS, "top_k": top_k}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def _candidate_keys(
+    scores: np.ndarray, valid: np.ndarray, positions: np.ndarray, n_total: int
+) -> np.ndarray:
+    """
+    One sortable int64 key per pair: the rounded score first, then the
+    earlier batch position (so ties order like the live path). -1 marks
+    pairs that are not a match.
+    """
+    quantized = np.rint(scores * 100).astype(np.int64)
+    return np.where(valid, quantized * (n_total + 1) + (n_total - positions), -1)
+
+
+def _decode_keys(keys: np.ndarray, ids: List[str]) -> List[Tuple[str, float]]:
+    n_total = len(ids)
+    return [
+        (ids[n_total - key % (n_total + 1)], (key // (n_total + 1)) / 100)
+        for key in keys[keys >= 0].tolist()
+    ]
+
+
+def _encode_matches(
+    matches: List[Tuple[str, float]], positions: Dict[str, int], n_total: int
+) -> List[int]:
+    return [
+        int(round(score * 100)) * (n_total + 1) + (n_total - positions[match_id])
+        for match_id, score in matches
+    ]
+
+
+class _RunningTopK:
+    """Best `k` candidate keys per row, merged block by block."""
+
+    def __init__(self, n_rows: int, k: int):
+        self.k = k
+        self.keys = np.full((n_rows, k), -1, dtype=np.int64)
+
+    def push(self, rows: np.ndarray, keys: np.ndarray):
+        merged = np.concatenate([self.keys[rows], keys], axis=1)
+        part = np.argpartition(-merged, self.k - 1, axis=1)[:, : self.k]
+        merged = np.take_along_axis(merged, part, axis=1)
+        self.keys[rows] = -np.sort(-merged, axis=1)
+
+
+class MatchRun:
+    """Output of one precompute run: only what changed since the previous run."""
+
+    def __init__(self):
+        self.results: Dict[str, Dict[str, List[Tuple[str, float]]]] = {
+            entity_type: {} for entity_type in ENTITY_TYPES
+        }
+        self.fingerprints: Dict[str, Dict[str, str]] = {}
+        self.removed: Dict[str, List[str]] = {}
+        self.full = False
+        self.rescored = {entity_type: 0 for entity_type in ENTITY_TYPES}
+        self.pairs_scored = 0
+
+
+def compute_match_run(
+    view: SnapshotView,
+    fingerprints: Dict[str, Dict[str, str]],
+    stored: Dict[str, Dict[str, List[Tuple[str, float]]]],
+    top_k: int = PRECOMPUTE_TOP_K,
+    block_size: int = PRECOMPUTE_BLOCK_SIZE,
+    full: bool = False,
+) -> MatchRun:
+    """
+    Score the pairs of `view` affected since the run that recorded
+    `fingerprints` and `stored` (the previous results), and return the new
+    top-`top_k` lists. Pure CPU work; safe to run in a worker thread.
+    """
+    run = MatchRun()
+    companies = view.company_batch
+    investors = view.investor_batch
+    n_companies, n_investors = len(companies), len(investors)
+
+    current = {
+        "company": batch_fingerprints(companies),
+        "investor": batch_fingerprints(investors),
+    }
+    config = config_fingerprint(top_k)
+    run.full = full or fingerprints.get("config", {}).get("matching") != config
+    if run.full:
+        stored = {}
+
+    previous = {t: fingerprints.get(t, {}) for t in ENTITY_TYPES}
+    for entity_type in ENTITY_TYPES:
+        run.removed[entity_type] = [
+            entity_id
+            for entity_id in previous[entity_type]
+            if entity_id not in current[entity_type]
+        ]
+        run.fingerprints[entity_type] = {
+            entity_id: fingerprint
+            for entity_id, fingerprint in current[entity_type].items()
+            if run.full or previous[entity_type].get(entity_id) != fingerprint
+        }
+    run.fingerprints["config"] = {"matching": config}
+
+    changed_c = np.array(
+        [c in run.fingerprints["company"] for c in companies.ids], dtype=bool
+    )
+    changed_i = np.array(
+        [i in run.fingerprints["investor"] for i in investors.ids], dtype=bool
+    )
+    stale_c = set(run.fingerprints["company"]) | set(run.removed["company"])
+    stale_i = set(run.fingerprints["investor"]) | set(run.removed["investor"])
+    stored_c = stored.get("company", {})
+    stored_i = stored.get("investor", {})
+
+    # Rows whose stored list may have lost an entry need every candidate again
+    full_c = changed_c | np.array(
+        [any(m in stale_i for m, _ in stored_c.get(c, [])) for c in companies.ids],
+        dtype=bool,
+    )
+    full_i = changed_i | np.array(
+        [any(m in stale_c for m, _ in stored_i.get(i, [])) for i in investors.ids],
+        dtype=bool,
+    )
+
+    best_c = _RunningTopK(n_companies, top_k)
+    best_i = _RunningTopK(n_investors, top_k)
+    company_positions = {c: p for p, c in enumerate(companies.ids)}
+    investor_positions = {i: p for p, i in enumerate(investors.ids)}
+    for row in np.flatnonzero(~full_c):
+        keys = _encode_matches(
+            stored_c.get(companies.ids[row], []), investor_positions, n_investors
+        )
+        best_c.keys[row, : len(keys)] = sorted(keys, reverse=True)
+    for row in np.flatnonzero(~full_i):
+        keys = _encode_matches(
+            stored_i.get(investors.ids[row], []), company_positions, n_companies
+        )
+        best_i.keys[row, : len(keys)] = sorted(keys, reverse=True)
+
+    def score_blocks(c_positions: np.ndarray, i_positions: np.ndarray):
+        if not len(c_positions) or not len(i_positions):
+            return
+        candidates = (
+            investors
+            if len(i_positions) == n_investors
+            else investors.take(i_positions)
+        )
+        for start in range(0, len(c_positions), block_size):
+            c_pos = c_positions[start : start + block_size]
+            scores = score_matrix(companies.take(c_pos), candidates, MATCH_WEIGHTS)
+            run.pairs_scored += scores.size
+            meaningful = scores > MIN_MATCH_THRESHOLD
+
+            # A row only takes candidates its stored list has not already seen
+            valid = (
+                meaningful
+                & investors.has_embedding[i_positions][np.newaxis, :]
+                & (full_c[c_pos][:, np.newaxis] | changed_i[i_positions])
+            )
+            best_c.push(
+                c_pos,
+                _candidate_keys(scores, valid, i_positions[np.newaxis, :], n_investors),
+            )
+
+            valid = (
+                meaningful.T
+                & companies.has_embedding[c_pos][np.newaxis, :]
+                & (full_i[i_positions][:, np.newaxis] | changed_c[c_pos])
+            )
+            best_i.push(
+                i_positions,
+                _candidate_keys(scores.T, valid, c_pos[np.newaxis, :], n_companies),
+            )
+
+    # Every pair some row still needs, scored exactly once
+    score_blocks(np.flatnonzero(full_c), np.arange(n_investors))
+    score_blocks(np.flatnonzero(~full_c), np.flatnonzero(full_i))
+
+    for entity_type, batch, best, stored_lists, candidate_ids in (
+        ("company", companies, best_c, stored_c, investors.ids),
+        ("investor", investors, best_i, stored_i, companies.ids),
+    ):
+        for row, entity_id in enumerate(batch.ids):
+            matches = _decode_keys(best.keys[row], candidate_ids)
+            if run.full or matches != stored_lists.get(entity_id, []):
+                run.results[entity_type][entity_id] = matches
+        run.rescored[entity_type] = len(run.results[entity_type])
+
+    return run
+
+
+async def run_precompute(
+    db,
+    view: SnapshotView,
+    top_k: int = PRECOMPUTE_TOP_K,
+    block_size: int = PRECOMPUTE_BLOCK_SIZE,
+    full: bool = False,
+) -> MatchRun:
+    """Compute the matches of `view` incrementally and persist them to `db`."""
+    fingerprints = await db.get_match_fingerprints()
+    stored = {t: await db.get_match_results(t) for t in ENTITY_TYPES}
+    # Scoring is CPU-bound; keep the event loop responsive
+    run = await asyncio.to_thread(
+        compute_match_run, view, fingerprints, stored, top_k, block_size, full
+    )
+    await db.save_match_run(run.results, run.fingerprints, run.removed)
+    return run
+
+
+class PrecomputedMatches:
+    """Persisted match lists held in memory, tied to the snapshot version they describe."""
+
+    def __init__(self, top_k: int = PRECOMPUTE_TOP_K):
+        self.top_k = top_k
+        self.results: Dict[str, Dict[str, List[Tuple[str, float]]]] = {
+            entity_type: {} for entity_type in ENTITY_TYPES
+        }
+        # Snapshot version the lists are exact for; None means not fresh
+        self.version: Optional[int] = None
+
+    async def load(self, db, view: SnapshotView) -> "PrecomputedMatches":
+        """Load stored lists, fresh only if they were computed from the same data."""
+        fingerprints = await db.get_match_fingerprints()
+        for entity_type in ENTITY_TYPES:
+            self.results[entity_type] = await db.get_match_results(entity_type)
+
+        current = {
+            "company": batch_fingerprints(view.company_batch),
+            "investor": batch_fingerprints(view.investor_batch),
+            "config": {"matching": config_fingerprint(self.top_k)},
+        }
+        matching = all(
+            fingerprints.get(t, {}) == current[t]
+            for t in ("company", "investor", "config")
+        )
+        self.version = view.version if matching else None
+        return self
+
+    def apply(self, run: MatchRun, version: int):
+        """Merge a finished run computed from snapshot `version`."""
+        for entity_type in ENTITY_TYPES:
+            results = self.results[entity_type]
+            for entity_id in run.removed.get(entity_type, []):
+                results.pop(entity_id, None)
+            results.update(run.results[entity_type])
+        self.version = version
+
+    def _lookup(
+        self, view: SnapshotView, entity_type: str, entity_id: str, top_n: int
+    ) -> Optional[List[Tuple[str, float]]]:
+        if self.version != view.version or top_n > self.top_k:
+            return None
+        return self.results[entity_type].get(entity_id, [])
+
+    def matches_for_company(
+        self, view: SnapshotView, company_id: str, top_n: int, min_score: float = 0.0
+    ) -> Optional[List[MatchResult]]:
+        """Stored investor matches for a company, or None when not fresh."""
+        matches = self._lookup(view, "company", company_id, top_n)
+        if matches is None:
+            return None
+        return [
+            MatchResult(
+                entity_id=investor_id,
+                name=view.investors[investor_id]["name"],
+                score=score,
+                details=investor_match_details(view.investors[investor_id]),
+            )
+            for investor_id, score in matches[:top_n]
+            if score >= min_score
+        ]
+
+    def matches_for_investor(
+        self, view: SnapshotView, investor_id: str, top_n: int, min_score: float = 0.0
+    ) -> Optional[List[MatchResult]]:
+        """Stored company matches for an investor, or None when not fresh."""
+        matches = self._lookup(view, "investor", investor_id, top_n)
+        if matches is None:
+            return None
+        return [
+            MatchResult(
+                entity_id=company_id,
+                name=view.companies[company_id]["name"],
+                score=score,
+                details=company_match_details(view.companies[company_id]),
+            )
+            for company_id, score in matches[:top_n]
+            if score >= min_score
+        ]
+
+
+async def precompute_periodically(
+    db,
+    snapshot: MatchingSnapshot,
+    precomputed: PrecomputedMatches,
+    interval: float = PRECOMPUTE_INTERVAL,
+):
+    """Background task: refresh the stored matches whenever the snapshot changed."""
+    while True:
+        view = snapshot.view()
+        if precomputed.version != view.version:
+            try:
+                run = await run_precompute(db, view, top_k=precomputed.top_k)
+                precomputed.apply(run, view.version)
+                print(
+                    f"Match precompute: {run.rescored['company']} companies, "
+                    f"{run.rescored['investor']} investors updated "
+                    f"({run.pairs_scored} pairs scored)"
+                )
+            except Exception as e:
+                print(f"Error precomputing matches: {str(e)}")
+        # Holding the view while asleep would make every save copy the snapshot
+        del view
+        await asyncio.sleep(interval)
@@ -0,0 +1,256 @@
+"""
+In-process snapshot of companies and investors for the matching service.
+
+Match requests used to read and deserialize every row of the `company` and
+`investors` tables into Pydantic models. The snapshot loads both tables once
+at startup and keeps them as plain records plus their column encodings
+(CompanyBatch / InvestorBatch), so the hot path never touches SQLite.
+
+Embeddings are held once, as rows of EMBEDDING_STORE: the encoded batches
+only keep each entity's store row, and records drop their "embedding" once
+encoded.
+
+Database.save_company / Database.save_investor write through to the snapshot
+attached to them. A write encodes only the saved record and stores it in its
+row of the columns (or a new row for a new id); the columns have spare
+capacity, like the embedding store, so nothing is re-encoded or rebuilt.
+
+Every write bumps `version`; readers take a SnapshotView, which is never
+mutated, so a request sees one consistent version even if a write lands
+while it is scoring. A view holds the first `n` rows of each column, so rows
+appended later are invisible to it. Replacing a row after a view was taken
+copies the columns first (once per view), so the view keeps the old ones.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from batch_scoring import (
+    CompanyBatch,
+    InvestorBatch,
+    encode_companies,
+    encode_investors,
+)
+from embedding_store import MIN_CAPACITY
+from models import Company, Investor
+
+
+def _resized(array: np.ndarray, rows: int, width: Optional[int] = None) -> np.ndarray:
+    """
+    Copy of a batch column with room for at least `rows` rows and, for
+    matrices, `width` columns. New id cells are -1 (the batches' "no value"),
+    everything else is zero/False.
+    """
+    capacity = max(len(array), MIN_CAPACITY)
+    while capacity < rows:
+        capacity *= 2
+    fill = -1 if np.issubdtype(array.dtype, np.integer) else 0
+    if array.ndim > 1:
+        new = np.full((capacity, max(width or 0, array.shape[1])), fill, array.dtype)
+        new[: len(array), : array.shape[1]] = array
+    else:
+        new = np.full(capacity, fill, array.dtype)
+        new[: len(array)] = array
+    return new
+
+
+class _Columns:
+    """Holder of a table's column arrays (one attribute per batch field)."""
+
+
+class _Table:
+    """
+    The encoded batch of one table, with spare capacity, updated a row at a
+    time. Takes ownership of the batch's records and drops their embeddings,
+    which the batch reads from its embedding store.
+    """
+
+    def __init__(self, batch, encode: Callable[[List[Dict[str, Any]]], Any]):
+        self._encode = encode
+        # Set once batch() hands out the columns; replacing a row then copies them
+        self._shared = False
+        for record in batch.records:
+            record.pop("embedding", None)
+        self._type = type(batch)
+        self._n = len(batch)
+        self._rows: Dict[str, int] = {entity_id: r for r, entity_id in enumerate(batch.ids)}
+        # Per-row fields as in batch_scoring._take; everything else is shared as-is
+        self._fixed: Dict[str, Any] = {}
+        self._lists: Dict[str, List[Any]] = {}
+        self._columns = _Columns()
+        self._column_names: List[str] = []
+        for name, value in vars(batch).items():
+            if isinstance(value, np.ndarray) and value.ndim and len(value) == self._n:
+                setattr(self._columns, name, _resized(value, self._n))
+                self._column_names.append(name)
+            elif isinstance(value, list):
+                self._lists[name] = list(value)
+            else:
+                self._fixed[name] = value
+
+    def upsert(self, record: Dict[str, Any]):
+        """Encode `record` alone and write it to its row, or append a row for a new id."""
+        # The embedding is kept by the store only (a no-op if it is already there)
+        self._fixed["embedding_store"].upsert(record["id"], record.get("embedding"))
+        encoded = self._encode([record])
+        record.pop("embedding", None)
+        self._follow_embeddings(encoded.embedding_source)
+        row = self._rows.get(record["id"])
+        replacing = row is not None
+        if replacing and self._shared:
+            # A view holds the current columns; appended rows lie past its
+            # slice, but a replaced one may not
+            for name in self._column_names:
+                setattr(self._columns, name, getattr(self._columns, name).copy())
+            self._shared = False
+        if not replacing:
+            row = self._n
+            self._n += 1
+            self._rows[record["id"]] = row
+            for name, values in self._lists.items():
+                values.append(getattr(encoded, name)[0])
+        else:
+            # Views hold slices of the lists, never the lists themselves
+            for name, values in self._lists.items():
+                values[row] = getattr(encoded, name)[0]
+
+        for name in self._column_names:
+            value = getattr(encoded, name)[0]
+            width = len(value) if value.ndim else None
+            column = getattr(self._columns, name)
+            if self._n > len(column) or (width is not None and width > column.shape[1]):
+                column = _resized(column, self._n, width)
+                setattr(self._columns, name, column)
+
+            if width is None:
+                column[row] = value
+            else:
+                column[row, :width] = value
+                column[row, width:] = -1 if np.issubdtype(column.dtype, np.integer) else 0
+
+    def _follow_embeddings(self, source):
+        """
+        Point the table at the store's latest rows (a superset of the ones it
+        has); after a compaction renumbered them, look every row up again.
+        """
+        if source.generation != self._fixed["embedding_source"].generation:
+            rows = self._fixed["embedding_store"].row_of(self._lists["ids"])
+            current = self._columns.embedding_rows
+            remapped = np.full(len(current), -1, current.dtype)
+            remapped[: len(rows)] = rows
+            # A new array: views keep the rows of their own source
+            self._columns.embedding_rows = remapped
+        self._fixed["embedding_source"] = source
+
+    def batch(self):
+        """Batch of the first rows as they are now; later writes never change it."""
+        self._shared = True
+        batch = object.__new__(self._type)
+        for name, value in self._fixed.items():
+            setattr(batch, name, value)
+        for name, values in self._lists.items():
+            setattr(batch, name, values[: self._n])
+        for name in self._column_names:
+            setattr(batch, name, getattr(self._columns, name)[: self._n])
+        return batch
+
+    def records(self, batch) -> "_Records":
+        return _Records(self._rows, batch.ids, batch.records)
+
+
+class _Records(Mapping):
+    """Read-only id -> record mapping over the rows of one view's batch."""
+
+    def __init__(self, rows: Dict[str, int], ids: List[str], records: List[Dict[str, Any]]):
+        # `rows` is the table's live index; rows past this view's length are ignored
+        self._rows = rows
+        self._ids = ids
+        self._records = records
+
+    def __getitem__(self, entity_id: str) -> Dict[str, Any]:
+        row = self._rows.get(entity_id)
+        if row is None or row >= len(self._records):
+            raise KeyError(entity_id)
+        return self._records[row]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class SnapshotView:
+    """Immutable view of the snapshot at one version."""
+
+    def __init__(
+        self,
+        version: int,
+        companies: Mapping,
+        investors: Mapping,
+        company_batch: CompanyBatch,
+        investor_batch: InvestorBatch,
+    ):
+        self.version = version
+        self.companies = companies
+        self.investors = investors
+        self.company_batch = company_batch
+        self.investor_batch = investor_batch
+
+
+class MatchingSnapshot:
+    """Read-mostly copy of both tables, updated write-through by Database."""
+
+    def __init__(self):
+        self.version = 0
+        self._companies = _Table(encode_companies([]), encode_companies)
+        self._investors = _Table(encode_investors([]), encode_investors)
+        self._view: Optional[SnapshotView] = None
+
+    async def load(self, db) -> "MatchingSnapshot":
+        """Load both tables from `db` and register for its write-through updates."""
+        companies = await db.get_all_companies()
+        investors = await db.get_all_investors()
+        self._companies = _Table(
+            encode_companies([c.model_dump() for c in companies]), encode_companies
+        )
+        self._investors = _Table(
+            encode_investors([i.model_dump() for i in investors]), encode_investors
+        )
+        self._view = None
+        self.version += 1
+        db.snapshot = self
+        print(
+            f"Matching snapshot loaded: {len(companies)} companies, "
+            f"{len(investors)} investors"
+        )
+        return self
+
+    def upsert_company(self, company: Company):
+        """Replace or add one company."""
+        # Drop the cached view first so only views still in use force a copy
+        self._view = None
+        self._companies.upsert(company.model_dump())
+        self.version += 1
+
+    def upsert_investor(self, investor: Investor):
+        """Replace or add one investor."""
+        self._view = None
+        self._investors.upsert(investor.model_dump())
+        self.version += 1
+
+    def view(self) -> SnapshotView:
+        """Consistent view of the current version."""
+        if self._view is None or self._view.version != self.version:
+            company_batch = self._companies.batch()
+            investor_batch = self._investors.batch()
+            self._view = SnapshotView(
+                self.version,
+                self._companies.records(company_batch),
+                self._investors.records(investor_batch),
+                company_batch,
+                investor_batch,
+            )
+        return self._view
@@ -2,21 +2,33 @@ import os
 from typing import List, Dict, Optional, Any, Union
 import numpy as np
 import dotenv
-from openai import AzureOpenAI
-from sklearn.metrics.pairwise import cosine_similarity
 
 from models import Company, Investor, MatchResult
 from database import Database
+from batch_scoring import (
+    EARLY_STAGES,
+    EXIT_TIMELINES,
+    REVENUE_STAGE_RANKS,
+    RISK_LEVELS,
+    CompanyBatch,
+    InvestorBatch,
+    encode_companies,
+    encode_investors,
+    score_matrix,
+)
+from embedding_store import embedding_similarity
+from ann_index import nearest_rows
+from embeddings import get_embedding_service
 
 # Load environment variables
 dotenv.load_dotenv()
 
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-)
+# Approximate nearest-neighbour candidate stage. When enabled, only the
+# MATCHING_ANN_CANDIDATES entities closest by embedding are fully scored;
+# set MATCHING_ANN_ENABLED=false to fall back to exact scoring of every row.
+ANN_ENABLED = os.getenv("MATCHING_ANN_ENABLED", "false").lower() == "true"
+ANN_CANDIDATES = int(os.getenv("MATCHING_ANN_CANDIDATES", "500"))
+ANN_N_PROBE = int(os.getenv("MATCHING_ANN_NPROBE", "8"))
 
 # --- Embedding Generation ---
 
@@ -138,22 +150,20 @@ def generate_investor_text_for_embedding(investor: Dict[str, Any]) -> str:
     return ". ".join(filter(None, parts))
 
 
-def get_embedding(text: str) -> Optional[np.ndarray]:
-    """Get embedding vector for text using Azure OpenAI API."""
-    if not text:
+def get_embeddings(texts: List[str]) -> List[Optional[np.ndarray]]:
+    """
+    Get embedding vectors for many texts, in order. Texts are sent to the
+    provider in batches and unchanged texts are served from the embedding
+    cache, so re-running the data tools does not re-embed them.
+    """
+    if not all(texts):
         print("Warning: Empty text provided for embedding")
-        return None
+    return get_embedding_service().embed_texts(texts)
 
-    try:
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-3-small",  # Your deployment name
-        )
-        embedding = response.data[0].embedding
-        return np.array(embedding)
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
-        return None
+
+def get_embedding(text: str) -> Optional[np.ndarray]:
+    """Get embedding vector for text (see get_embeddings)."""
+    return get_embeddings([text])[0]
 
 
 # --- Match Score Calculation ---
@@ -181,6 +191,9 @@ MATCH_WEIGHTS = {
     "embedding": 3.0,
 }
 
+# Only scores above this count as meaningful matches
+MIN_MATCH_THRESHOLD = MATCH_WEIGHTS["embedding"] * 0.1
+
 
 def calculate_match_score(
     company: Union[Company, Dict[str, Any]], investor: Union[Investor, Dict[str, Any]]
@@ -243,9 +256,7 @@ def calculate_match_score(
 
     if company_exit and investor_timeline:
         # Map exit strategies to typical timelines
-        exit_timelines = {"acquisition": 5, "ipo": 7, "long_term_growth": 10}
-
-        company_timeline = exit_timelines.get(company_exit, 7)
+        company_timeline = EXIT_TIMELINES.get(company_exit, 7)
 
         # Score based on alignment of timelines
         timeline_diff = abs(company_timeline - investor_timeline)
@@ -257,17 +268,11 @@ def calculate_match_score(
     # --- Revenue Stage Match ---
     company_rev_stage = company_data.get("revenue_stage")
     if company_rev_stage:
-        stage_ranks = {
-            "pre_revenue": 1,
-            "early_revenue": 2,
-            "break_even": 3,
-            "profitable": 4,
-        }
-        rev_rank = stage_ranks.get(company_rev_stage, 0)
+        rev_rank = REVENUE_STAGE_RANKS.get(company_rev_stage, 0)
 
         # Early investors might prefer early revenue stages
         early_investor = any(
-            s in ["seed", "pre-seed"] for s in investor_data.get("preferred_stages", [])
+            s in EARLY_STAGES for s in investor_data.get("preferred_stages", [])
         )
         if early_investor and rev_rank <= 2:
             score += MATCH_WEIGHTS["revenue_stage"]
@@ -337,15 +342,8 @@ def calculate_match_score(
     investor_risk = investor_data.get("risk_appetite")
 
     if company_risk and investor_risk:
-        risk_levels = {
-            "conservative": 1,
-            "moderate": 2,
-            "aggressive": 3,
-            "very_aggressive": 4,
-        }
-
-        company_risk_level = risk_levels.get(company_risk.lower(), 0)
-        investor_risk_level = risk_levels.get(investor_risk.lower(), 0)
+        company_risk_level = RISK_LEVELS.get(company_risk.lower(), 0)
+        investor_risk_level = RISK_LEVELS.get(investor_risk.lower(), 0)
 
         # Perfect match or investor is willing to take more risk than company needs
         if company_risk_level == investor_risk_level:
@@ -394,18 +392,8 @@ def calculate_match_score(
     investor_embedding = investor_data.get("embedding")
 
     if company_embedding is not None and investor_embedding is not None:
-        # Convert to numpy arrays if needed
-        if not isinstance(company_embedding, np.ndarray):
-            company_embedding = np.array(company_embedding)
-        if not isinstance(investor_embedding, np.ndarray):
-            investor_embedding = np.array(investor_embedding)
-
-        # Reshape for cosine similarity calculation
-        company_emb_2d = company_embedding.reshape(1, -1)
-        investor_emb_2d = investor_embedding.reshape(1, -1)
-
-        # Calculate cosine similarity
-        similarity = cosine_similarity(company_emb_2d, investor_emb_2d)[0][0]
+        # Calculate cosine similarity (at the precision embeddings are stored in)
+        similarity = embedding_similarity(company_embedding, investor_embedding)
         similarity = max(0, similarity)  # Ensure non-negative
 
         score += MATCH_WEIGHTS["embedding"] * similarity
@@ -418,117 +406,258 @@ def calculate_match_score(
 # --- Finding Matches ---
 
 
+def _ann_candidates(batch, target, use_ann: Optional[bool]):
+    """Narrow `batch` to the entities closest by embedding to the encoded `target`."""
+    if use_ann is None:
+        use_ann = ANN_ENABLED
+    if not use_ann or not target.has_embedding[0] or len(batch) <= ANN_CANDIDATES:
+        return batch
+
+    query = target.embedding_source.unit_vectors(
+        target.embedding_rows, dtype=np.float32
+    )[0]
+    # Only rows this batch scores; older versions of replaced entities are not
+    wanted = np.zeros(len(batch.embedding_source), dtype=bool)
+    wanted[batch.embedding_rows[batch.has_embedding]] = True
+    rows = nearest_rows(
+        batch.embedding_store,
+        query,
+        ANN_CANDIDATES,
+        n_probe=ANN_N_PROBE,
+        rows=batch.embedding_source,
+        wanted=wanted,
+    )
+    if rows is None:
+        # The index is still being built: score every entity exactly
+        return batch
+    return batch.restrict_to_rows(rows)
+
+
+def _top_n(scores: np.ndarray, selected: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    Positions of the `top_n` highest `scores` among those where `selected` is
+    True, best first. Equal scores keep their batch order, as a stable sort
+    of every match would, but only O(top_n) positions are ever sorted.
+    """
+    candidates = np.flatnonzero(selected)
+    if top_n <= 0 or len(candidates) == 0:
+        return candidates[:0]
+
+    candidate_scores = scores[candidates]
+    if len(candidates) > top_n:
+        # Score of the N-th best; keep everything above it plus the earliest ties
+        cutoff = np.partition(candidate_scores, len(candidates) - top_n)[
+            len(candidates) - top_n
+        ]
+        above = candidate_scores > cutoff
+        ties = np.flatnonzero(candidate_scores == cutoff)[: top_n - int(above.sum())]
+        keep = np.concatenate([np.flatnonzero(above), ties])
+        candidates = candidates[keep]
+        candidate_scores = candidate_scores[keep]
+
+    # lexsort: last key is primary (score descending), then batch position
+    order = np.lexsort((candidates, -candidate_scores))
+    return candidates[order]
+
+
+def _select_matches(
+    scores: np.ndarray,
+    has_embedding: np.ndarray,
+    top_n: int,
+    min_score: float,
+) -> np.ndarray:
+    """Batch positions of the best matches, after the score thresholds."""
+    selected = has_embedding & (scores > MIN_MATCH_THRESHOLD) & (scores >= min_score)
+    return _top_n(scores, selected, top_n)
+
+
+def investor_match_details(investor: Dict) -> Dict:
+    """Display details of an investor shown in a MatchResult."""
+    # The column is nullable: a missing minimum is shown as $0 (formatting
+    # None would raise, as get(..., 0) returns None for a stored NULL)
+    min_investment = investor.get("min_investment_usd") or 0
+    return {
+        "type": investor.get("investor_type"),
+        "industries": investor.get("preferred_industries"),
+        "excluded_industries": investor.get("excluded_industries"),
+        "stages": investor.get("preferred_stages"),
+        "min_investment": f"${min_investment:,.0f}",
+        "max_investment": f"${investor.get('max_investment_usd', 0):,.0f}"
+        if investor.get("max_investment_usd")
+        else "No limit",
+        "business_models": investor.get("business_model_focus"),
+        "esg_mandate": "Yes" if investor.get("esg_mandate") else "No",
+        "exit_timeline": f"{investor.get('exit_timeline_years')} years"
+        if investor.get("exit_timeline_years")
+        else "Not specified",
+    }
+
+
+def company_match_details(company: Dict) -> Dict:
+    """Display details of a company shown in a MatchResult."""
+    return {
+        "industry": company.get("industry"),
+        "sub_industries": company.get("sub_industries"),
+        "stage": company.get("stage"),
+        "location": company.get("location"),
+        "valuation": f"${company.get('total_valuation_usd', 0):,.0f}",
+        "revenue_stage": company.get("revenue_stage"),
+        "business_model": company.get("business_model"),
+        "esg_focus": "Yes" if company.get("esg_focus") else "No",
+        "exit_strategy": company.get("exit_strategy"),
+    }
+
+
+def match_company(
+    company: Union[Company, Dict],
+    investors: Union[List[Union[Investor, Dict]], InvestorBatch],
+    top_n: int = 5,
+    use_ann: Optional[bool] = None,
+    min_score: float = 0.0,
+) -> List[MatchResult]:
+    """
+    Find the best investor matches for `company` among `investors`.
+
+    Only the candidate side is loaded: `investors` may be a list of models or
+    dicts, or an InvestorBatch encoded earlier with encode_investors so
+    repeated calls skip re-encoding the investor table. `use_ann` overrides
+    MATCHING_ANN_ENABLED for this call. Matches scoring below `min_score`
+    are dropped before the top N are selected.
+    """
+    target_company = company if isinstance(company, dict) else company.model_dump()
+    investor_batch = (
+        investors
+        if isinstance(investors, InvestorBatch)
+        else encode_investors(investors)
+    )
+
+    # The embedding is read from the store (snapshot records do not carry it)
+    company_batch = encode_companies([target_company])
+    if not company_batch.has_embedding[0]:
+        print(f"Warning: Company {target_company['name']} has no embedding")
+
+    # One line per request: listing every candidate would flood the logs
+    missing = int(np.count_nonzero(~investor_batch.has_embedding))
+    if missing:
+        print(f"Warning: {missing} investors have no embedding and cannot match")
+
+    investor_batch = _ann_candidates(investor_batch, company_batch, use_ann)
+    investors_data = investor_batch.records
+
+    # Calculate match scores with all (candidate) investors in one pass
+    scores = score_matrix(company_batch, investor_batch, MATCH_WEIGHTS)[0]
+
+    # Results (and their formatted details) are only built for the winners
+    winners = _select_matches(scores, investor_batch.has_embedding, top_n, min_score)
+    return [
+        MatchResult(
+            entity_id=investors_data[idx]["id"],
+            name=investors_data[idx]["name"],
+            score=float(scores[idx]),
+            details=investor_match_details(investors_data[idx]),
+        )
+        for idx in winners
+    ]
+
+
+def match_investor(
+    investor: Union[Investor, Dict],
+    companies: Union[List[Union[Company, Dict]], CompanyBatch],
+    top_n: int = 5,
+    use_ann: Optional[bool] = None,
+    min_score: float = 0.0,
+) -> List[MatchResult]:
+    """
+    Find the best company matches for `investor` among `companies`.
+
+    `companies` may be a list of models or dicts, or a CompanyBatch encoded
+    earlier with encode_companies. `use_ann` overrides MATCHING_ANN_ENABLED
+    for this call. Matches scoring below `min_score` are dropped before the
+    top N are selected.
+    """
+    target_investor = investor if isinstance(investor, dict) else investor.model_dump()
+    company_batch = (
+        companies
+        if isinstance(companies, CompanyBatch)
+        else encode_companies(companies)
+    )
+
+    investor_batch = encode_investors([target_investor])
+    if not investor_batch.has_embedding[0]:
+        print(f"Warning: Investor {target_investor['name']} has no embedding")
+
+    missing = int(np.count_nonzero(~company_batch.has_embedding))
+    if missing:
+        print(f"Warning: {missing} companies have no embedding and cannot match")
+
+    company_batch = _ann_candidates(company_batch, investor_batch, use_ann)
+    companies_data = company_batch.records
+
+    # Calculate match scores with all (candidate) companies in one pass
+    scores = score_matrix(company_batch, investor_batch, MATCH_WEIGHTS)[:, 0]
+
+    # Results (and their formatted details) are only built for the winners
+    winners = _select_matches(scores, company_batch.has_embedding, top_n, min_score)
+    return [
+        MatchResult(
+            entity_id=companies_data[idx]["id"],
+            name=companies_data[idx]["name"],
+            score=float(scores[idx]),
+            details=company_match_details(companies_data[idx]),
+        )
+        for idx in winners
+    ]
+
+
 def find_matches_for_company(
     company_id: str,
     company: List[Union[Company, Dict]],
-    investors: List[Union[Investor, Dict]],
+    investors: Union[List[Union[Investor, Dict]], InvestorBatch],
     top_n: int = 5,
+    use_ann: Optional[bool] = None,
+    min_score: float = 0.0,
 ) -> List[MatchResult]:
-    """Find the best investor matches for a specific company."""
-    # Convert to dict if Pydantic models were passed
-    companies_data = [c if isinstance(c, dict) else c.model_dump() for c in company]
-    investors_data = [i if isinstance(i, dict) else i.model_dump() for i in investors]
-
+    """Find the best investor matches for the company with `company_id`."""
     # Find the target company
-    target_company = next((c for c in companies_data if c["id"] == company_id), None)
+    target_company = next(
+        (
+            c
+            for c in company
+            if (c["id"] if isinstance(c, dict) else c.id) == company_id
+        ),
+        None,
+    )
     if not target_company:
         print(f"Error: Company with ID {company_id} not found")
         return []
 
-    if target_company.get("embedding") is None:
-        print(f"Warning: Company {target_company['name']} has no embedding")
-
-    # Calculate match scores with all investors
-    matches = []
-    for investor in investors_data:
-        if investor.get("embedding") is None:
-            print(f"Warning: Investor {investor['name']} has no embedding")
-            continue
-
-        score = calculate_match_score(target_company, investor)
-
-        # Only include meaningful matches
-        min_threshold = MATCH_WEIGHTS["embedding"] * 0.1
-        if score > min_threshold:
-            matches.append(
-                MatchResult(
-                    entity_id=investor["id"],
-                    name=investor["name"],
-                    score=score,
-                    details={
-                        "type": investor.get("investor_type"),
-                        "industries": investor.get("preferred_industries"),
-                        "excluded_industries": investor.get("excluded_industries"),
-                        "stages": investor.get("preferred_stages"),
-                        "min_investment": f"${investor.get('min_investment_usd', 0):,.0f}",
-                        "max_investment": f"${investor.get('max_investment_usd', 0):,.0f}"
-                        if investor.get("max_investment_usd")
-                        else "No limit",
-                        "business_models": investor.get("business_model_focus"),
-                        "esg_mandate": "Yes" if investor.get("esg_mandate") else "No",
-                        "exit_timeline": f"{investor.get('exit_timeline_years')} years"
-                        if investor.get("exit_timeline_years")
-                        else "Not specified",
-                    },
-                )
-            )
-
-    # Sort by score (descending) and return top N
-    matches.sort(key=lambda x: x.score, reverse=True)
-    return matches[:top_n]
+    return match_company(
+        target_company, investors, top_n=top_n, use_ann=use_ann, min_score=min_score
+    )
 
 
 def find_matches_for_investor(
     investor_id: str,
-    company: List[Union[Company, Dict]],
+    company: Union[List[Union[Company, Dict]], CompanyBatch],
     investors: List[Union[Investor, Dict]],
     top_n: int = 5,
+    use_ann: Optional[bool] = None,
+    min_score: float = 0.0,
 ) -> List[MatchResult]:
-    """Find the best company matches for a specific investor."""
-    # Convert to dict if Pydantic models were passed
-    companies_data = [c if isinstance(c, dict) else c.model_dump() for c in company]
-    investors_data = [i if isinstance(i, dict) else i.model_dump() for i in investors]
-
+    """Find the best company matches for the investor with `investor_id`."""
     # Find the target investor
-    target_investor = next((i for i in investors_data if i["id"] == investor_id), None)
+    target_investor = next(
+        (
+            i
+            for i in investors
+            if (i["id"] if isinstance(i, dict) else i.id) == investor_id
+        ),
+        None,
+    )
     if not target_investor:
         print(f"Error: Investor with ID {investor_id} not found")
         return []
 
-    if target_investor.get("embedding") is None:
-        print(f"Warning: Investor {target_investor['name']} has no embedding")
-
-    # Calculate match scores with all companys
-    matches = []
-    for company in companies_data:
-        if company.get("embedding") is None:
-            print(f"Warning: Company {company['name']} has no embedding")
-            continue
-
-        score = calculate_match_score(company, target_investor)
-
-        # Only include meaningful matches
-        min_threshold = MATCH_WEIGHTS["embedding"] * 0.1
-        if score > min_threshold:
-            matches.append(
-                MatchResult(
-                    entity_id=company["id"],
-                    name=company["name"],
-                    score=score,
-                    details={
-                        "industry": company.get("industry"),
-                        "sub_industries": company.get("sub_industries"),
-                        "stage": company.get("stage"),
-                        "location": company.get("location"),
-                        "valuation": f"${company.get('total_valuation_usd', 0):,.0f}",
-                        "revenue_stage": company.get("revenue_stage"),
-                        "business_model": company.get("business_model"),
-                        "esg_focus": "Yes" if company.get("esg_focus") else "No",
-                        "exit_strategy": company.get("exit_strategy"),
-                    },
-                )
-            )
-
-    # Sort by score (descending) and return top N
-    matches.sort(key=lambda x: x.score, reverse=True)
-    return matches[:top_n]
+    return match_investor(
+        target_investor, company, top_n=top_n, use_ann=use_ann, min_score=min_score
+    )
@@ -1,6 +1,7 @@
 # Updated models.py
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field
+import numpy as np
 import uuid
 from enum import Enum
 
@@ -70,6 +71,9 @@ class TimeHorizon(str, Enum):
 
 # Update existing models
 class Company(BaseModel):
+    # Embeddings read from the database are float32 arrays, not lists
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str = Field(default_factory=generate_uuid)
     name: str
     industry: str
@@ -87,10 +91,12 @@ class Company(BaseModel):
     time_horizon: Optional[str] = None
     # expected_exit: Optional[str] = None
     esg_focus: bool = False
-    embedding: Optional[List[float]] = None
+    embedding: Optional[Union[np.ndarray, List[float]]] = None
 
 
 class Investor(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str = Field(default_factory=generate_uuid)
     name: str
     investor_type: str
@@ -108,7 +114,7 @@ class Investor(BaseModel):
     preferred_founder_types: List[str] = Field(default_factory=list)
     risk_appetite: Optional[str] = None
     preferred_time_horizon: List[str] = Field(default_factory=list)
-    embedding: Optional[List[float]] = None
+    embedding: Optional[Union[np.ndarray, List[float]]] = None
 
 
 class MatchResult(BaseModel):
@@ -0,0 +1,195 @@
+"""
+LedgerSubscriber against the fake ledger server replaying
+fixtures/ledger_recording.jsonl, with the connection dropped once so the
+transactions closed meanwhile have to come from the reconnect's backfill.
+"""
+
+import asyncio
+import json
+import os
+
+import aiosqlite
+import websockets
+
+import ledger_subscriber
+import main
+from ledger_subscriber import LedgerSubscriber, accounts_touched, stream_envelope
+from tools.fake_ledger_server import FakeLedger
+from xrpl_tx_index import create_tx_index_tables, get_last_indexed_ledger
+
+RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "ledger_recording.jsonl")
+
+ISSUER = "rs9nDvFo4TpLUkb7g9TVD9fUCqsXQW374u"
+# Trustline in ledger 1001 and 250 RLUSD in 1002, both streamed
+STREAMED_HOLDER = "rHT73aVd31XBYxwnNkR5xoWad2z7prBMHr"
+# Trustline in 1005 and 100 + 50 RLUSD in 1006, while disconnected
+BACKFILLED_HOLDER = "rsNtoc7JSGAyCHCh3nmi9pknmDY3qPstMp"
+# Trustline and only 10 of 100 RLUSD in 1040, after the reconnect
+UNDERPAID_HOLDER = "rsrbtPcf4RrryqBVURqKLuXyNSmPVGS477"
+
+LAST_LEDGER = 1040
+DROP_AT = 1003
+LEDGER_INTERVAL = 0.1
+
+
+def load_recording():
+    with open(RECORDING) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def create_tables(db):
+    await db.execute("""
+    CREATE TABLE companies (
+        _id TEXT PRIMARY KEY,
+        name TEXT,
+        symbol TEXT,
+        total_supply INTEGER,
+        total_valuation_usd REAL,
+        liquidity_percent REAL,
+        issuing_address TEXT,
+        issuing_seed TEXT,
+        state TEXT
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE shareholders (
+        id TEXT PRIMARY KEY,
+        company_id TEXT,
+        wallet_address TEXT,
+        percent REAL,
+        adjusted_percent REAL,
+        required_rlusd REAL,
+        has_paid BOOLEAN,
+        has_trustline BOOLEAN,
+        tokens_distributed BOOLEAN
+    )
+    """)
+    await create_tx_index_tables(db)
+    await db.execute(
+        "INSERT INTO companies (_id, name, symbol, issuing_address, state) VALUES (?, ?, ?, ?, ?)",
+        ("company-1", "Acme", "ACM", ISSUER, "issued"),
+    )
+    await db.executemany(
+        """
+        INSERT INTO shareholders (id, company_id, wallet_address, required_rlusd,
+                                  has_paid, has_trustline, tokens_distributed)
+        VALUES (?, 'company-1', ?, ?, 0, 0, 0)
+        """,
+        [
+            ("sh-1", STREAMED_HOLDER, 250.0),
+            ("sh-2", BACKFILLED_HOLDER, 150.0),
+            ("sh-3", UNDERPAID_HOLDER, 100.0),
+        ],
+    )
+    await db.commit()
+
+
+async def shareholder_flags(db):
+    async with db.execute(
+        "SELECT wallet_address, has_paid, has_trustline FROM shareholders"
+    ) as cursor:
+        return {row[0]: (bool(row[1]), bool(row[2])) for row in await cursor.fetchall()}
+
+
+async def indexed_hashes(db):
+    async with db.execute(
+        "SELECT tx_hash FROM issuer_transactions WHERE issuer_address=?", (ISSUER,)
+    ) as cursor:
+        return {row[0] for row in await cursor.fetchall()}
+
+
+async def wait_for(condition, timeout=20.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+async def run_through_drop():
+    recording = load_recording()
+    issuer_hashes = {
+        m["hash"] for m in recording if ISSUER in accounts_touched(stream_envelope(m))
+    }
+    # One drop only: the next multiple of DROP_AT is never reached
+    ledger = FakeLedger(recording, LEDGER_INTERVAL, drop_every=DROP_AT)
+
+    async with aiosqlite.connect(":memory:") as db:
+        await create_tables(db)
+        async with websockets.serve(ledger.handle, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            subscriber = LedgerSubscriber(
+                db, f"ws://127.0.0.1:{port}", main.apply_indexed_activity
+            )
+            subscriber_task = asyncio.create_task(subscriber.run())
+            ledger_task = None
+            try:
+
+                async def subscribed():
+                    return any(
+                        ISSUER in accounts and "ledger" in streams
+                        for accounts, streams in ledger.connections.values()
+                    )
+
+                await wait_for(subscribed)
+                ledger_task = asyncio.create_task(ledger.close_ledgers())
+
+                async def caught_up():
+                    mark = await get_last_indexed_ledger(db, ISSUER)
+                    return mark is not None and mark >= LAST_LEDGER
+
+                await wait_for(caught_up)
+                final_mark = await get_last_indexed_ledger(db, ISSUER)
+                closed = ledger.ledger_index
+            finally:
+                subscriber_task.cancel()
+                if ledger_task is not None:
+                    ledger_task.cancel()
+                await asyncio.gather(
+                    subscriber_task, *filter(None, [ledger_task]), return_exceptions=True
+                )
+
+        return {
+            "subscriber": subscriber,
+            "issuer_hashes": issuer_hashes,
+            "indexed": await indexed_hashes(db),
+            "flags": await shareholder_flags(db),
+            "final_mark": final_mark,
+            "closed": closed,
+        }
+
+
+def test_reconnect_backfills_and_updates_shareholders(monkeypatch):
+    monkeypatch.setattr(ledger_subscriber, "RECONNECT_DELAY", 0.1)
+    marked = []
+    mark_ledger_indexed = ledger_subscriber.mark_ledger_indexed
+
+    async def recording_mark(db, issuers, ledger_index):
+        marked.append(ledger_index)
+        await mark_ledger_indexed(db, issuers, ledger_index)
+
+    monkeypatch.setattr(ledger_subscriber, "mark_ledger_indexed", recording_mark)
+    result = asyncio.run(run_through_drop())
+    subscriber = result["subscriber"]
+
+    assert subscriber.connections == 2
+    # Every transaction touching the issuer is indexed, and nothing else
+    assert result["indexed"] == result["issuer_hashes"]
+    # Four arrived on the stream; the three closed while disconnected did not
+    assert subscriber.transactions_indexed == 4
+
+    # Before the drop, ledgers 1001 -> 1002 -> 1003 were contiguous, so 1001
+    # and 1002 were marked but not the ledger the connection dropped after
+    assert marked[:2] == [1001, 1002]
+    # After the reconnect the stream marks one ledger after another again,
+    # starting past what the backfill indexed (up to ledger 1006)
+    resumed = marked[2:]
+    assert resumed and resumed[0] > 1006
+    assert resumed == list(range(resumed[0], resumed[-1] + 1))
+    # The mark only ever covers closed ledgers
+    assert LAST_LEDGER <= result["final_mark"] < result["closed"]
+
+    assert result["flags"] == {
+        STREAMED_HOLDER: (True, True),
+        BACKFILLED_HOLDER: (True, True),
+        UNDERPAID_HOLDER: (False, True),
+    }
@@ -0,0 +1,309 @@
+"""
+Pipelined token distribution from an issuing wallet.
+
+`sign_and_submit` autofills every Payment (account sequence, fee, ledger
+index: several round-trips) and is awaited one shareholder at a time.
+`distribute_pipelined` instead reads the issuer's sequence, the fee and the
+validated ledger once, signs every Payment locally with consecutive
+sequences and a common LastLedgerSequence, and submits the signed blobs
+back to back without waiting for validation. Final results are then
+collected in bulk from the issuer's AccountTx, one paginated read per poll
+instead of one lookup per transaction.
+
+LastLedgerSequence bounds the outcome: a transaction not validated once
+that ledger is validated can never apply, so it is reported as expired and
+is safe to distribute again. Submissions rejected locally (e.g. the
+per-account queue is full) are resubmitted with the same blob after each
+newly validated ledger.
+
+A transaction rejected outright leaves its sequence unused, so every
+transfer signed after it is held (terPRE_SEQ) for a sequence that nothing
+here will spend. Those are settled as "blocked" as soon as the rejection is
+known instead of sitting until LastLedgerSequence. They are not dead before
+that ledger, though: anything that spends the missing sequence first lets
+them apply, so a follow-up distribution must not be planned until then
+(DistributionJobs.start enforces this).
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from xrpl.core.binarycodec import encode
+from xrpl.models.amounts import IssuedCurrencyAmount
+from xrpl.models.requests import AccountInfo, Fee, Ledger, SubmitOnly
+from xrpl.models.transactions import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+
+from xrpl_history import iter_account_transactions
+
+# Ledgers each transaction stays valid after the current validated ledger
+DISTRIBUTION_LEDGER_OFFSET = 20
+# rippled queues at most this many transactions per account, so a batch that
+# outruns the open ledger drains about this many per ledger
+ACCOUNT_QUEUE_LIMIT = 10
+# Fee ceiling per Payment, in drops
+DISTRIBUTION_MAX_FEE_DROPS = 1000
+# Seconds between validation polls (ledgers close every ~4 s)
+DISTRIBUTION_POLL_INTERVAL = 1.0
+# final_result prefix of transfers held behind a rejected, unused sequence
+BLOCKED_PREFIX = "blocked:"
+
+# Preliminary results after which the transaction may still validate
+_PENDING_RESULTS = {
+    "tesSUCCESS",
+    "terQUEUED",
+    "terPRE_SEQ",
+    "tefPAST_SEQ",
+    "tefALREADY",
+}
+
+
+def _may_validate(engine_result: str) -> bool:
+    # tec results are applied too: they claim the fee and use the sequence
+    return engine_result in _PENDING_RESULTS or engine_result.startswith("tec")
+
+
+async def validated_ledger_index(client) -> int:
+    resp = await client.request(Ledger(ledger_index="validated"))
+    if not resp.is_successful():
+        raise RuntimeError(f"Could not read the validated ledger: {resp.result}")
+    return int(resp.result["ledger_index"])
+
+
+async def _next_sequence(client, account: str) -> int:
+    resp = await client.request(AccountInfo(account=account, ledger_index="current"))
+    if not resp.is_successful():
+        raise RuntimeError(f"Could not read account {account}: {resp.result}")
+    return int(resp.result["account_data"]["Sequence"])
+
+
+async def _payment_fee(client) -> str:
+    resp = await client.request(Fee())
+    drops = resp.result.get("drops", {}) if resp.is_successful() else {}
+    fee = max(int(drops.get("base_fee", 10)), int(drops.get("open_ledger_fee", 10)))
+    return str(min(fee, DISTRIBUTION_MAX_FEE_DROPS))
+
+
+def _is_retryable(engine_result: str) -> bool:
+    # tel: rejected by this server only (queue full, fee too low right now)
+    return engine_result.startswith("tel") or engine_result == "terRETRY"
+
+
+async def plan_distribution(
+    client, issuer_seed: str, currency_hex: str, transfers: List[Tuple[str, str]]
+) -> dict:
+    """
+    Sign one Payment per transfer ([(destination, value)]) without sending
+    anything. Returns {"issuer_addr", "start_ledger", "last_ledger",
+    "results"}, with one result per transfer, in order: {"destination",
+    "value", "tx_hash", "sequence", "tx_blob", "engine_result",
+    "final_result", "validated_ledger"}.
+    """
+    wallet = Wallet.from_seed(issuer_seed)
+    issuer_addr = wallet.classic_address
+
+    validated, sequence, fee = await asyncio.gather(
+        validated_ledger_index(client),
+        _next_sequence(client, issuer_addr),
+        _payment_fee(client),
+    )
+    last_ledger = (
+        validated + DISTRIBUTION_LEDGER_OFFSET + len(transfers) // ACCOUNT_QUEUE_LIMIT
+    )
+
+    results = []
+    for destination, value in transfers:
+        result = {
+            "destination": destination,
+            "value": value,
+            "tx_hash": None,
+            "sequence": None,
+            "tx_blob": None,
+            "engine_result": None,
+            "final_result": None,
+            "validated_ledger": None,
+        }
+        results.append(result)
+        try:
+            signed = sign(
+                Payment(
+                    account=issuer_addr,
+                    destination=destination,
+                    amount=IssuedCurrencyAmount(
+                        currency=currency_hex, issuer=issuer_addr, value=value
+                    ),
+                    sequence=sequence,
+                    fee=fee,
+                    last_ledger_sequence=last_ledger,
+                ),
+                wallet,
+            )
+        except Exception as e:
+            # e.g. a malformed address; no sequence is spent on it
+            result["final_result"] = f"not signed: {str(e)}"
+            continue
+        result.update(
+            tx_hash=signed.get_hash(),
+            sequence=sequence,
+            tx_blob=encode(signed.to_xrpl()),
+        )
+        sequence += 1
+
+    return {
+        "issuer_addr": issuer_addr,
+        "start_ledger": validated,
+        "last_ledger": last_ledger,
+        "results": results,
+    }
+
+
+async def submit_transfers(client, results: List[dict]):
+    """
+    Submit the signed blobs of `results` and record each engine result.
+    Resubmitting a blob is harmless: it has the same hash and sequence.
+    """
+
+    async def submit(result: dict):
+        try:
+            resp = await client.request(SubmitOnly(tx_blob=result["tx_blob"]))
+            result["engine_result"] = resp.result.get(
+                "engine_result", resp.result.get("error", "unknown")
+            )
+        except Exception as e:
+            result["engine_result"] = f"telSUBMIT_ERROR: {str(e)}"
+
+    # Sent concurrently; the server holds a sequence that arrives before its
+    # predecessor (terPRE_SEQ) and applies it once the gap is filled
+    await asyncio.gather(*(submit(result) for result in results))
+
+
+async def confirm_transfers(
+    client,
+    plan: dict,
+    ledger_min: int,
+    poll_interval: float = DISTRIBUTION_POLL_INTERVAL,
+    on_progress: Optional[Callable[[List[dict], int], Awaitable[None]]] = None,
+):
+    """
+    Poll the issuer's validated transactions from `ledger_min` until every
+    submitted result of `plan` is final, resubmitting local rejections.
+    `on_progress(results, scanned_through_ledger)` is awaited after every
+    poll, so a caller can persist progress and resume from that ledger.
+    """
+    results = plan["results"]
+    last_ledger = plan["last_ledger"]
+    by_hash: Dict[str, dict] = {r["tx_hash"]: r for r in results if r["tx_hash"]}
+    while True:
+        _settle_rejected(results)
+        pending = [r for r in results if r["final_result"] is None]
+        if not pending:
+            break
+
+        await asyncio.sleep(poll_interval)
+        now_validated = await validated_ledger_index(client)
+        async for tx_entry in iter_account_transactions(
+            client,
+            plan["issuer_addr"],
+            ledger_index_min=ledger_min,
+            ledger_index_max=now_validated,
+            forward=True,
+        ):
+            tx_json = tx_entry.get("tx_json") or tx_entry.get("tx", {})
+            tx_hash = tx_entry.get("hash") or tx_json.get("hash")
+            result = by_hash.get(tx_hash)
+            # A blocked transfer still applies if its missing sequence got spent
+            if result is not None and (
+                result["final_result"] is None or is_blocked(result)
+            ):
+                meta = tx_entry.get("meta", {})
+                result["final_result"] = meta.get("TransactionResult", "unknown")
+                result["validated_ledger"] = tx_entry.get(
+                    "ledger_index", tx_json.get("ledger_index")
+                )
+        new_ledger = now_validated >= ledger_min
+        ledger_min = max(ledger_min, now_validated + 1)
+
+        if now_validated >= last_ledger:
+            for result in results:
+                if result["final_result"] is None:
+                    result["final_result"] = "expired"
+        elif new_ledger:
+            # Locally rejected submissions get another chance once a ledger
+            # has closed and made room
+            await submit_transfers(
+                client,
+                [
+                    r
+                    for r in results
+                    if r["final_result"] is None and _is_retryable(r["engine_result"])
+                ],
+            )
+
+        if on_progress is not None:
+            await on_progress(results, ledger_min - 1)
+
+
+def is_blocked(result: dict) -> bool:
+    """Whether `result` was settled as held behind an unused sequence."""
+    return (result["final_result"] or "").startswith(BLOCKED_PREFIX)
+
+
+async def distribute_pipelined(
+    client,
+    issuer_seed: str,
+    currency_hex: str,
+    transfers: List[Tuple[str, str]],
+    poll_interval: float = DISTRIBUTION_POLL_INTERVAL,
+) -> List[dict]:
+    """
+    Send `transfers` ([(destination, value)]) of the issuer's token and wait
+    for their final outcome. Returns one result per transfer, in order (see
+    plan_distribution), where final_result is the validated
+    TransactionResult, "expired", the rejecting engine result, or "blocked:
+    ..." for transfers held behind a rejected one.
+    """
+    if not transfers:
+        return []
+    plan = await plan_distribution(client, issuer_seed, currency_hex, transfers)
+    results = plan["results"]
+    await submit_transfers(client, [r for r in results if r["tx_blob"]])
+    await confirm_transfers(
+        client, plan, plan["start_ledger"] + 1, poll_interval=poll_interval
+    )
+    for result in results:
+        del result["tx_blob"]
+    return results
+
+
+def _leaves_gap(result: dict) -> bool:
+    # Rejected without being applied, so its sequence was never spent
+    engine_result = result["engine_result"]
+    return (
+        result["sequence"] is not None
+        and result["validated_ledger"] is None
+        and engine_result is not None
+        and not (_may_validate(engine_result) or _is_retryable(engine_result))
+    )
+
+
+def _settle_rejected(results: List[dict]):
+    """
+    Rejections that cannot validate anymore are final right away, and so are
+    the transfers signed after the first of them: they wait on its sequence.
+    """
+    gap = None
+    for result in results:
+        if _leaves_gap(result):
+            if result["final_result"] is None:
+                result["final_result"] = result["engine_result"]
+            if gap is None or result["sequence"] < gap["sequence"]:
+                gap = result
+    if gap is None:
+        return
+    for result in results:
+        if result["final_result"] is None and result["sequence"] > gap["sequence"]:
+            result["final_result"] = (
+                f"{BLOCKED_PREFIX} sequence {gap['sequence']} was not used "
+                f"({gap['engine_result']})"
+            )
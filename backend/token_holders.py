@@ -0,0 +1,115 @@
+"""
+Streaming enumeration of a token's holders.
+
+The holders of an issued token are the issuer's trustlines in that
+currency with a negative balance (seen from the issuer, a negative balance
+is what the holder owns). A single AccountLines request returns one page of
+them, so issuers with more trustlines than a page showed truncated cap
+tables. `iter_token_holders` follows the markers and filters by currency as
+it goes, holding one page of trustlines at a time.
+
+Each holder comes with its position: the ledger and the AccountLines marker
+of its page plus its offset in that page. `read_token_holders` encodes the
+position after the last returned holder as an opaque cursor, so a cap table
+can be read in pages of any size, all from the same ledger.
+"""
+
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Optional, Tuple
+
+from xrpl_history import DEFAULT_LINES_PAGE_SIZE, iter_account_lines_pages
+
+# Holders returned per API page unless the caller asks for another size
+DEFAULT_HOLDERS_PAGE_SIZE = 500
+MAX_HOLDERS_PAGE_SIZE = 5000
+
+
+def held_amount(line: dict, currency_hex: str) -> Decimal:
+    """
+    Exact amount of `currency_hex` the trustline's account holds, from one of
+    the issuer's lines (0 for other currencies and unheld lines).
+    """
+    if line.get("currency", "").upper() != currency_hex.upper():
+        return Decimal(0)
+    try:
+        issuer_balance = Decimal(line.get("balance", "0"))
+    except InvalidOperation:
+        return Decimal(0)
+    return -issuer_balance if issuer_balance < 0 else Decimal(0)
+
+
+def encode_cursor(position: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    """(ledger_index, marker, offset) of a cursor; ValueError if malformed."""
+    try:
+        ledger_index, marker, offset = json.loads(base64.urlsafe_b64decode(cursor))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(ledger_index, (int, str)) or not isinstance(offset, int):
+        raise ValueError("Invalid cursor")
+    return ledger_index, marker, offset
+
+
+async def iter_token_holders(
+    client,
+    issuer: str,
+    currency_hex: str,
+    position: Optional[Tuple] = None,
+    page_size: int = DEFAULT_LINES_PAGE_SIZE,
+) -> AsyncIterator[Tuple[dict, Tuple]]:
+    """
+    Yield ({"wallet_address", "balance"}, next_position) for every account
+    holding a non-zero amount of (currency_hex, issuer), starting at
+    `position` (a decoded cursor) or at the latest validated ledger.
+    `next_position` is where reading resumes after that holder.
+    """
+    ledger_index, marker, offset = position or ("validated", None, 0)
+    async for page in iter_account_lines_pages(
+        client, issuer, page_size, ledger_index=ledger_index, marker=marker
+    ):
+        lines = page["lines"]
+        for i in range(offset, len(lines)):
+            amount = held_amount(lines[i], currency_hex)
+            if amount <= 0:
+                continue
+            yield (
+                {"wallet_address": lines[i].get("account"), "balance": float(amount)},
+                (page["ledger_index"], page["marker"], i + 1),
+            )
+        offset = 0
+
+
+async def read_token_holders(
+    client,
+    issuer: str,
+    currency_hex: str,
+    limit: Optional[int] = DEFAULT_HOLDERS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    One page of holders (every remaining holder if `limit` is None):
+    {"holders", "next_cursor", "ledger_index"}. next_cursor is None once
+    the last holder has been returned.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    holders = []
+    ledger_index = position[0] if position else None
+    async for holder, next_position in iter_token_holders(
+        client, issuer, currency_hex, position
+    ):
+        if limit is not None and len(holders) == limit:
+            # One holder past the page proves there is more to read
+            return {
+                "holders": holders,
+                "next_cursor": encode_cursor(position),
+                "ledger_index": ledger_index,
+            }
+        holders.append(holder)
+        position = next_position
+        ledger_index = next_position[0]
+    return {"holders": holders, "next_cursor": None, "ledger_index": ledger_index}
@@ -0,0 +1,103 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from ann_index import nearest_rows, refresh_index
+from batch_scoring import encode_investors
+from embedding_store import EMBEDDING_STORE, normalize_embedding
+import matching_algo
+from matching_algo import find_matches_for_company
+from tools.benchmark_matching import random_company, random_investor
+
+
+def clustered_embeddings(rng: np.random.Generator, n: int, dim: int, n_topics: int):
+    """Synthetic embeddings grouped around topics, like real profile embeddings."""
+    topics = rng.standard_normal((n_topics, dim))
+    labels = rng.integers(0, n_topics, size=n)
+    return topics[labels] + 0.6 * rng.standard_normal((n, dim))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure ANN candidate recall and latency against exact scoring."
+    )
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--investors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=matching_algo.ANN_CANDIDATES)
+    parser.add_argument("--n-probe", type=int, default=matching_algo.ANN_N_PROBE)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    matching_algo.ANN_CANDIDATES = args.candidates
+    matching_algo.ANN_N_PROBE = args.n_probe
+
+    rng = random.Random(args.seed)
+    np_rng = np.random.default_rng(args.seed)
+    vectors = clustered_embeddings(
+        np_rng, args.companies + args.investors, args.dim, args.topics
+    )
+    companies = [random_company(rng, np_rng, 1) for _ in range(args.companies)]
+    investors = [random_investor(rng, np_rng, 1) for _ in range(args.investors)]
+    for entity, vector in zip(companies + investors, vectors):
+        entity.embedding = vector.tolist()
+
+    investor_batch = encode_investors(investors)
+    store = EMBEDDING_STORE.investors
+
+    start = time.perf_counter()
+    refresh_index(store)
+    print(
+        f"Built IVF index over {len(store)} rows in {time.perf_counter() - start:.2f} s"
+    )
+
+    candidate_recall = []
+    match_recall = []
+    exact_time = 0.0
+    ann_time = 0.0
+    for company in companies:
+        query = normalize_embedding(company.embedding)
+        rows = store.rows()
+        similarity = rows.similarity(
+            query[np.newaxis, :].astype(np.float64), np.arange(len(rows))
+        )[0]
+        exact = np.argpartition(-similarity, args.candidates - 1)
+        exact = set(exact[: args.candidates].tolist())
+        approx = set(nearest_rows(store, query, args.candidates, args.n_probe).tolist())
+        candidate_recall.append(len(exact & approx) / len(exact))
+
+        start = time.perf_counter()
+        exact_matches = find_matches_for_company(
+            company.id, [company], investor_batch, top_n=args.top_n, use_ann=False
+        )
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        ann_matches = find_matches_for_company(
+            company.id, [company], investor_batch, top_n=args.top_n, use_ann=True
+        )
+        ann_time += time.perf_counter() - start
+
+        expected = {m.entity_id for m in exact_matches}
+        if expected:
+            found = {m.entity_id for m in ann_matches}
+            match_recall.append(len(expected & found) / len(expected))
+
+    n = len(companies)
+    print(
+        f"Embedding recall@{args.candidates} (n_probe={args.n_probe}): "
+        f"{np.mean(candidate_recall):.3f}"
+    )
+    print(
+        f"Top-{args.top_n} match recall vs exact scoring: {np.mean(match_recall):.3f}"
+    )
+    print(f"Exact scoring: {exact_time / n * 1000:.1f} ms per company")
+    print(f"ANN + scoring: {ann_time / n * 1000:.1f} ms per company")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Benchmark the whole issuance flow against the local XRPL simulator.
+
+Runs the backend in-process against a running `tools.xrpl_simulator` and
+times each phase for N shareholders: company creation (faucet-funded
+issuing wallet), shareholders setting their trustline and paying RLUSD,
+verification, and the distribution job through to the AMM.
+
+Shareholder wallets get their XRP and RLUSD from the simulator's sim_fund,
+since the RLUSD issuer's key is not available locally; the issuing wallet
+gets its RLUSD trustline the same way.
+
+    python -m tools.xrpl_simulator serve --ledger-interval 1 --no-verify
+    python -m tools.benchmark_issuance --shareholders 1000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+RLUSD_ISSUER = "rQhWct2fv4Vc4KRjRgMrxa8xPN9Zx9iLKV"
+RLUSD_CURRENCY = "524C555344000000000000000000000000000000"
+
+
+async def sim_fund(http: httpx.AsyncClient, url: str, account: str, amount):
+    resp = await http.post(
+        url,
+        json={"method": "sim_fund", "params": [{"account": account, "amount": amount}]},
+    )
+    result = resp.json()["result"]
+    if result.get("status") != "success":
+        raise RuntimeError(f"sim_fund failed: {result}")
+
+
+async def run(args):
+    # The backend reads its settings at import time
+    os.environ["XRPL_URL"] = args.url
+    os.environ["XRPL_FAUCET_HOST"] = args.url
+    os.environ["XRPL_WS_URL"] = ""
+    for interval in (
+        "MATCHING_PRECOMPUTE_INTERVAL",
+        "HOLDINGS_SNAPSHOT_INTERVAL",
+        "AMM_SAMPLE_INTERVAL",
+    ):
+        os.environ.setdefault(interval, "0")
+    # Fresh databases, away from the development ones
+    os.chdir(tempfile.mkdtemp(prefix="sharewave_bench_"))
+
+    import main
+    from xrpl.asyncio.clients import AsyncJsonRpcClient
+    from xrpl.asyncio.ledger import get_latest_validated_ledger_sequence
+    from xrpl.core.binarycodec import encode
+    from xrpl.models.amounts import IssuedCurrencyAmount
+    from xrpl.models.requests import AccountInfo, SubmitOnly
+    from xrpl.models.transactions import Payment, TrustSet
+    from xrpl.transaction import sign
+    from xrpl.wallet import Wallet
+
+    sim = AsyncJsonRpcClient(args.url)
+    http = httpx.AsyncClient(timeout=60)
+    limit = asyncio.Semaphore(args.concurrency)
+    timings = {}
+
+    async with main.app.router.lifespan_context(main.app):
+        api = httpx.AsyncClient(
+            transport=httpx.ASGITransport(main.app),
+            base_url="http://backend",
+            timeout=600,
+        )
+        start_ledger = await get_latest_validated_ledger_sequence(sim)
+
+        # 1) Shareholder wallets with XRP and RLUSD
+        t = time.perf_counter()
+        wallets = [Wallet.create() for _ in range(args.shareholders)]
+
+        async def fund(wallet):
+            async with limit:
+                await sim_fund(http, args.url, wallet.address, str(100_000_000))
+                await sim_fund(
+                    http,
+                    args.url,
+                    wallet.address,
+                    {
+                        "currency": RLUSD_CURRENCY,
+                        "issuer": RLUSD_ISSUER,
+                        "value": str(args.valuation),
+                    },
+                )
+
+        await sim_fund(http, args.url, RLUSD_ISSUER, str(100_000_000))
+        await asyncio.gather(*(fund(w) for w in wallets))
+        timings["fund shareholders"] = time.perf_counter() - t
+
+        # 2) Company with an issuing wallet from the faucet
+        t = time.perf_counter()
+        percent = (100 - args.liquidity_percent) / args.shareholders
+        resp = await api.post(
+            "/companies",
+            json={
+                "name": "Benchmark Co",
+                "symbol": "BNCH",
+                "total_supply": args.total_supply,
+                "total_valuation_usd": args.valuation,
+                "liquidity_percent": args.liquidity_percent,
+                "shareholders": [
+                    {"wallet_address": w.address, "percent": percent} for w in wallets
+                ],
+            },
+        )
+        resp.raise_for_status()
+        company_id = resp.json()["company_id"]
+        issuer = resp.json()["issuing_address"]
+        await sim_fund(
+            http,
+            args.url,
+            issuer,
+            {"currency": RLUSD_CURRENCY, "issuer": RLUSD_ISSUER, "value": "0"},
+        )
+        timings["create company"] = time.perf_counter() - t
+
+        # 3) Every shareholder trustlines the token and pays its RLUSD
+        t = time.perf_counter()
+        info = (await api.get(f"/companies/{company_id}/full_info")).json()
+        required = {
+            s["wallet_address"]: s["required_rlusd"] for s in info["stakeholders"]
+        }
+        token_hex = main.currency_to_hex("BNCH")
+
+        async def subscribe(wallet):
+            async with limit:
+                resp = await sim.request(
+                    AccountInfo(account=wallet.address, ledger_index="current")
+                )
+                sequence = resp.result["account_data"]["Sequence"]
+                transactions = [
+                    TrustSet(
+                        account=wallet.address,
+                        limit_amount=IssuedCurrencyAmount(
+                            currency=token_hex,
+                            issuer=issuer,
+                            value=str(args.total_supply),
+                        ),
+                        sequence=sequence,
+                        fee="12",
+                    ),
+                    Payment(
+                        account=wallet.address,
+                        destination=issuer,
+                        amount=IssuedCurrencyAmount(
+                            currency=RLUSD_CURRENCY,
+                            issuer=RLUSD_ISSUER,
+                            value=str(required[wallet.address]),
+                        ),
+                        sequence=sequence + 1,
+                        fee="12",
+                    ),
+                ]
+                for tx in transactions:
+                    blob = encode(sign(tx, wallet).to_xrpl())
+                    await sim.request(SubmitOnly(tx_blob=blob))
+
+        await asyncio.gather(*(subscribe(w) for w in wallets))
+        timings["shareholders pay + trustline"] = time.perf_counter() - t
+
+        # 4) Verification, retried until the ledger has applied everything
+        t = time.perf_counter()
+        while True:
+            resp = await api.post(f"/companies/{company_id}/check_and_distribute")
+            result = resp.json()
+            if "job_id" in result:
+                break
+            print(
+                f"  waiting: {len(result.get('not_paid', []))} not paid, "
+                f"{len(result.get('not_trustlined', []))} not trustlined"
+            )
+            await asyncio.sleep(args.poll_interval)
+        timings["verify"] = time.perf_counter() - t
+
+        # 5) Distribution job: payments, confirmation, AMM
+        t = time.perf_counter()
+        while True:
+            job = (await api.get(f"/distribution_jobs/{result['job_id']}")).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(args.poll_interval)
+        timings["distribute + AMM"] = time.perf_counter() - t
+
+        outcomes = {}
+        for tx in job["transactions"]:
+            outcomes[tx["final_result"]] = outcomes.get(tx["final_result"], 0) + 1
+        end_ledger = await get_latest_validated_ledger_sequence(sim)
+        await api.aclose()
+    await http.aclose()
+
+    print(f"{args.shareholders} shareholders, job {job['status']}: {outcomes}")
+    if job.get("error"):
+        print(f"Job error: {job['error']}")
+    for phase, seconds in timings.items():
+        print(f"{phase:<30} {seconds:8.2f} s")
+    print(f"{'total':<30} {sum(timings.values()):8.2f} s")
+    print(f"Ledgers closed: {end_ledger - start_ledger}")
+    print(f"Backend XRPL client: {main.XRPL_CLIENT.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark issuance against the local XRPL simulator."
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:5005")
+    parser.add_argument("--shareholders", type=int, default=1000)
+    parser.add_argument("--total-supply", type=int, default=1_000_000)
+    parser.add_argument("--valuation", type=float, default=1_000_000)
+    parser.add_argument("--liquidity-percent", type=float, default=10)
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="Shareholder requests in flight"
+    )
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
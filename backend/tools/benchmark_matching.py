@@ -0,0 +1,146 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from models import Company, Investor
+from matching_algo import MATCH_WEIGHTS, calculate_match_score
+from batch_scoring import encode_companies, encode_investors, score_matrix
+
+# Value pools for synthetic profiles (mirrors the sample data in populate_data)
+INDUSTRIES = [
+    "Software",
+    "AI",
+    "Fintech",
+    "Biotech",
+    "CleanTech",
+    "HealthTech",
+    "EdTech",
+    "Blockchain",
+    "Tobacco",
+    "Weapons",
+    "SaaS",
+    "Enterprise Software",
+]
+STAGES = ["pre-seed", "seed", "Seed", "Series A", "Series B", "Series C", "Growth"]
+LOCATIONS = ["Switzerland", "Germany", "France", "UK", "USA", "Remote"]
+BUSINESS_MODELS = ["saas", "marketplace", "hardware", "subscription", "licensing"]
+FOCUS_AREAS = ["sustainability", "esg", "climate_tech", "fintech", "healthcare"]
+FOUNDER_TYPES = ["female_founders", "technical_founders", "serial_entrepreneurs"]
+RISK = ["conservative", "moderate", "aggressive", "very_aggressive", None]
+HORIZONS = ["short_term", "medium_term", "long_term"]
+REVENUE = ["pre_revenue", "early_revenue", "break_even", "profitable", None]
+EXITS = ["acquisition", "ipo", "merger", "long_term_growth", None]
+
+
+def _sample(rng: random.Random, pool, k_max: int):
+    return rng.sample(pool, rng.randint(0, min(k_max, len(pool))))
+
+
+def _embedding(rng: np.random.Generator, dim: int):
+    return rng.standard_normal(dim).tolist()
+
+
+def random_company(rng: random.Random, np_rng, dim: int) -> Company:
+    return Company(
+        name=f"Company {rng.random():.12f}",
+        industry=rng.choice(INDUSTRIES),
+        sub_industries=_sample(rng, INDUSTRIES, 3),
+        stage=rng.choice(STAGES),
+        description="Synthetic company",
+        location=rng.choice(LOCATIONS),
+        total_valuation_usd=rng.choice([1e6, 3e6, 15e6, 50e6, 200e6]),
+        revenue_stage=rng.choice(REVENUE),
+        business_model=rng.choice(BUSINESS_MODELS + [None]),
+        exit_strategy=rng.choice(EXITS),
+        focus_areas=_sample(rng, FOCUS_AREAS, 3),
+        founder_types=_sample(rng, FOUNDER_TYPES, 2),
+        risk_appetite=rng.choice(RISK),
+        time_horizon=rng.choice(HORIZONS + [None]),
+        esg_focus=rng.random() < 0.3,
+        embedding=_embedding(np_rng, dim),
+    )
+
+
+def random_investor(rng: random.Random, np_rng, dim: int) -> Investor:
+    min_inv = rng.choice([None, 50_000, 500_000, 1_000_000])
+    max_inv = rng.choice([None, 2_000_000, 10_000_000])
+    return Investor(
+        name=f"Investor {rng.random():.12f}",
+        investor_type=rng.choice(["VC", "Angel", "PE", "Family Office"]),
+        preferred_industries=_sample(rng, INDUSTRIES, 4),
+        excluded_industries=_sample(rng, INDUSTRIES, 1),
+        preferred_stages=_sample(rng, STAGES, 3),
+        preferred_locations=_sample(rng, LOCATIONS, 3),
+        min_investment_usd=min_inv,
+        max_investment_usd=max_inv,
+        business_model_focus=_sample(rng, BUSINESS_MODELS, 2),
+        esg_mandate=rng.random() < 0.2,
+        exit_timeline_years=rng.choice([None, 0, 3, 5, 7, 10]),
+        profile_summary="Synthetic investor",
+        preferred_focus_areas=_sample(rng, FOCUS_AREAS, 2),
+        preferred_founder_types=_sample(rng, FOUNDER_TYPES, 2),
+        risk_appetite=rng.choice(RISK),
+        preferred_time_horizon=_sample(rng, HORIZONS, 2),
+        embedding=_embedding(np_rng, dim),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the scalar and vectorized match scorers; "
+        "exits with status 1 if any score differs."
+    )
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--investors", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    np_rng = np.random.default_rng(args.seed)
+    companies = [random_company(rng, np_rng, args.dim) for _ in range(args.companies)]
+    investors = [random_investor(rng, np_rng, args.dim) for _ in range(args.investors)]
+    investors_data = [i.model_dump() for i in investors]
+
+    start = time.perf_counter()
+    investor_batch = encode_investors(investors_data)
+    encode_time = time.perf_counter() - start
+    print(f"Encoded {len(investors)} investors in {encode_time * 1000:.1f} ms")
+
+    mismatches = 0
+    scalar_time = 0.0
+    batch_time = 0.0
+    for company in companies:
+        company_data = company.model_dump()
+
+        start = time.perf_counter()
+        expected = [calculate_match_score(company_data, i) for i in investors_data]
+        scalar_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = score_matrix(
+            encode_companies([company_data]), investor_batch, MATCH_WEIGHTS
+        )[0]
+        batch_time += time.perf_counter() - start
+
+        differing = np.flatnonzero(scores != np.array(expected))
+        for idx in differing[:5]:
+            print(
+                f"Mismatch: {company.name} / {investors[idx].name}: "
+                f"batch {float(scores[idx])!r}, scalar {expected[idx]!r}"
+            )
+        mismatches += len(differing)
+
+    n = len(companies)
+    print(f"Scalar scorer: {scalar_time / n * 1000:.1f} ms per company")
+    print(f"Batch scorer:  {batch_time / n * 1000:.1f} ms per company")
+    print(f"Mismatched scores: {mismatches} of {n * len(investors)}")
+    if mismatches:
+        # The batch scorer must reproduce calculate_match_score exactly
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
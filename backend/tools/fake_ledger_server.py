@@ -0,0 +1,185 @@
+"""
+Local stand-in for an XRPL WebSocket server, for exercising LedgerSubscriber
+without a network.
+
+`serve` replays a recording (JSON lines of "transaction" stream messages)
+one ledger at a time: each tick closes the next ledger, streams its
+transactions to connections subscribed to an account they touch, then
+sends ledgerClosed. Ledgers keep closing while nobody is connected, and
+account_tx answers from everything closed so far, so dropped connections
+(--drop-every) exercise the subscriber's reconnect and backfill.
+
+`record` captures such a recording from a real server.
+
+    python -m tools.fake_ledger_server serve --recording ledger.jsonl
+    XRPL_WS_URL=ws://127.0.0.1:6006 uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import json
+
+import websockets
+
+from ledger_subscriber import stream_envelope, accounts_touched
+
+
+class FakeLedger:
+    def __init__(self, recording, ledger_interval, drop_every=0):
+        self.pending = sorted(recording, key=lambda m: m["ledger_index"])
+        self.ledger_index = (
+            self.pending[0]["ledger_index"] - 1 if self.pending else 1000
+        )
+        self.ledger_interval = ledger_interval
+        self.drop_every = drop_every
+        self.closed = []  # (envelope, touched accounts) of closed ledgers
+        self.connections = {}  # websocket -> (subscribed accounts, streams)
+
+    async def close_ledgers(self):
+        while True:
+            await asyncio.sleep(self.ledger_interval)
+            self.ledger_index += 1
+            while self.pending and self.pending[0]["ledger_index"] <= self.ledger_index:
+                message = self.pending.pop(0)
+                message["ledger_index"] = self.ledger_index
+                touched = accounts_touched(stream_envelope(message))
+                self.closed.append((stream_envelope(message), touched))
+                for ws, (accounts, _) in list(self.connections.items()):
+                    if accounts & touched:
+                        await self._send(ws, message)
+            for ws, (_, streams) in list(self.connections.items()):
+                if "ledger" in streams:
+                    await self._send(
+                        ws, {"type": "ledgerClosed", "ledger_index": self.ledger_index}
+                    )
+            if self.drop_every and self.ledger_index % self.drop_every == 0:
+                for ws in list(self.connections):
+                    print(f"Dropping connection at ledger {self.ledger_index}")
+                    await ws.close()
+
+    async def _send(self, ws, message):
+        try:
+            await ws.send(json.dumps(message))
+        except websockets.ConnectionClosed:
+            self.connections.pop(ws, None)
+
+    def account_tx(self, request):
+        account = request["account"]
+        low = request.get("ledger_index_min") or 0
+        high = request.get("ledger_index_max") or self.ledger_index
+        if high < 0:
+            high = self.ledger_index
+        found = [
+            dict(envelope, validated=True)
+            for envelope, touched in self.closed
+            if account in touched and low <= envelope["ledger_index"] <= high
+        ]
+        if not request.get("forward"):
+            found.reverse()
+        start = int(request.get("marker") or 0)
+        limit = request.get("limit") or 200
+        result = {"account": account, "transactions": found[start : start + limit]}
+        if start + limit < len(found):
+            result["marker"] = start + limit
+        return result
+
+    async def handle(self, ws):
+        self.connections[ws] = (set(), set())
+        try:
+            async for raw in ws:
+                request = json.loads(raw)
+                method = request.get("command") or request.get("method")
+                accounts, streams = self.connections.get(ws, (set(), set()))
+                if method == "subscribe":
+                    accounts |= set(request.get("accounts", []))
+                    streams |= set(request.get("streams", []))
+                    result = {}
+                elif method == "account_tx":
+                    result = self.account_tx(request)
+                elif method == "account_lines":
+                    result = {"account": request["account"], "lines": []}
+                else:
+                    await ws.send(
+                        json.dumps(
+                            {
+                                "id": request.get("id"),
+                                "status": "error",
+                                "type": "response",
+                                "error": "unknownCmd",
+                            }
+                        )
+                    )
+                    continue
+                await ws.send(
+                    json.dumps(
+                        {
+                            "id": request.get("id"),
+                            "status": "success",
+                            "type": "response",
+                            "result": result,
+                        }
+                    )
+                )
+        finally:
+            self.connections.pop(ws, None)
+
+
+async def serve(args):
+    with open(args.recording) as f:
+        recording = [json.loads(line) for line in f if line.strip()]
+    ledger = FakeLedger(recording, args.ledger_interval, args.drop_every)
+    async with websockets.serve(ledger.handle, args.host, args.port):
+        print(
+            f"Replaying {len(recording)} transactions on ws://{args.host}:{args.port}"
+        )
+        await ledger.close_ledgers()
+
+
+async def record(args):
+    from xrpl.asyncio.clients import AsyncWebsocketClient
+    from xrpl.models.requests import Subscribe
+
+    async with AsyncWebsocketClient(args.url) as client:
+        await client.request(Subscribe(accounts=args.accounts))
+        with open(args.recording, "a") as f:
+
+            async def capture():
+                async for message in client:
+                    if message.get("type") == "transaction":
+                        f.write(json.dumps(message) + "\n")
+                        f.flush()
+
+            try:
+                await asyncio.wait_for(capture(), args.duration)
+            except asyncio.TimeoutError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake XRPL ledger stream server.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Replay a recording")
+    serve_parser.add_argument("--recording", required=True)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=6006)
+    serve_parser.add_argument("--ledger-interval", type=float, default=1.0)
+    serve_parser.add_argument(
+        "--drop-every",
+        type=int,
+        default=0,
+        help="Close all connections whenever the ledger index is a multiple of this",
+    )
+
+    record_parser = sub.add_parser("record", help="Record a real server's stream")
+    record_parser.add_argument("--recording", required=True)
+    record_parser.add_argument("--url", default="wss://s.altnet.rippletest.net:51233")
+    record_parser.add_argument("--accounts", nargs="+", required=True)
+    record_parser.add_argument("--duration", type=float, default=60.0)
+
+    args = parser.parse_args()
+    asyncio.run(serve(args) if args.command == "serve" else record(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import asyncio
 import os
+from typing import List
 from database import Database
 from models import Company, Investor, RevenueStage, BusinessModel, ExitStrategy
 from matching_algo import (
-    get_embedding,
+    get_embeddings,
     generate_company_text_for_embedding,
     generate_investor_text_for_embedding,
 )
@@ -358,66 +359,70 @@ SAMPLE_INVESTORS = [
 ]
 
 
-async def create_company_with_embedding(db: Database, company_data: dict) -> Company:
-    """Create a company with embeddings."""
-    try:
+async def create_companies_with_embeddings(
+    db: Database, companies_data: List[dict]
+) -> List[Company]:
+    """Create companies, embedding all of their profiles in one batch."""
+    companies = []
+    for company_data in companies_data:
         # Check if company already exists by name
         if await db.company_name_exists(company_data["name"]):
             print(f"Company {company_data['name']} already exists, skipping...")
-            return None
-
-        # Create a new company instance
-        company = Company(**company_data)
+            continue
+        companies.append(Company(**company_data))
 
-        # Generate text for embedding
-        text = generate_company_text_for_embedding(company.model_dump())
+    # Generate text for embedding and embed everything at once
+    texts = [generate_company_text_for_embedding(c.model_dump()) for c in companies]
+    embeddings = get_embeddings(texts)
 
-        # Get embedding
-        embedding = get_embedding(text)
-        if embedding is not None:
+    created = []
+    for company, embedding in zip(companies, embeddings):
+        if embedding is None:
+            print(f"Failed to generate embedding for company: {company.name}")
+            continue
+        try:
             company.embedding = embedding.tolist()
 
             # Save to database
             await db.save_company(company)
             print(f"Successfully saved company: {company.name}")
-            return company
-        else:
-            print(f"Failed to generate embedding for company: {company.name}")
-            return None
-    except Exception as e:
-        print(f"Error creating company: {str(e)}")
-        return None
+            created.append(company)
+        except Exception as e:
+            print(f"Error creating company: {str(e)}")
+    return created
 
 
-async def create_investor_with_embedding(db: Database, investor_data: dict) -> Investor:
-    """Create an investor with embeddings."""
-    try:
+async def create_investors_with_embeddings(
+    db: Database, investors_data: List[dict]
+) -> List[Investor]:
+    """Create investors, embedding all of their profiles in one batch."""
+    investors = []
+    for investor_data in investors_data:
         # Check if investor already exists by name
         if await db.investor_name_exists(investor_data["name"]):
             print(f"Investor {investor_data['name']} already exists, skipping...")
-            return None
-
-        # Create a new investor instance
-        investor = Investor(**investor_data)
+            continue
+        investors.append(Investor(**investor_data))
 
-        # Generate text for embedding
-        text = generate_investor_text_for_embedding(investor.model_dump())
+    # Generate text for embedding and embed everything at once
+    texts = [generate_investor_text_for_embedding(i.model_dump()) for i in investors]
+    embeddings = get_embeddings(texts)
 
-        # Get embedding
-        embedding = get_embedding(text)
-        if embedding is not None:
+    created = []
+    for investor, embedding in zip(investors, embeddings):
+        if embedding is None:
+            print(f"Failed to generate embedding for investor: {investor.name}")
+            continue
+        try:
             investor.embedding = embedding.tolist()
 
             # Save to database
             await db.save_investor(investor)
             print(f"Successfully saved investor: {investor.name}")
-            return investor
-        else:
-            print(f"Failed to generate embedding for investor: {investor.name}")
-            return None
-    except Exception as e:
-        print(f"Error creating investor: {str(e)}")
-        return None
+            created.append(investor)
+        except Exception as e:
+            print(f"Error creating investor: {str(e)}")
+    return created
 
 
 async def populate_database(fresh_start: bool = False):
@@ -439,21 +444,15 @@ async def populate_database(fresh_start: bool = False):
 
         # Create companies
         print("\nCreating companies...")
-        companies = []
-        for company_data in SAMPLE_COMPANIES:
-            company = await create_company_with_embedding(db, company_data)
-            if company:
-                companies.append(company)
-                print(f"Created company: {company.name} (ID: {company.id})")
+        companies = await create_companies_with_embeddings(db, SAMPLE_COMPANIES)
+        for company in companies:
+            print(f"Created company: {company.name} (ID: {company.id})")
 
         # Create investors
         print("\nCreating investors...")
-        investors = []
-        for investor_data in SAMPLE_INVESTORS:
-            investor = await create_investor_with_embedding(db, investor_data)
-            if investor:
-                investors.append(investor)
-                print(f"Created investor: {investor.name} (ID: {investor.id})")
+        investors = await create_investors_with_embeddings(db, SAMPLE_INVESTORS)
+        for investor in investors:
+            print(f"Created investor: {investor.name} (ID: {investor.id})")
 
         # call update_existing_data to ensure all data is up to date
         # try:
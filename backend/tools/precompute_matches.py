@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import time
+
+from database import Database
+from match_snapshot import MatchingSnapshot
+from match_precompute import (
+    PRECOMPUTE_BLOCK_SIZE,
+    PRECOMPUTE_TOP_K,
+    run_precompute,
+)
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute the top matches of every company and investor."
+    )
+    parser.add_argument("--db", default="sharewave_db_new.sqlite")
+    parser.add_argument("--top-k", type=int, default=PRECOMPUTE_TOP_K)
+    parser.add_argument("--block-size", type=int, default=PRECOMPUTE_BLOCK_SIZE)
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rescore every pair instead of only what changed since the last run",
+    )
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    try:
+        await db.connect()
+        snapshot = await MatchingSnapshot().load(db)
+
+        start = time.perf_counter()
+        run = await run_precompute(
+            db,
+            snapshot.view(),
+            top_k=args.top_k,
+            block_size=args.block_size,
+            full=args.full,
+        )
+        elapsed = time.perf_counter() - start
+
+        print(f"{'Full' if run.full else 'Incremental'} run in {elapsed:.2f} s")
+        print(f"Pairs scored: {run.pairs_scored}")
+        print(
+            f"Updated match lists: {run.rescored['company']} companies, "
+            f"{run.rescored['investor']} investors"
+        )
+        print(
+            f"Removed: {len(run.removed['company'])} companies, "
+            f"{len(run.removed['investor'])} investors"
+        )
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,7 @@
 import asyncio
 import random
-from database import Database
+from database import Database, embedding_to_blob
 from models import (
-    Company,
-    Investor,
     RevenueStage,
     BusinessModel,
     ExitStrategy,
@@ -13,11 +11,11 @@ from models import (
     TimeHorizon,
 )
 from matching_algo import (
-    get_embedding,
+    get_embeddings,
     generate_company_text_for_embedding,
     generate_investor_text_for_embedding,
 )
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
 import json
 
 # Industry-specific sub-industries mapping for more realistic data
@@ -221,6 +219,60 @@ INDUSTRY_ESG_LIKELIHOOD = {
 }
 
 
+async def reembed_companies(db: Database, company_ids: List[str]) -> None:
+    """Recalculate the embeddings of the given companies in one batch."""
+    companies = []
+    for company_id in company_ids:
+        company = await db.get_company_by_id(company_id)
+        if company:
+            companies.append(company)
+        else:
+            print(f"Failed to reload company with ID: {company_id}")
+
+    # Generate new embedding texts; unchanged ones are served from the cache
+    texts = [generate_company_text_for_embedding(c.model_dump()) for c in companies]
+    embeddings = get_embeddings(texts)
+
+    updates = []
+    for company, embedding in zip(companies, embeddings):
+        if embedding is not None:
+            updates.append((embedding_to_blob(embedding), company.id))
+            print(f"Updated company: {company.name}")
+        else:
+            print(f"Failed to generate new embedding for company: {company.name}")
+
+    # Update only the embedding
+    await db.db.executemany("UPDATE company SET embedding = ? WHERE id = ?", updates)
+    await db.db.commit()
+
+
+async def reembed_investors(db: Database, investor_ids: List[str]) -> None:
+    """Recalculate the embeddings of the given investors in one batch."""
+    investors = []
+    for investor_id in investor_ids:
+        investor = await db.get_investor_by_id(investor_id)
+        if investor:
+            investors.append(investor)
+        else:
+            print(f"Failed to reload investor with ID: {investor_id}")
+
+    # Generate new embedding texts; unchanged ones are served from the cache
+    texts = [generate_investor_text_for_embedding(i.model_dump()) for i in investors]
+    embeddings = get_embeddings(texts)
+
+    updates = []
+    for investor, embedding in zip(investors, embeddings):
+        if embedding is not None:
+            updates.append((embedding_to_blob(embedding), investor.id))
+            print(f"Updated investor: {investor.name}")
+        else:
+            print(f"Failed to generate new embedding for investor: {investor.name}")
+
+    # Update only the embedding
+    await db.db.executemany("UPDATE investors SET embedding = ? WHERE id = ?", updates)
+    await db.db.commit()
+
+
 async def update_companies_direct_db(db: Database) -> None:
     """Update existing companies directly in the database without going through models."""
     cursor = await db.db.execute("SELECT * FROM company")
@@ -228,6 +280,7 @@ async def update_companies_direct_db(db: Database) -> None:
     column_names = [description[0] for description in cursor.description]
 
     print(f"Found {len(rows)} companies to update")
+    updated_ids = []
 
     for row in rows:
         company_data = dict(zip(column_names, row))
@@ -387,28 +440,10 @@ async def update_companies_direct_db(db: Database) -> None:
             await db.db.execute(sql, values)
             await db.db.commit()
 
-            # Now reload the company to recalculate the embedding
-            company = await get_company_by_id(db, company_id)
-            if company:
-                # Generate new embedding text
-                text = generate_company_text_for_embedding(company.model_dump())
-                embedding = get_embedding(text)
-
-                if embedding is not None:
-                    # Update only the embedding
-                    embedding_json = json.dumps(embedding.tolist())
-                    await db.db.execute(
-                        "UPDATE company SET embedding = ? WHERE id = ?",
-                        (embedding_json, company_id),
-                    )
-                    await db.db.commit()
-                    print(f"Updated company: {company.name}")
-                else:
-                    print(
-                        f"Failed to generate new embedding for company: {company.name}"
-                    )
-            else:
-                print(f"Failed to reload company with ID: {company_id}")
+            # The embedding is recalculated below, in one batch for all rows
+            updated_ids.append(company_id)
+
+    await reembed_companies(db, updated_ids)
 
 
 async def update_investors_direct_db(db: Database) -> None:
@@ -418,6 +453,7 @@ async def update_investors_direct_db(db: Database) -> None:
     column_names = [description[0] for description in cursor.description]
 
     print(f"Found {len(rows)} investors to update")
+    updated_ids = []
 
     for row in rows:
         investor_data = dict(zip(column_names, row))
@@ -675,113 +711,10 @@ async def update_investors_direct_db(db: Database) -> None:
             await db.db.execute(sql, values)
             await db.db.commit()
 
-            # Now reload the investor to recalculate the embedding
-            investor = await get_investor_by_id(db, investor_id)
-            if investor:
-                # Generate new embedding text
-                text = generate_investor_text_for_embedding(investor.model_dump())
-                embedding = get_embedding(text)
-
-                if embedding is not None:
-                    # Update only the embedding
-                    embedding_json = json.dumps(embedding.tolist())
-                    await db.db.execute(
-                        "UPDATE investors SET embedding = ? WHERE id = ?",
-                        (embedding_json, investor_id),
-                    )
-                    await db.db.commit()
-                    print(f"Updated investor: {investor.name}")
-                else:
-                    print(
-                        f"Failed to generate new embedding for investor: {investor.name}"
-                    )
-            else:
-                print(f"Failed to reload investor with ID: {investor_id}")
-
-
-async def get_company_by_id(db: Database, company_id: str) -> Optional[Company]:
-    """Get a company from the database by ID."""
-    cursor = await db.db.execute("SELECT * FROM company WHERE id = ?", (company_id,))
-    row = await cursor.fetchone()
-
-    if not row:
-        return None
-
-    # Convert row to dict
-    company_data = dict(zip([col[0] for col in cursor.description], row))
+            # The embedding is recalculated below, in one batch for all rows
+            updated_ids.append(investor_id)
 
-    # Parse JSON fields
-    for field in ["focus_areas", "founder_types", "sub_industries"]:
-        if company_data.get(field):
-            try:
-                company_data[field] = json.loads(company_data[field])
-            except:
-                company_data[field] = []
-        else:
-            company_data[field] = []
-
-    # Convert SQLite integer to boolean for esg_focus
-    if "esg_focus" in company_data:
-        company_data["esg_focus"] = bool(company_data["esg_focus"])
-    else:
-        company_data["esg_focus"] = False
-
-    # Parse embedding if it exists
-    if company_data.get("embedding"):
-        try:
-            company_data["embedding"] = json.loads(company_data["embedding"])
-        except:
-            company_data["embedding"] = None
-
-    # Create company object
-    return Company(**company_data)
-
-
-async def get_investor_by_id(db: Database, investor_id: str) -> Optional[Investor]:
-    """Get an investor from the database by ID."""
-    cursor = await db.db.execute("SELECT * FROM investors WHERE id = ?", (investor_id,))
-    row = await cursor.fetchone()
-
-    if not row:
-        return None
-
-    # Convert row to dict
-    investor_data = dict(zip([col[0] for col in cursor.description], row))
-
-    # Parse JSON fields
-    for field in [
-        "preferred_industries",
-        "preferred_stages",
-        "preferred_locations",
-        "preferred_focus_areas",
-        "preferred_founder_types",
-        "preferred_time_horizon",
-        "excluded_industries",
-        "business_model_focus",
-    ]:
-        if investor_data.get(field):
-            try:
-                investor_data[field] = json.loads(investor_data[field])
-            except:
-                investor_data[field] = []
-        else:
-            investor_data[field] = []
-
-    # Convert SQLite integer to boolean for esg_mandate
-    if "esg_mandate" in investor_data:
-        investor_data["esg_mandate"] = bool(investor_data["esg_mandate"])
-    else:
-        investor_data["esg_mandate"] = False
-
-    # Parse embedding if it exists
-    if investor_data.get("embedding"):
-        try:
-            investor_data["embedding"] = json.loads(investor_data["embedding"])
-        except:
-            investor_data["embedding"] = None
-
-    # Create investor object
-    return Investor(**investor_data)
+    await reembed_investors(db, updated_ids)
 
 
 async def update_database_schema(db: Database) -> None:
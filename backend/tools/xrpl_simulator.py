@@ -0,0 +1,948 @@
+"""
+Local, offline stand-in for an XRPL JSON-RPC server and testnet faucet.
+
+Issuance, verification and distribution all talk to the public testnet, so
+none of it could be load-tested or benchmarked locally. This serves the
+subset of rippled's JSON-RPC API the backend and xrpl-py's helpers use,
+backed by an in-memory ledger:
+
+- account_info, account_lines, account_tx, amm_info, tx
+- ledger, fee, server_info, server_state
+- submit (signed blobs; Payment, TrustSet and AMMCreate are applied, other
+  transaction types only consume their fee and sequence)
+- POST /accounts: faucet funding, as used by generate_faucet_wallet
+- sim_fund: non-standard, credits XRP or an issued currency (e.g. RLUSD,
+  whose real issuer key is not available locally) to an account
+
+Submitted transactions pass rippled's preliminary checks (signature,
+sequence, fee, LastLedgerSequence) and wait in the open ledger. Every
+`ledger_interval` seconds the ledger closes and applies at most
+`ledger_capacity` of them in order; past that capacity submissions are
+queued (terQUEUED), at most ACCOUNT_QUEUE_LIMIT per account
+(telCAN_NOT_QUEUE_FULL), as on a busy server.
+
+Transactions only change state when their ledger closes, so the latest
+closed state is the validated ledger. account_info, amm_info and ledger
+resolve `ledger_index` ("validated"/"closed", "current"/"open" or a number)
+and report it with the matching `validated` flag, so validated reads such as
+the AMM sampler's see the same ledger stamps as on a real server;
+account_info at the open ledger also counts its queued sequences.
+account_lines reports the requested ledger capped at the latest close, and
+account_tx filters its history by ledger_index_min/max exactly. Balances,
+lines and pools are not reconstructed for older numbered ledgers: those
+reads return the latest closed state under the requested index.
+
+Every request is delayed by `latency` (plus up to `jitter`) seconds, and
+beyond `rate_limit` requests per second the server answers 503 with a
+slowDown error and Retry-After, like a loaded public server.
+
+    python -m tools.xrpl_simulator serve --port 5005 --ledger-interval 1
+    XRPL_URL=http://127.0.0.1:5005 XRPL_FAUCET_HOST=http://127.0.0.1:5005 uvicorn main:app
+
+`create_app` returns the ASGI app, so in-process callers can also reach it
+through `XRPLGateway(url, transport=httpx.ASGITransport(app))`.
+"""
+
+import argparse
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import random
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from xrpl.core import keypairs
+from xrpl.core.addresscodec import encode_classic_address
+from xrpl.core.binarycodec import decode, encode_for_signing
+
+from xrpl_history import RIPPLE_EPOCH_OFFSET
+
+DROPS_PER_XRP = 1_000_000
+FAUCET_AMOUNT_DROPS = 100 * DROPS_PER_XRP
+ACCOUNT_RESERVE_DROPS = 10 * DROPS_PER_XRP
+OWNER_RESERVE_DROPS = 2 * DROPS_PER_XRP
+BASE_FEE_DROPS = 10
+ACCOUNT_QUEUE_LIMIT = 10
+MAX_PAGE_SIZE = 400
+
+ENGINE_RESULT_CODES = {
+    "tesSUCCESS": 0,
+    "terQUEUED": -89,
+    "terPRE_SEQ": -92,
+    "terNO_ACCOUNT": -96,
+    "terINSUF_FEE_B": -97,
+    "tefPAST_SEQ": -190,
+    "tefALREADY": -198,
+    "tefMAX_LEDGER": -186,
+    "telINSUF_FEE_P": -394,
+    "telCAN_NOT_QUEUE_FULL": -387,
+    "tecDUPLICATE": 149,
+    "tecNO_DST": 124,
+    "tecNO_DST_INSUF_XRP": 125,
+    "tecNO_ISSUER": 133,
+    "tecPATH_DRY": 128,
+    "tecPATH_PARTIAL": 101,
+    "tecUNFUNDED_AMM": 162,
+    "tecUNFUNDED_PAYMENT": 104,
+}
+
+
+class RPCError(Exception):
+    def __init__(self, error: str, message: str = ""):
+        super().__init__(message or error)
+        self.error = error
+        self.message = message or error
+
+
+def _value(amount: str) -> Decimal:
+    try:
+        return Decimal(amount)
+    except (InvalidOperation, TypeError):
+        raise RPCError("invalidParams", f"Invalid amount: {amount}")
+
+
+def _value_str(value: Decimal) -> str:
+    return format(value.normalize(), "f") if value else "0"
+
+
+def _asset_key(asset) -> Tuple[str, Optional[str]]:
+    if isinstance(asset, dict):
+        return (asset.get("currency"), asset.get("issuer"))
+    return ("XRP", None)
+
+
+def _derived_address(*parts: str) -> str:
+    return encode_classic_address(
+        hashlib.sha256("/".join(parts).encode()).digest()[:20]
+    )
+
+
+def transaction_hash(tx_blob: str) -> str:
+    """The transaction's ID: SHA-512Half of "TXN\\0" + the signed blob."""
+    digest = hashlib.sha512(bytes.fromhex("54584E00" + tx_blob)).digest()
+    return digest[:32].hex().upper()
+
+
+class SimulatedLedger:
+    """In-memory ledger state and the transaction engine."""
+
+    def __init__(
+        self,
+        ledger_interval: float = 3.5,
+        ledger_capacity: int = 1000,
+        verify_signatures: bool = True,
+        start_ledger: int = 1000,
+    ):
+        self.ledger_interval = ledger_interval
+        self.ledger_capacity = ledger_capacity
+        self.verify_signatures = verify_signatures
+        self.closed_ledger = start_ledger
+        self.close_time = self._ripple_now()
+        # address -> {"Balance": drops, "Sequence", "OwnerCount"}
+        self.accounts: Dict[str, dict] = {}
+        # (holder, issuer, currency) -> {"balance": held by holder, "limit"}
+        self.lines: Dict[Tuple[str, str, str], dict] = {}
+        self.lines_by_account: Dict[str, set] = {}
+        # Sorted asset pair -> AMM account; AMM account -> pool fields
+        self.amm_by_pair: Dict[tuple, str] = {}
+        self.amms: Dict[str, dict] = {}
+        # Transactions waiting in the open ledger, in arrival order
+        self.open: List[dict] = []
+        self.open_by_account: Dict[str, List[dict]] = {}
+        # account -> sequence -> transaction that arrived ahead of its turn
+        self.held: Dict[str, Dict[int, dict]] = {}
+        self.seen_hashes: set = set()
+        # hash -> envelope of validated transactions
+        self.transactions: Dict[str, dict] = {}
+        # account -> [(ledger_index, transaction_index)], envelopes in step
+        self.history_keys: Dict[str, List[Tuple[int, int]]] = {}
+        self.history: Dict[str, List[dict]] = {}
+
+    @staticmethod
+    def _ripple_now() -> int:
+        return int(time.time()) - RIPPLE_EPOCH_OFFSET
+
+    @property
+    def current_ledger(self) -> int:
+        return self.closed_ledger + 1
+
+    def _ledger_index(self, requested) -> int:
+        if requested in (None, "validated", "closed"):
+            return self.closed_ledger
+        if requested in ("current", "open"):
+            return self.current_ledger
+        try:
+            return int(requested)
+        except (TypeError, ValueError):
+            raise RPCError("invalidParams", f"Invalid ledger_index: {requested}")
+
+    def _account(self, address: str) -> dict:
+        account = self.accounts.get(address)
+        if account is None:
+            raise RPCError("actNotFound", "Account not found.")
+        return account
+
+    def _create_account(self, address: str, drops: int) -> dict:
+        account = {"Balance": drops, "Sequence": self.current_ledger, "OwnerCount": 0}
+        self.accounts[address] = account
+        return account
+
+    # ------------------------------------------------------------------
+    # Trustlines and balances
+
+    def _line(self, holder: str, issuer: str, currency: str) -> Optional[dict]:
+        return self.lines.get((holder, issuer, currency))
+
+    def _create_line(self, holder: str, issuer: str, currency: str, limit: Decimal):
+        line = {"balance": Decimal(0), "limit": limit}
+        self.lines[(holder, issuer, currency)] = line
+        self.lines_by_account.setdefault(holder, set()).add((holder, issuer, currency))
+        self.lines_by_account.setdefault(issuer, set()).add((holder, issuer, currency))
+        if holder in self.accounts:
+            self.accounts[holder]["OwnerCount"] += 1
+        return line
+
+    def _holds(self, account: str, amount) -> bool:
+        """Whether `account` can deliver `amount` (issuers can always issue)."""
+        if not isinstance(amount, dict):
+            return self.accounts[account]["Balance"] >= int(amount)
+        if amount["issuer"] == account:
+            return True
+        line = self._line(account, amount["issuer"], amount["currency"])
+        return line is not None and line["balance"] >= _value(amount["value"])
+
+    def _can_receive(self, account: str, amount) -> bool:
+        if not isinstance(amount, dict) or amount["issuer"] == account:
+            return True
+        line = self._line(account, amount["issuer"], amount["currency"])
+        return line is not None
+
+    def _move(self, source: str, destination: str, amount):
+        """Move `amount` from source to destination; both checked beforehand."""
+        if not isinstance(amount, dict):
+            self.accounts[source]["Balance"] -= int(amount)
+            self.accounts[destination]["Balance"] += int(amount)
+            return
+        issuer, currency = amount["issuer"], amount["currency"]
+        value = _value(amount["value"])
+        if source != issuer:
+            self.lines[(source, issuer, currency)]["balance"] -= value
+        if destination != issuer:
+            self.lines[(destination, issuer, currency)]["balance"] += value
+
+    def fund(self, address: str, amount) -> dict:
+        """Credit XRP (drops) or an issued amount, creating what is missing."""
+        if not isinstance(amount, dict):
+            account = self.accounts.get(address)
+            if account is None:
+                account = self._create_account(address, 0)
+            account["Balance"] += int(amount)
+            return account
+        self._account(address)
+        issuer, currency = amount["issuer"], amount["currency"]
+        line = self._line(address, issuer, currency)
+        if line is None:
+            line = self._create_line(address, issuer, currency, Decimal("1e15"))
+        line["balance"] += _value(amount["value"])
+        return line
+
+    # ------------------------------------------------------------------
+    # Submission
+
+    def submit(self, tx_blob: str) -> dict:
+        try:
+            tx_json = decode(tx_blob)
+        except Exception as e:
+            raise RPCError("invalidTransaction", f"Could not decode: {e}")
+        tx_hash = transaction_hash(tx_blob)
+        if self.verify_signatures and not self._signature_valid(tx_json):
+            raise RPCError(
+                "invalidTransaction", "fails local checks: Invalid signature."
+            )
+
+        tx = {"hash": tx_hash, "tx_json": tx_json, "tx_blob": tx_blob}
+        engine_result = self._admit(tx)
+        return {
+            "engine_result": engine_result,
+            "engine_result_code": ENGINE_RESULT_CODES.get(engine_result, 0),
+            "engine_result_message": engine_result,
+            "tx_blob": tx_blob,
+            "tx_json": dict(tx_json, hash=tx_hash),
+            "accepted": engine_result in ("tesSUCCESS", "terQUEUED"),
+            "applied": engine_result == "tesSUCCESS",
+            "queued": engine_result == "terQUEUED",
+            "kept": engine_result in ("tesSUCCESS", "terQUEUED", "terPRE_SEQ"),
+            "broadcast": engine_result == "tesSUCCESS",
+        }
+
+    def _signature_valid(self, tx_json: dict) -> bool:
+        public_key = tx_json.get("SigningPubKey")
+        signature = tx_json.get("TxnSignature")
+        if not public_key or not signature:
+            return False
+        if keypairs.derive_classic_address(public_key) != tx_json.get("Account"):
+            return False
+        message = bytes.fromhex(encode_for_signing(tx_json))
+        try:
+            return keypairs.is_valid_message(
+                message, bytes.fromhex(signature), public_key
+            )
+        except Exception:
+            return False
+
+    def _admit(self, tx: dict) -> str:
+        tx_json = tx["tx_json"]
+        address = tx_json["Account"]
+        account = self.accounts.get(address)
+        if account is None:
+            return "terNO_ACCOUNT"
+        if tx["hash"] in self.seen_hashes:
+            return "tefALREADY"
+        last_ledger = tx_json.get("LastLedgerSequence")
+        if last_ledger is not None and last_ledger < self.current_ledger:
+            return "tefMAX_LEDGER"
+        if int(tx_json.get("Fee", "0")) < BASE_FEE_DROPS:
+            return "telINSUF_FEE_P"
+        if account["Balance"] < int(tx_json.get("Fee", "0")):
+            return "terINSUF_FEE_B"
+
+        sequence = tx_json.get("Sequence", 0)
+        pending = self.open_by_account.get(address, [])
+        expected = (
+            pending[-1]["tx_json"]["Sequence"] + 1 if pending else account["Sequence"]
+        )
+        if sequence > expected:
+            self.held.setdefault(address, {})[sequence] = tx
+            self.seen_hashes.add(tx["hash"])
+            return "terPRE_SEQ"
+        if sequence < expected:
+            return "tefPAST_SEQ"
+
+        engine_result = self._enqueue(tx)
+        if engine_result == "telCAN_NOT_QUEUE_FULL":
+            return engine_result
+        # Transactions that were waiting for this one can follow it
+        held = self.held.get(address, {})
+        while sequence + 1 in held:
+            sequence += 1
+            if self._enqueue(held.pop(sequence)) == "telCAN_NOT_QUEUE_FULL":
+                break
+        return engine_result
+
+    def _enqueue(self, tx: dict) -> str:
+        address = tx["tx_json"]["Account"]
+        pending = self.open_by_account.setdefault(address, [])
+        if len(self.open) >= self.ledger_capacity:
+            queued = sum(1 for t in pending if t["queued"])
+            if queued >= ACCOUNT_QUEUE_LIMIT:
+                self.seen_hashes.discard(tx["hash"])
+                return "telCAN_NOT_QUEUE_FULL"
+            tx["queued"] = True
+        else:
+            tx["queued"] = False
+        self.seen_hashes.add(tx["hash"])
+        self.open.append(tx)
+        pending.append(tx)
+        return "terQUEUED" if tx["queued"] else "tesSUCCESS"
+
+    # ------------------------------------------------------------------
+    # Ledger close and transaction engine
+
+    def close_ledger(self):
+        """Close the open ledger, applying up to ledger_capacity transactions."""
+        ledger_index = self.current_ledger
+        self.close_time = self._ripple_now()
+        applied = 0
+        remaining = []
+        for tx in self.open:
+            tx_json = tx["tx_json"]
+            last_ledger = tx_json.get("LastLedgerSequence")
+            account = self.accounts[tx_json["Account"]]
+            if last_ledger is not None and last_ledger < ledger_index:
+                self._forget(tx)
+            elif applied >= self.ledger_capacity:
+                remaining.append(tx)
+            elif tx_json["Sequence"] != account["Sequence"]:
+                # Its predecessor expired; it can only wait for expiry itself
+                if last_ledger is None:
+                    self._forget(tx)
+                else:
+                    remaining.append(tx)
+            else:
+                self._apply(tx, ledger_index, applied)
+                self._forget(tx, applied=True)
+                applied += 1
+        self.open = remaining
+        for i, tx in enumerate(self.open):
+            tx["queued"] = i >= self.ledger_capacity
+        for address, held in list(self.held.items()):
+            for sequence, tx in list(held.items()):
+                last_ledger = tx["tx_json"].get("LastLedgerSequence")
+                if last_ledger is not None and last_ledger < ledger_index:
+                    del held[sequence]
+                    self.seen_hashes.discard(tx["hash"])
+        self.closed_ledger = ledger_index
+
+    def _forget(self, tx: dict, applied: bool = False):
+        address = tx["tx_json"]["Account"]
+        self.open_by_account[address].remove(tx)
+        if not applied:
+            self.seen_hashes.discard(tx["hash"])
+
+    def _apply(self, tx: dict, ledger_index: int, tx_index: int):
+        tx_json = tx["tx_json"]
+        address = tx_json["Account"]
+        account = self.accounts[address]
+        account["Balance"] -= int(tx_json.get("Fee", "0"))
+        account["Sequence"] += 1
+
+        meta = {"AffectedNodes": [], "TransactionIndex": tx_index}
+        tx_type = tx_json.get("TransactionType")
+        if tx_type == "Payment":
+            result = self._apply_payment(tx_json, meta)
+        elif tx_type == "TrustSet":
+            result = self._apply_trust_set(tx_json)
+        elif tx_type == "AMMCreate":
+            result = self._apply_amm_create(tx_json, meta)
+        else:
+            result = "tesSUCCESS"
+        meta["TransactionResult"] = result
+
+        envelope = {
+            "hash": tx["hash"],
+            "ledger_index": ledger_index,
+            "close_time_iso": time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ",
+                time.gmtime(self.close_time + RIPPLE_EPOCH_OFFSET),
+            ),
+            "tx_json": dict(tx_json, date=self.close_time, ledger_index=ledger_index),
+            "meta": meta,
+            "validated": True,
+        }
+        self.transactions[tx["hash"]] = envelope
+        for touched in self._accounts_touched(tx_json, meta):
+            self.history_keys.setdefault(touched, []).append((ledger_index, tx_index))
+            self.history.setdefault(touched, []).append(envelope)
+
+    @staticmethod
+    def _accounts_touched(tx_json: dict, meta: dict) -> set:
+        accounts = {tx_json.get("Account"), tx_json.get("Destination")}
+        for field in ("Amount", "Amount2", "LimitAmount"):
+            if isinstance(tx_json.get(field), dict):
+                accounts.add(tx_json[field].get("issuer"))
+        for node in meta["AffectedNodes"]:
+            for change in node.values():
+                accounts.add(change.get("NewFields", {}).get("Account"))
+        accounts.discard(None)
+        return accounts
+
+    def _apply_payment(self, tx_json: dict, meta: dict) -> str:
+        source = tx_json["Account"]
+        destination = tx_json["Destination"]
+        amount = tx_json["Amount"]
+        if not self._holds(source, amount):
+            return "tecUNFUNDED_PAYMENT"
+
+        if not isinstance(amount, dict):
+            if destination not in self.accounts:
+                if int(amount) < ACCOUNT_RESERVE_DROPS:
+                    return "tecNO_DST_INSUF_XRP"
+                self._create_account(destination, 0)
+        elif destination not in self.accounts:
+            return "tecNO_DST"
+        elif not self._can_receive(destination, amount):
+            return "tecPATH_DRY"
+        elif destination != amount["issuer"]:
+            line = self._line(destination, amount["issuer"], amount["currency"])
+            if line["balance"] + _value(amount["value"]) > line["limit"]:
+                return "tecPATH_PARTIAL"
+
+        self._move(source, destination, amount)
+        meta["delivered_amount"] = amount
+        return "tesSUCCESS"
+
+    def _apply_trust_set(self, tx_json: dict) -> str:
+        limit_amount = tx_json["LimitAmount"]
+        issuer, currency = limit_amount["issuer"], limit_amount["currency"]
+        if issuer not in self.accounts:
+            return "tecNO_ISSUER"
+        line = self._line(tx_json["Account"], issuer, currency)
+        if line is None:
+            self._create_line(
+                tx_json["Account"], issuer, currency, _value(limit_amount["value"])
+            )
+        else:
+            line["limit"] = _value(limit_amount["value"])
+        return "tesSUCCESS"
+
+    def _apply_amm_create(self, tx_json: dict, meta: dict) -> str:
+        creator = tx_json["Account"]
+        amount, amount2 = tx_json["Amount"], tx_json["Amount2"]
+        pair = tuple(sorted((_asset_key(amount), _asset_key(amount2)), key=str))
+        if pair in self.amm_by_pair:
+            return "tecDUPLICATE"
+        if not (self._holds(creator, amount) and self._holds(creator, amount2)):
+            return "tecUNFUNDED_AMM"
+
+        amm_account = _derived_address("amm", *map(str, pair))
+        self._create_account(amm_account, 0)
+        for pooled in (amount, amount2):
+            if isinstance(pooled, dict):
+                self._create_line(
+                    amm_account, pooled["issuer"], pooled["currency"], Decimal("1e15")
+                )
+            self._move(creator, amm_account, pooled)
+
+        value1 = (
+            _value(amount["value"]) if isinstance(amount, dict) else Decimal(amount)
+        )
+        value2 = (
+            _value(amount2["value"]) if isinstance(amount2, dict) else Decimal(amount2)
+        )
+        lp_currency = (
+            "03" + hashlib.sha256(amm_account.encode()).hexdigest()[:38].upper()
+        )
+        lp_line = self._create_line(creator, amm_account, lp_currency, Decimal("1e15"))
+        lp_line["balance"] = (value1 * value2).sqrt()
+
+        self.amm_by_pair[pair] = amm_account
+        self.amms[amm_account] = {
+            "asset": _asset_key(amount),
+            "asset2": _asset_key(amount2),
+            "lp_currency": lp_currency,
+            "lp_supply": lp_line["balance"],
+            "trading_fee": tx_json.get("TradingFee", 0),
+        }
+        meta["AffectedNodes"].append(
+            {
+                "CreatedNode": {
+                    "LedgerEntryType": "AMM",
+                    "NewFields": {"Account": amm_account},
+                }
+            }
+        )
+        return "tesSUCCESS"
+
+    # ------------------------------------------------------------------
+    # Reads
+
+    def account_info(self, params: dict) -> dict:
+        address = params.get("account")
+        account = self._account(address)
+        ledger = params.get("ledger_index", "current")
+        sequence = account["Sequence"]
+        if ledger in ("current", "open"):
+            # The open ledger already counts the transactions waiting in it
+            sequence += len(self.open_by_account.get(address, []))
+        result = {
+            "account_data": {
+                "Account": address,
+                "Balance": str(account["Balance"]),
+                "Flags": 0,
+                "LedgerEntryType": "AccountRoot",
+                "OwnerCount": account["OwnerCount"],
+                "Sequence": sequence,
+            },
+        }
+        return dict(result, **self._ledger_fields(ledger))
+
+    def _ledger_fields(self, requested) -> dict:
+        ledger_index = self._ledger_index(requested)
+        if ledger_index > self.closed_ledger:
+            return {"ledger_current_index": ledger_index, "validated": False}
+        return {"ledger_index": ledger_index, "validated": True}
+
+    def account_lines(self, params: dict) -> dict:
+        address = params.get("account")
+        self._account(address)
+        peer = params.get("peer")
+        keys = sorted(
+            key
+            for key in self.lines_by_account.get(address, ())
+            if peer is None or peer in key[:2]
+        )
+        limit = min(max(int(params.get("limit") or 200), 10), MAX_PAGE_SIZE)
+        start = int(params.get("marker") or 0)
+        lines = []
+        for holder, issuer, currency in keys[start : start + limit]:
+            line = self.lines[(holder, issuer, currency)]
+            own_side = address == holder
+            lines.append(
+                {
+                    "account": issuer if own_side else holder,
+                    "balance": _value_str(
+                        line["balance"] if own_side else -line["balance"]
+                    ),
+                    "currency": currency,
+                    "limit": _value_str(line["limit"]) if own_side else "0",
+                    "limit_peer": "0" if own_side else _value_str(line["limit"]),
+                    "quality_in": 0,
+                    "quality_out": 0,
+                }
+            )
+        result = {
+            "account": address,
+            "lines": lines,
+            # Lines are read from the validated state; markers stay valid
+            "ledger_index": min(
+                self._ledger_index(params.get("ledger_index")), self.closed_ledger
+            ),
+            "validated": True,
+        }
+        if start + limit < len(keys):
+            result["marker"] = str(start + limit)
+        return result
+
+    def account_tx(self, params: dict) -> dict:
+        address = params.get("account")
+        self._account(address)
+        keys = self.history_keys.get(address, [])
+        entries = self.history.get(address, [])
+        low = params.get("ledger_index_min")
+        high = params.get("ledger_index_max")
+        low = 0 if low in (None, -1) else int(low)
+        high = (
+            self.closed_ledger
+            if high in (None, -1)
+            else min(int(high), self.closed_ledger)
+        )
+        forward = bool(params.get("forward"))
+        limit = min(max(int(params.get("limit") or 200), 1), MAX_PAGE_SIZE)
+        marker = params.get("marker")
+
+        first = bisect.bisect_left(keys, (low, -1))
+        last = bisect.bisect_right(keys, (high, float("inf")))
+        if marker is not None:
+            position = (int(marker["ledger"]), int(marker["seq"]))
+            if forward:
+                first = max(first, bisect.bisect_left(keys, position))
+            else:
+                last = min(last, bisect.bisect_right(keys, position))
+        if forward:
+            page = entries[first : min(last, first + limit)]
+            next_index = first + limit if first + limit < last else None
+        else:
+            page = entries[max(first, last - limit) : last][::-1]
+            next_index = last - limit - 1 if last - limit > first else None
+
+        result = {
+            "account": address,
+            "ledger_index_min": low,
+            "ledger_index_max": high,
+            "limit": limit,
+            "transactions": page,
+            "validated": True,
+        }
+        if next_index is not None:
+            result["marker"] = {
+                "ledger": keys[next_index][0],
+                "seq": keys[next_index][1],
+            }
+        return result
+
+    def amm_info(self, params: dict) -> dict:
+        if params.get("amm_account"):
+            amm_account = params["amm_account"]
+        else:
+            pair = tuple(
+                sorted(
+                    (_asset_key(params.get("asset")), _asset_key(params.get("asset2"))),
+                    key=str,
+                )
+            )
+            amm_account = self.amm_by_pair.get(pair)
+        amm = self.amms.get(amm_account)
+        if amm is None:
+            raise RPCError("actNotFound", "Account not found.")
+
+        def pooled(asset):
+            currency, issuer = asset
+            if currency == "XRP":
+                return str(self.accounts[amm_account]["Balance"])
+            line = self.lines[(amm_account, issuer, currency)]
+            return {
+                "currency": currency,
+                "issuer": issuer,
+                "value": _value_str(line["balance"]),
+            }
+
+        return {
+            "amm": {
+                "account": amm_account,
+                "amount": pooled(amm["asset"]),
+                "amount2": pooled(amm["asset2"]),
+                "asset_frozen": False,
+                "asset2_frozen": False,
+                "lp_token": {
+                    "currency": amm["lp_currency"],
+                    "issuer": amm_account,
+                    "value": _value_str(amm["lp_supply"]),
+                },
+                "trading_fee": amm["trading_fee"],
+            },
+            **self._ledger_fields(params.get("ledger_index", "current")),
+        }
+
+    def tx(self, params: dict) -> dict:
+        envelope = self.transactions.get(str(params.get("transaction", "")).upper())
+        if envelope is None:
+            raise RPCError("txnNotFound", "Transaction not found.")
+        return dict(
+            envelope["tx_json"],
+            hash=envelope["hash"],
+            meta=envelope["meta"],
+            validated=True,
+        )
+
+    def ledger(self, params: dict) -> dict:
+        ledger_index = self._ledger_index(params.get("ledger_index", "validated"))
+        closed = ledger_index <= self.closed_ledger
+        return {
+            "ledger_index": ledger_index,
+            "ledger_hash": hashlib.sha256(str(ledger_index).encode())
+            .hexdigest()
+            .upper(),
+            "ledger": {
+                "ledger_index": str(ledger_index),
+                "closed": closed,
+                "close_time": self.close_time,
+            },
+            "validated": closed,
+        }
+
+    def fee(self, params: dict) -> dict:
+        return {
+            "current_ledger_size": str(min(len(self.open), self.ledger_capacity)),
+            "current_queue_size": str(max(0, len(self.open) - self.ledger_capacity)),
+            "drops": {
+                "base_fee": str(BASE_FEE_DROPS),
+                "median_fee": str(BASE_FEE_DROPS * 500),
+                "minimum_fee": str(BASE_FEE_DROPS),
+                "open_ledger_fee": str(BASE_FEE_DROPS),
+            },
+            "expected_ledger_size": str(self.ledger_capacity),
+            "ledger_current_index": self.current_ledger,
+            "levels": {
+                "median_level": "128000",
+                "minimum_level": "256",
+                "open_ledger_level": "256",
+                "reference_level": "256",
+            },
+            "max_queue_size": str(self.ledger_capacity * 20),
+        }
+
+    def server_info(self, params: dict) -> dict:
+        return {
+            "info": {
+                "build_version": "2.3.0",
+                "complete_ledgers": f"1-{self.closed_ledger}",
+                "server_state": "full",
+                "validated_ledger": {
+                    "seq": self.closed_ledger,
+                    "base_fee_xrp": BASE_FEE_DROPS / DROPS_PER_XRP,
+                    "reserve_base_xrp": ACCOUNT_RESERVE_DROPS // DROPS_PER_XRP,
+                    "reserve_inc_xrp": OWNER_RESERVE_DROPS // DROPS_PER_XRP,
+                },
+            }
+        }
+
+    def server_state(self, params: dict) -> dict:
+        return {
+            "state": {
+                "build_version": "2.3.0",
+                "complete_ledgers": f"1-{self.closed_ledger}",
+                "server_state": "full",
+                "validated_ledger": {
+                    "seq": self.closed_ledger,
+                    "base_fee": BASE_FEE_DROPS,
+                    "reserve_base": ACCOUNT_RESERVE_DROPS,
+                    "reserve_inc": OWNER_RESERVE_DROPS,
+                },
+            }
+        }
+
+    def sim_fund(self, params: dict) -> dict:
+        amount = params.get("amount")
+        if amount is None:
+            raise RPCError("invalidParams", "Missing amount.")
+        self.fund(params.get("account"), amount)
+        return {"account": params.get("account"), "funded": amount}
+
+    async def close_periodically(self):
+        while True:
+            await asyncio.sleep(self.ledger_interval)
+            self.close_ledger()
+
+
+class RateLimiter:
+    """Token bucket over all requests; rate 0 disables it."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def retry_after(self) -> Optional[float]:
+        """None if a request may proceed now, else seconds until it could."""
+        if self.rate <= 0:
+            return None
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+
+METHODS = {
+    "account_info",
+    "account_lines",
+    "account_tx",
+    "amm_info",
+    "fee",
+    "ledger",
+    "server_info",
+    "server_state",
+    "sim_fund",
+    "submit",
+    "tx",
+}
+
+
+def create_app(
+    ledger: SimulatedLedger,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    rate_limit: float = 0.0,
+    burst: Optional[float] = None,
+) -> Starlette:
+    """ASGI app serving JSON-RPC on / and the faucet on /accounts."""
+    limiter = RateLimiter(rate_limit, burst)
+
+    async def delay() -> Optional[JSONResponse]:
+        retry_after = limiter.retry_after()
+        if retry_after is not None:
+            return JSONResponse(
+                {"result": {"error": "slowDown", "status": "error"}},
+                status_code=503,
+                headers={"Retry-After": f"{retry_after:.3f}"},
+            )
+        if latency or jitter:
+            await asyncio.sleep(latency + random.random() * jitter)
+        return None
+
+    async def rpc(request: Request) -> JSONResponse:
+        rejected = await delay()
+        if rejected is not None:
+            return rejected
+        body = await request.json()
+        method = body.get("method")
+        params = (body.get("params") or [{}])[0]
+        try:
+            if method not in METHODS:
+                raise RPCError("unknownCmd", "Unknown method.")
+            if method == "submit":
+                result = ledger.submit(params.get("tx_blob", ""))
+            else:
+                result = getattr(ledger, method)(params)
+            result["status"] = "success"
+        except RPCError as e:
+            result = {
+                "error": e.error,
+                "error_message": e.message,
+                "request": dict(params, command=method),
+                "status": "error",
+            }
+        return JSONResponse({"result": result})
+
+    async def faucet(request: Request) -> JSONResponse:
+        rejected = await delay()
+        if rejected is not None:
+            return rejected
+        body = await request.json()
+        destination = body.get("destination")
+        if not destination:
+            return JSONResponse({"error": "Missing destination"}, status_code=400)
+        ledger.fund(destination, FAUCET_AMOUNT_DROPS)
+        return JSONResponse(
+            {
+                "account": {"address": destination, "classicAddress": destination},
+                "amount": FAUCET_AMOUNT_DROPS // DROPS_PER_XRP,
+            }
+        )
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # Ledgers close while the server runs; in-process callers that skip
+        # the lifespan drive ledger.close_periodically() themselves
+        close_task = asyncio.create_task(ledger.close_periodically())
+        try:
+            yield
+        finally:
+            close_task.cancel()
+
+    app = Starlette(
+        routes=[
+            Route("/", rpc, methods=["POST"]),
+            Route("/accounts", faucet, methods=["POST"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.ledger = ledger
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local XRPL JSON-RPC simulator.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="Serve JSON-RPC and the faucet")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=5005)
+    serve_parser.add_argument("--ledger-interval", type=float, default=3.5)
+    serve_parser.add_argument(
+        "--ledger-capacity",
+        type=int,
+        default=1000,
+        help="Transactions applied per ledger; later ones are queued",
+    )
+    serve_parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every request"
+    )
+    serve_parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Up to this many more seconds"
+    )
+    serve_parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="Requests per second before answering 503 slowDown (0: unlimited)",
+    )
+    serve_parser.add_argument("--burst", type=float, default=None)
+    serve_parser.add_argument(
+        "--no-verify",
+        action="store_true",
+        help="Skip signature checks (they dominate CPU time in large benchmarks)",
+    )
+    args = parser.parse_args()
+
+    import uvicorn
+
+    ledger = SimulatedLedger(
+        ledger_interval=args.ledger_interval,
+        ledger_capacity=args.ledger_capacity,
+        verify_signatures=not args.no_verify,
+    )
+    app = create_app(ledger, args.latency, args.jitter, args.rate_limit, args.burst)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Shared XRPL JSON-RPC client for the backend.
+
+xrpl-py's AsyncJsonRpcClient opens a new HTTP client (and TCP/TLS
+connection) for every request and has no protection against rate limits.
+`XRPLGateway` is a drop-in subclass, so it works with every xrpl-py helper
+(sign_and_submit, autofill, faucet wallets), that adds:
+
+- one pooled httpx client with keep-alive connections,
+- a per-request timeout,
+- retries with exponential backoff (honoring Retry-After) when the server
+  answers 429/503 or slowDown/tooBusy, and on timeouts or dropped
+  connections for read requests,
+- in-flight coalescing: identical read requests issued while one is
+  already pending share its response instead of hitting the server again,
+- a per-ledger read cache for AMMInfo / AccountLines (xrpl_read_cache).
+"""
+
+import asyncio
+import copy
+import json
+import os
+import random
+from json import JSONDecodeError
+from typing import Dict, Optional
+
+import httpx
+from xrpl.asyncio.clients import AsyncJsonRpcClient
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
+from xrpl.asyncio.clients.utils import json_to_response, request_to_json_rpc
+from xrpl.models.requests.request import Request
+from xrpl.models.response import Response
+
+from xrpl_read_cache import LedgerReadCache
+
+XRPL_REQUEST_TIMEOUT = float(os.getenv("XRPL_REQUEST_TIMEOUT", "10"))
+XRPL_MAX_RETRIES = int(os.getenv("XRPL_MAX_RETRIES", "3"))
+# First retry delay in seconds; doubles per attempt
+XRPL_RETRY_BACKOFF = float(os.getenv("XRPL_RETRY_BACKOFF", "0.5"))
+XRPL_MAX_CONNECTIONS = int(os.getenv("XRPL_MAX_CONNECTIONS", "20"))
+
+# Requests with side effects are never coalesced, nor retried after a
+# timeout (the first attempt may have gone through)
+WRITE_METHODS = {"submit", "submit_multisigned", "sign", "sign_for", "wallet_propose"}
+RATE_LIMIT_STATUSES = {429, 503}
+RATE_LIMIT_ERRORS = {"slowDown", "tooBusy"}
+
+
+class _RateLimited(Exception):
+    def __init__(self, retry_after: Optional[float], detail: dict):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class XRPLGateway(AsyncJsonRpcClient):
+    def __init__(
+        self,
+        url: str,
+        timeout: float = XRPL_REQUEST_TIMEOUT,
+        max_retries: int = XRPL_MAX_RETRIES,
+        retry_backoff: float = XRPL_RETRY_BACKOFF,
+        max_connections: int = XRPL_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[LedgerReadCache] = None,
+    ):
+        super().__init__(url)
+        self.transport = transport
+        self.cache = cache if cache is not None else LedgerReadCache()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_connections = max_connections
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.requests_sent = 0
+        self.requests_coalesced = 0
+        self.retries = 0
+
+    def _http_client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._http_loop = loop
+            self._in_flight = {}
+        return self._http
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "requests_sent": self.requests_sent,
+            "requests_coalesced": self.requests_coalesced,
+            "retries": self.retries,
+            "in_flight": len(self._in_flight),
+            "cache": self.cache.stats,
+        }
+
+    async def _request_impl(
+        self, request: Request, *, timeout: Optional[float] = None
+    ) -> Response:
+        payload = request_to_json_rpc(request)
+        if payload["method"] in WRITE_METHODS:
+            return await self._send(payload, timeout, retry_timeouts=False)
+
+        method = payload["method"]
+        key = json.dumps(payload, sort_keys=True)
+        cached = self.cache.get(method, key)
+        if cached is not None:
+            return cached
+
+        self._http_client()  # Resets in-flight requests of a previous loop
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.requests_coalesced += 1
+            # Callers may mutate their result; only the first gets the original
+            return copy.deepcopy(await asyncio.shield(task))
+
+        task = asyncio.ensure_future(self._fetch(method, key, payload, timeout))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # A cancelled caller must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self, method: str, key: str, payload: dict, timeout: Optional[float]
+    ) -> Response:
+        response = await self._send(payload, timeout, retry_timeouts=True)
+        self.cache.put(method, key, response)
+        return response
+
+    async def _send(
+        self, payload: dict, timeout: Optional[float], retry_timeouts: bool
+    ) -> Response:
+        attempt = 0
+        while True:
+            try:
+                return await self._post(payload, timeout)
+            except _RateLimited as e:
+                if attempt >= self.max_retries:
+                    raise XRPLRequestFailureException(e.detail)
+                delay = e.retry_after
+            except (httpx.TimeoutException, httpx.TransportError):
+                if not retry_timeouts or attempt >= self.max_retries:
+                    raise
+                delay = None
+            if delay is None:
+                delay = self.retry_backoff * 2**attempt * (1 + random.random() / 2)
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def _post(self, payload: dict, timeout: Optional[float]) -> Response:
+        self.requests_sent += 1
+        response = await self._http_client().post(
+            self.url, json=payload, timeout=timeout or self.timeout
+        )
+        if response.status_code in RATE_LIMIT_STATUSES:
+            raise _RateLimited(
+                _retry_after(response),
+                {"error": response.status_code, "error_message": response.text},
+            )
+        try:
+            body = response.json()
+        except JSONDecodeError:
+            raise XRPLRequestFailureException(
+                {"error": response.status_code, "error_message": response.text}
+            )
+        if body.get("result", {}).get("error") in RATE_LIMIT_ERRORS:
+            raise _RateLimited(_retry_after(response), body["result"])
+        return json_to_response(body)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
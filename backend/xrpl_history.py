@@ -0,0 +1,251 @@
+"""
+Streaming readers for an XRPL account's transaction history and trustlines.
+
+A single AccountTx request returns at most one page of transactions plus a
+`marker` to resume from. `iter_account_transactions` follows the markers and
+yields transactions one by one, fetching the next page only when the
+consumer gets there. Memory therefore stays at one page regardless of
+history length, and a consumer that stops iterating (or hits
+`max_transactions`) triggers no further requests. `iter_account_lines` does
+the same for AccountLines, which is how an issuer lists every trustline to
+its tokens.
+"""
+
+import datetime
+from typing import Any, AsyncIterator, Optional, Union
+
+from xrpl.asyncio.clients.exceptions import XRPLRequestFailureException
+from xrpl.models.requests import AccountLines, AccountTx
+
+# Transactions requested per AccountTx page (servers cap this, typically at 400)
+DEFAULT_PAGE_SIZE = 200
+# Trustlines requested per AccountLines page (servers accept 10-400)
+DEFAULT_LINES_PAGE_SIZE = 400
+
+RIPPLE_EPOCH_OFFSET = 946684800
+
+
+async def iter_account_transactions(
+    client,
+    account: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    ledger_index_min: Optional[int] = None,
+    ledger_index_max: Optional[int] = None,
+    forward: bool = False,
+    max_transactions: Optional[int] = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield every transaction envelope of `account` between the optional
+    ledger bounds, newest first unless `forward` is set.
+
+    An account that does not exist yet has no history and yields nothing;
+    any other ledger error is raised instead of being mistaken for an empty
+    history.
+    """
+    marker = None
+    yielded = 0
+    while True:
+        req = AccountTx(
+            account=account,
+            limit=page_size,
+            forward=forward,
+            ledger_index_min=ledger_index_min,
+            ledger_index_max=ledger_index_max,
+            marker=marker,
+        )
+        resp = await client.request(req)
+        result = resp.result
+        if "error" in result:
+            if result["error"] == "actNotFound":
+                return
+            raise XRPLRequestFailureException(result)
+
+        for tx_entry in result.get("transactions", []):
+            yield tx_entry
+            yielded += 1
+            if max_transactions is not None and yielded >= max_transactions:
+                return
+
+        marker = result.get("marker")
+        if marker is None:
+            return
+
+
+async def iter_account_lines_pages(
+    client,
+    account: str,
+    page_size: int = DEFAULT_LINES_PAGE_SIZE,
+    peer: Optional[str] = None,
+    ledger_index: Union[int, str] = "validated",
+    marker: Any = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield the AccountLines pages of `account` as {"lines", "ledger_index",
+    "marker"}, where "marker" is the one the page was requested with, so a
+    reader can resume at that page later by passing both back in.
+
+    Later pages are requested against the ledger the first page came from,
+    since a marker is only meaningful for the ledger that produced it.
+    """
+    while True:
+        req = AccountLines(
+            account=account,
+            ledger_index=ledger_index,
+            limit=page_size,
+            peer=peer,
+            marker=marker,
+        )
+        resp = await client.request(req)
+        result = resp.result
+        if "error" in result:
+            if result["error"] == "actNotFound":
+                return
+            raise XRPLRequestFailureException(result)
+
+        ledger_index = result.get("ledger_index", ledger_index)
+        yield {
+            "lines": result.get("lines", []),
+            "ledger_index": ledger_index,
+            "marker": marker,
+        }
+
+        marker = result.get("marker")
+        if marker is None:
+            return
+
+
+async def iter_account_lines(
+    client,
+    account: str,
+    page_size: int = DEFAULT_LINES_PAGE_SIZE,
+    peer: Optional[str] = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield every trustline of `account` (optionally only those with `peer`)
+    from the latest validated ledger.
+    """
+    async for page in iter_account_lines_pages(client, account, page_size, peer):
+        for line in page["lines"]:
+            yield line
+
+
+def ripple_date_to_datetime(ripple_date: int) -> datetime.datetime:
+    """
+    XRPL "date" is seconds since Ripple epoch (2000-01-01).
+    Convert to standard Python datetime.
+    """
+    return datetime.datetime.utcfromtimestamp(ripple_date + RIPPLE_EPOCH_OFFSET)
+
+
+def parse_transaction(tx_envelope: dict) -> dict:
+    """
+    Adapts the user script to parse the structure returned by xrpl-py AccountTx,
+    which can be either:
+      {
+        "tx_json": {
+          "TransactionType": "...",
+          "Account": "...",
+          "Destination": "...",
+          "Amount": "... or {...}",
+          "date": 123456789,
+          ...
+        },
+        "meta": {
+          "delivered_amount": "... or {...}",
+          ...
+        },
+        "validated": True,
+        "close_time_iso": "...",
+        ...
+      }
+    or in some cases:
+      {
+        "tx": {...},
+        "meta": {...},
+        ...
+      }
+    We'll look for tx_json first, then fallback to tx.
+    """
+
+    # 1) The transaction data might be in "tx_json" or "tx".
+    tx_json = tx_envelope.get("tx_json")
+    if not tx_json:
+        tx_json = tx_envelope.get("tx", {})
+
+    meta = tx_envelope.get("meta", {})
+
+    # 2) The top-level "hash" can be in tx_json["hash"] or the outer envelope
+    tx_hash = tx_json.get("hash") or tx_envelope.get("hash", "N/A")
+
+    # 3) We might have close_time_iso or not
+    close_time = tx_envelope.get("close_time_iso", "N/A")
+
+    # 4) Basic fields from the transaction
+    tx_type = tx_json.get("TransactionType", "N/A")
+    sender = tx_json.get("Account", "N/A")
+    receiver = tx_json.get("Destination", "N/A")
+
+    # 5) The ledger "date" in XRPL is an integer in the tx
+    ledger_date = tx_json.get("date")
+    if ledger_date is not None:
+        dt_obj = ripple_date_to_datetime(ledger_date)
+        tx_date = dt_obj.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        tx_date = "N/A"
+
+    # Payment vs TrustSet vs other
+    amount_str = "N/A"
+    token = "N/A"
+    issue = "N/A"
+
+    if tx_type == "Payment":
+        # Check meta for delivered_amount
+        delivered_amt = meta.get("delivered_amount")
+        if isinstance(delivered_amt, dict):
+            # IOU
+            amount_str = delivered_amt.get("value", "N/A")
+            token = delivered_amt.get("currency", "N/A")
+            issue = delivered_amt.get("issuer", "N/A")
+        elif isinstance(delivered_amt, str):
+            # Possibly XRP in drops
+            try:
+                xrp_amount = float(delivered_amt) / 1_000_000
+                amount_str = f"{xrp_amount:.6f}"
+                token = "XRP"
+            except:
+                amount_str = delivered_amt
+
+        # If delivered_amount was None or "N/A", fallback to raw "Amount"
+        if amount_str == "N/A":
+            raw_amt = tx_json.get("Amount")
+            if isinstance(raw_amt, dict):
+                amount_str = raw_amt.get("value", "N/A")
+                token = raw_amt.get("currency", "N/A")
+                issue = raw_amt.get("issuer", "N/A")
+            elif isinstance(raw_amt, str):
+                # Possibly XRP
+                try:
+                    xrp_amount = float(raw_amt) / 1_000_000
+                    amount_str = f"{xrp_amount:.6f}"
+                    token = "XRP"
+                except:
+                    amount_str = raw_amt
+
+    elif tx_type == "TrustSet":
+        limit_amount = tx_json.get("LimitAmount", {})
+        if isinstance(limit_amount, dict):
+            amount_str = limit_amount.get("value", "N/A")
+            token = limit_amount.get("currency", "N/A")
+            issue = limit_amount.get("issuer", "N/A")
+
+    return {
+        "Transaction Hash": tx_hash,
+        "Type": tx_type,
+        "Sender": sender,
+        "Receiver": receiver,
+        "Amount": amount_str,
+        "Token": token,
+        "Issue": issue,
+        "Date": tx_date,
+        "Close Time (ISO)": close_time,
+    }
@@ -0,0 +1,94 @@
+"""
+Short-lived cache for ledger reads that only change when a ledger closes.
+
+AMMInfo and AccountLines answers are the same until the next validated
+ledger (~4 s), yet every company page view asked the ledger again. A cached
+response is served while both hold:
+
+- no newer validated ledger has been observed since it was stored, and
+- it is younger than the TTL (a backstop when no ledger is observed).
+
+Ledgers are observed from validated responses passing through the gateway
+and, when the ledger subscription runs, from its ledgerClosed messages.
+"""
+
+import copy
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from xrpl.models.response import Response
+
+XRPL_CACHE_TTL = float(os.getenv("XRPL_CACHE_TTL", "4"))
+XRPL_CACHE_MAX_ENTRIES = int(os.getenv("XRPL_CACHE_MAX_ENTRIES", "1024"))
+CACHED_METHODS = {"amm_info", "account_lines"}
+
+
+class LedgerReadCache:
+    def __init__(
+        self,
+        ttl: float = XRPL_CACHE_TTL,
+        max_entries: int = XRPL_CACHE_MAX_ENTRIES,
+        methods=CACHED_METHODS,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.methods = set(methods)
+        self.latest_ledger: Optional[int] = None
+        # key -> (latest ledger when stored, stored at, response)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def observe_ledger(self, ledger_index: Optional[int]):
+        """Record a validated ledger; entries stored before it become stale."""
+        if ledger_index is None:
+            return
+        if self.latest_ledger is None or ledger_index > self.latest_ledger:
+            self.latest_ledger = ledger_index
+
+    def observe_response(self, response: Response):
+        result = response.result
+        if result.get("validated") and isinstance(result.get("ledger_index"), int):
+            self.observe_ledger(result["ledger_index"])
+
+    def get(self, method: str, key: str) -> Optional[Response]:
+        if method not in self.methods or self.ttl <= 0:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            ledger, stored_at, response = entry
+            if ledger == self.latest_ledger and time.monotonic() - stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(response)
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, method: str, key: str, response: Response):
+        self.observe_response(response)
+        if method not in self.methods or self.ttl <= 0:
+            return
+        if not response.is_successful():
+            return
+        self._entries[key] = (
+            self.latest_ledger,
+            time.monotonic(),
+            copy.deepcopy(response),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "latest_ledger": self.latest_ledger,
+        }
@@ -0,0 +1,252 @@
+"""
+Local index of issuer transaction history.
+
+Every parsed transaction (the output of `parse_transaction`) of an issuing
+wallet is stored in SQLite together with its ledger index and its position
+within that ledger (meta.TransactionIndex), and the highest
+ledger seen per issuer is remembered. A refresh therefore only asks the
+ledger for transactions newer than that mark (oldest first, following
+markers), and payment checks and history views become local queries
+instead of rescans of the whole account history.
+
+Only validated ledgers are returned by AccountTx by default, so stored rows
+never change and can be kept forever.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+import aiosqlite
+
+from xrpl_history import iter_account_transactions, parse_transaction
+
+# Rows written per executemany while refreshing a long history
+INSERT_BATCH_SIZE = 500
+
+_refresh_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def create_tx_index_tables(db: aiosqlite.Connection):
+    async with db.execute("PRAGMA table_info(issuer_transactions)") as cursor:
+        columns = [row[1] for row in await cursor.fetchall()]
+    if columns and "tx_index" not in columns:
+        # Indexes written before tx_index cannot order a ledger's transactions;
+        # drop them and their marks so the next refresh refetches everything
+        await db.execute("DROP TABLE issuer_transactions")
+        await db.execute("DROP TABLE IF EXISTS issuer_tx_sync")
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS issuer_transactions (
+        issuer_address TEXT NOT NULL,
+        tx_hash TEXT NOT NULL,
+        ledger_index INTEGER NOT NULL,
+        tx_index INTEGER NOT NULL,  -- meta.TransactionIndex within the ledger
+        tx_type TEXT,
+        sender TEXT,
+        receiver TEXT,
+        amount TEXT,
+        token TEXT,
+        issue TEXT,
+        date TEXT,
+        close_time_iso TEXT,
+        PRIMARY KEY (issuer_address, tx_hash)
+    )
+    """)
+    await db.execute("""
+    CREATE INDEX IF NOT EXISTS idx_issuer_transactions_ledger
+    ON issuer_transactions (issuer_address, ledger_index, tx_index)
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS issuer_tx_sync (
+        issuer_address TEXT PRIMARY KEY,
+        last_ledger_index INTEGER NOT NULL  -- Highest ledger already indexed
+    )
+    """)
+    await db.commit()
+
+
+def _ledger_index(tx_entry: dict) -> Optional[int]:
+    """Ledger of an AccountTx entry; API v2 puts it on the envelope, v1 on tx."""
+    tx_json = tx_entry.get("tx_json") or tx_entry.get("tx", {})
+    ledger_index = tx_entry.get("ledger_index", tx_json.get("ledger_index"))
+    return int(ledger_index) if ledger_index is not None else None
+
+
+def _transaction_index(tx_entry: dict) -> int:
+    """Position of an AccountTx entry within its ledger (meta.TransactionIndex)."""
+    meta = tx_entry.get("meta") or tx_entry.get("metaData") or {}
+    return int(meta.get("TransactionIndex", 0))
+
+
+async def get_last_indexed_ledger(
+    db: aiosqlite.Connection, issuer: str
+) -> Optional[int]:
+    async with db.execute(
+        "SELECT last_ledger_index FROM issuer_tx_sync WHERE issuer_address=?",
+        (issuer,),
+    ) as cursor:
+        row = await cursor.fetchone()
+    return row[0] if row else None
+
+
+def _index_row(issuer: str, tx_entry: dict) -> Optional[tuple]:
+    ledger_index = _ledger_index(tx_entry)
+    if ledger_index is None:
+        return None
+    parsed = parse_transaction(tx_entry)
+    return (
+        issuer,
+        parsed["Transaction Hash"],
+        ledger_index,
+        _transaction_index(tx_entry),
+        parsed["Type"],
+        parsed["Sender"],
+        parsed["Receiver"],
+        parsed["Amount"],
+        parsed["Token"],
+        parsed["Issue"],
+        parsed["Date"],
+        parsed["Close Time (ISO)"],
+    )
+
+
+async def _insert_transactions(db: aiosqlite.Connection, rows: List[tuple]) -> int:
+    before = db.total_changes
+    await db.executemany(
+        """
+        INSERT OR IGNORE INTO issuer_transactions (
+            issuer_address, tx_hash, ledger_index, tx_index, tx_type, sender,
+            receiver, amount, token, issue, date, close_time_iso
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    return db.total_changes - before
+
+
+async def _advance_mark(db: aiosqlite.Connection, issuer: str, ledger_index: int):
+    # The mark never moves backwards, whoever wrote it last
+    await db.execute(
+        """
+        INSERT INTO issuer_tx_sync (issuer_address, last_ledger_index)
+        VALUES (?, ?)
+        ON CONFLICT (issuer_address) DO UPDATE
+        SET last_ledger_index = MAX(last_ledger_index, excluded.last_ledger_index)
+        """,
+        (issuer, ledger_index),
+    )
+
+
+async def refresh_issuer_index(db: aiosqlite.Connection, client, issuer: str) -> int:
+    """
+    Fetch and store the transactions of `issuer` newer than its last indexed
+    ledger. Returns how many new transactions were stored.
+
+    Concurrent refreshes of the same issuer are serialized, so the second
+    one finds the mark already advanced and fetches (almost) nothing.
+    """
+    lock = _refresh_locks.setdefault(issuer, asyncio.Lock())
+    async with lock:
+        last_ledger = await get_last_indexed_ledger(db, issuer)
+        ledger_min = last_ledger + 1 if last_ledger is not None else None
+
+        new_last = last_ledger
+        stored = 0
+        batch = []
+        async for tx_entry in iter_account_transactions(
+            client, issuer, ledger_index_min=ledger_min, forward=True
+        ):
+            row = _index_row(issuer, tx_entry)
+            if row is None:
+                continue
+            batch.append(row)
+            new_last = max(new_last or 0, row[2])
+            if len(batch) >= INSERT_BATCH_SIZE:
+                stored += await _insert_transactions(db, batch)
+                batch = []
+        if batch:
+            stored += await _insert_transactions(db, batch)
+
+        # Rows and the mark are committed together, so an interrupted refresh
+        # simply starts over from the previous mark
+        if new_last is not None and new_last != last_ledger:
+            await _advance_mark(db, issuer, new_last)
+        await db.commit()
+        return stored
+
+
+async def record_transaction(
+    db: aiosqlite.Connection, issuer: str, tx_entry: dict
+) -> bool:
+    """
+    Store one transaction of `issuer` received outside a refresh (e.g. from
+    a ledger subscription). The mark is left alone: a streamed transaction
+    says nothing about the rest of its ledger, so the caller advances it
+    with `mark_ledger_indexed` once the whole ledger is known to be stored.
+    Returns whether the transaction was new.
+    """
+    row = _index_row(issuer, tx_entry)
+    if row is None:
+        return False
+    stored = await _insert_transactions(db, [row])
+    await db.commit()
+    return stored > 0
+
+
+async def mark_ledger_indexed(
+    db: aiosqlite.Connection, issuers: Iterable[str], ledger_index: int
+):
+    """
+    Advance the mark of `issuers` to `ledger_index`. Only valid when every
+    transaction of theirs up to that ledger is already stored, i.e. the
+    caller refreshed them and then received every ledger since.
+    """
+    for issuer in issuers:
+        await _advance_mark(db, issuer, ledger_index)
+    await db.commit()
+
+
+def _row_to_parsed(row) -> dict:
+    """Indexed row in the shape returned by `parse_transaction`."""
+    return {
+        "Transaction Hash": row[0],
+        "Ledger Index": row[1],
+        "Type": row[2],
+        "Sender": row[3],
+        "Receiver": row[4],
+        "Amount": row[5],
+        "Token": row[6],
+        "Issue": row[7],
+        "Date": row[8],
+        "Close Time (ISO)": row[9],
+    }
+
+
+async def get_issuer_transactions(
+    db: aiosqlite.Connection,
+    issuer: str,
+    tx_type: Optional[str] = None,
+    receiver: Optional[str] = None,
+    sender: Optional[str] = None,
+) -> List[dict]:
+    """
+    Indexed transactions of `issuer`, newest first (by ledger, then by
+    position within the ledger), optionally filtered.
+    """
+    query = """
+        SELECT tx_hash, ledger_index, tx_type, sender, receiver,
+               amount, token, issue, date, close_time_iso
+        FROM issuer_transactions
+        WHERE issuer_address = ?
+    """
+    params = [issuer]
+    filters = (("tx_type", tx_type), ("receiver", receiver), ("sender", sender))
+    for column, value in filters:
+        if value is not None:
+            query += f" AND {column} = ?"
+            params.append(value)
+    query += " ORDER BY ledger_index DESC, tx_index DESC"
+
+    async with db.execute(query, params) as cursor:
+        rows = await cursor.fetchall()
+    return [_row_to_parsed(row) for row in rows]